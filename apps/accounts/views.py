@@ -7,8 +7,7 @@ from .serializers import CustomTokenObtainPairSerializer
 from .models import User
 from .models import EmailVerification
 from django.utils import timezone
-from django.core.mail import send_mail
-from django.conf import settings
+from apps.core.outbox import enqueue_email
 from datetime import timedelta
 import random
 
@@ -82,8 +81,8 @@ def resend_verification(request):
         subject = "Your Lifeline verification code"
         message = f"Your verification code is: {code}\nThis code expires in 24 hours."
 
-        send_mail(subject, message, settings.DEFAULT_FROM_EMAIL, [user.email], fail_silently=True)
-        logger.debug(f"Verification email sent to: {masked_email}")
+        enqueue_email(subject, message, user.email)
+        logger.debug(f"Verification email queued for: {masked_email}")
 
     except Exception as e:
         logger.error(f"Error resending verification for user ID {user.id if user else 'unknown'}: {e}")
@@ -120,9 +119,9 @@ def password_reset_request(request):
 
         subject = "Your Lifeline password reset code"
         message = f"Your password reset code is: {code}\nThis code expires in 1 hour."
-        send_mail(subject, message, settings.DEFAULT_FROM_EMAIL, [user.email], fail_silently=True)
+        enqueue_email(subject, message, user.email)
 
-        logger.debug(f"Password reset email sent to {masked_email}")
+        logger.debug(f"Password reset email queued for {masked_email}")
 
     except Exception as e:
         logger.error(f"Error generating password reset for {masked_email}")
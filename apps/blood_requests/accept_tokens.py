@@ -0,0 +1,39 @@
+"""
+One-click accept links.
+
+Each donor alert carries a token for that donor and that request, signed
+with HMAC over SECRET_KEY (django.core.signing.TimestampSigner) and valid
+for DONOR_ACCEPT_LINK_MAX_AGE seconds. `POST
+/api/v1/requests/accept/<token>/` accepts the request on the donor's
+behalf after checking the signature alone: no password hash and no session
+or JWT lookup. The token can only be used once. Its DonorAlert row is
+stamped through a conditional UPDATE (token_used_at IS NULL), so of two
+concurrent uses only one gets through.
+"""
+from django.conf import settings
+from django.core import signing
+
+SALT = 'blood_requests.accept'
+
+
+def _signer():
+    return signing.TimestampSigner(salt=SALT)
+
+
+def max_age():
+    """Seconds an accept link stays valid"""
+    return getattr(settings, 'DONOR_ACCEPT_LINK_MAX_AGE', 72 * 3600)
+
+
+def make_token(blood_request_id, donor_id):
+    return _signer().sign(f"{blood_request_id}.{donor_id}")
+
+
+def read_token(token):
+    """(blood_request_id, donor_id); raises signing.BadSignature (or SignatureExpired) when invalid"""
+    value = _signer().unsign(token, max_age=max_age())
+    try:
+        blood_request_id, donor_id = (int(part) for part in value.split('.'))
+    except ValueError:
+        raise signing.BadSignature('Malformed accept token')
+    return blood_request_id, donor_id
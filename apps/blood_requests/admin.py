@@ -2,13 +2,16 @@ from django.contrib import admin
 from django.utils.html import format_html
 from django.db.models import Count
 from apps.core.admin_base import SuperuserAdmin, HospitalRestrictedAdmin
+from apps.core.antigens import AntigenMaskFormField
 from .models import BloodRequest, DonorResponse
 
 
-from django.core.mail import send_mail
+from .notifications import queue_donor_alerts
 from django.conf import settings
 
 from .services import DonorMatchingService
+from . import allocation
+from . import waves
 
 
 class DonorResponseInline(admin.TabularInline):
@@ -26,7 +29,7 @@ class BloodRequestAdminMixin:
     def get_list_display(self, request):
         """Dynamic list display"""
         base_display = [
-            'id', 'hospital', 'blood_type', 'status_display', 
+            'id', 'hospital', 'blood_type', 'component', 'urgency', 'needed_by', 'status_display', 
             'contact_phone', 'responses_count', 'created_at'
         ]
         
@@ -37,7 +40,7 @@ class BloodRequestAdminMixin:
     
     def get_list_filter(self, request):
         """Dynamic list filters"""
-        base_filters = ['status', 'blood_type', 'created_at']
+        base_filters = ['status', 'urgency', 'blood_type', 'component', 'created_at']
         
         if request.user.is_superuser:
             base_filters.extend(['hospital', 'hospital__primary_location__state'])
@@ -56,10 +59,11 @@ class BloodRequestAdminMixin:
         if request.user.is_superuser:
             return [
                 ('Request Information', {
-                    'fields': ('hospital', 'blood_type', 'contact_phone', 'notes')
+                    'fields': ('hospital', 'blood_type', 'component', 'antigen_negative_required', 'contact_phone', 'notes')
                 }),
                 ('Status', {
-                    'fields': ('status',)
+                    'fields': ('status', 'urgency', 'needed_by'),
+                    'description': 'Leave "Needed by" empty to derive it from the urgency'
                 }),
                 ('Timestamps', {
                     'fields': ('created_at', 'updated_at'),
@@ -69,10 +73,11 @@ class BloodRequestAdminMixin:
         else:
             return [
                 ('Request Information', {
-                    'fields': ('blood_type', 'contact_phone', 'notes')
+                    'fields': ('blood_type', 'component', 'antigen_negative_required', 'contact_phone', 'notes')
                 }),
                 ('Status', {
-                    'fields': ('status',)
+                    'fields': ('status', 'urgency', 'needed_by'),
+                    'description': 'Leave "Needed by" empty to derive it from the urgency'
                 }),
                 ('Timestamps', {
                     'fields': ('created_at', 'updated_at'),
@@ -80,6 +85,12 @@ class BloodRequestAdminMixin:
                 })
             ]
     
+    def formfield_for_dbfield(self, db_field, request, **kwargs):
+        """Antigen masks are edited as a checkbox list"""
+        if db_field.name == 'antigen_negative_required':
+            return AntigenMaskFormField(label='Donors must be negative for')
+        return super().formfield_for_dbfield(db_field, request, **kwargs)
+
     def get_readonly_fields(self, request, obj=None):
         """Readonly fields"""
         readonly = ['created_at', 'updated_at', 'responses_count']
@@ -470,41 +481,33 @@ class DynamicBloodRequestAdmin(SuperuserBloodRequestAdmin):
             obj.hospital = hospital
         super().save_model(request, obj, form, change)
 
-        # --- Send notifications to matching donors ---
-        matching_donors = DonorMatchingService.find_compatible_donors(obj)
-        for donor in matching_donors:
-            self.send_donor_notification(donor, obj)
-
-
-    def send_donor_notification(self, donor, request_obj):
-        """Send email notification to donor"""
-        subject = f"Urgent: {request_obj.blood_type} Blood Needed"
-        message = f"""
-        Hello {donor.user.first_name},
-
-        A blood request has been posted that matches your profile:
+        if allocation.allocation_enabled():
+            if change and obj.status != BloodRequest.RequestStatus.OPEN:
+                allocation.alert(queue_donor_alerts, allocation.release(obj))
+            else:
+                allocation.alert(queue_donor_alerts, allocation.allocate_for(obj))
+            return
 
-        Blood Type: {request_obj.blood_type}
-        Hospital: {request_obj.hospital.name}
-        Address: {request_obj.hospital.address}
-        Location: {request_obj.hospital.primary_location.name}
-        Contact: {request_obj.contact_phone}
+        if waves.waves_enabled():
+            # Later waves are sent by run_notification_waves while the request stays open
+            if not change:
+                waves.send_wave(obj)
+            return
 
-        If you can donate, please accept this request:
-        Accept Link: {settings.FRONTEND_URL}/requests/{request_obj.id}/accept/
+        if obj.status != BloodRequest.RequestStatus.OPEN:
+            # Matched, fulfilled and cancelled requests need no more donors
+            return
 
-        Thank you for being a lifesaver!
-        """
-
-        send_mail(
-            subject,
-            message,
-            settings.DEFAULT_FROM_EMAIL,
-            [donor.user.email],
-            fail_silently=True
+        # --- Send notifications to matching donors ---
+        matching_donors = DonorMatchingService.iter_compatible_donors(
+            obj,
+            limit=getattr(settings, 'DONOR_ALERT_LIMIT', None),
+            rank_by=getattr(settings, 'DONOR_ALERT_RANKING', None),
+            chunk_size=getattr(settings, 'DONOR_ALERT_CHUNK_SIZE', 500),
         )
+        queue_donor_alerts(matching_donors, obj, chunk_size=getattr(settings, 'DONOR_ALERT_CHUNK_SIZE', 500))
+
 
-    
     def has_delete_permission(self, request, obj=None):
         """Hospital users can delete their own requests"""
         if request.user.is_superuser:
@@ -0,0 +1,197 @@
+"""
+Scarce-type donor allocation across concurrent OPEN requests.
+
+Per-request matching alerts every compatible donor, so universal donors
+(O-) are alerted by every open request in the region, and requests that
+can only use O- compete with requests that had other options. The
+allocator instead assigns each donor to at most DONOR_ALLOCATION_PER_DONOR
+open requests and each request up to DONOR_ALLOCATION_PER_REQUEST donors.
+
+`solve()` is a scarcity-weighted greedy b-matching:
+
+- a donor's weight is its demand - how many open requests it can serve -
+  so each request takes its least contested donors first and O- donors are
+  left for the requests that have nothing else
+- requests pick one donor per round, fewest remaining candidates first, so
+  a flexible request cannot drain a scarce request's pool before it gets
+  a turn
+
+Allocations are persisted as DonorAllocation rows (a row means the donor
+was alerted) and are sticky: re-solving only adds rows. A request opening
+or closing re-solves just its region - the open requests at hospitals that
+share a reachable donor with it (via DonorReachability) - with donors held
+by requests outside the region counted against their capacity.
+"""
+from collections import Counter, deque
+
+from django.conf import settings
+from django.db import transaction
+from apps.donors.models import Donor
+
+from .models import BloodRequest, DonorAllocation, DonorReachability
+
+import logging
+logger = logging.getLogger('apps.blood_requests')
+
+
+def allocation_enabled():
+    return getattr(settings, 'DONOR_ALLOCATION_ENABLED', False)
+
+
+def solve(candidates, per_request, per_donor=1, fixed=None):
+    """
+    Assign donors to requests.
+
+    `candidates` maps request_id -> donor ids in preference order (the
+    alert ranking). `fixed` maps request_id -> donor ids already allocated;
+    they are kept, count towards the request's quota and use up the donors'
+    capacity (requests in `fixed` but not in `candidates` only hold
+    capacity). Returns {request_id: [newly allocated donor ids]}.
+    """
+    fixed = fixed or {}
+    load = Counter(donor_id for donor_ids in fixed.values() for donor_id in donor_ids)
+    demand = Counter(donor_id for donor_ids in candidates.values() for donor_id in donor_ids)
+
+    queues = {}
+    need = {}
+    for request_id, donor_ids in candidates.items():
+        held = set(fixed.get(request_id, ()))
+        need[request_id] = per_request - len(held)
+        # Least contested donors first, alert ranking breaks ties
+        ranked = sorted(
+            ((demand[donor_id], rank, donor_id) for rank, donor_id in enumerate(donor_ids) if donor_id not in held)
+        )
+        queues[request_id] = deque(donor_id for _, _, donor_id in ranked)
+
+    allocated = {request_id: [] for request_id in candidates}
+    active = [request_id for request_id in candidates if need[request_id] > 0]
+
+    while active:
+        # Scarcest first: fewest queued candidates per donor still needed
+        active.sort(key=lambda request_id: (len(queues[request_id]) / need[request_id], request_id))
+        next_round = []
+        for request_id in active:
+            queue = queues[request_id]
+            while queue and load[queue[0]] >= per_donor:
+                queue.popleft()
+            if not queue:
+                continue
+            donor_id = queue.popleft()
+            load[donor_id] += 1
+            allocated[request_id].append(donor_id)
+            need[request_id] -= 1
+            if need[request_id] > 0:
+                next_round.append(request_id)
+        active = next_round
+
+    return allocated
+
+
+def region_requests(hospital_ids):
+    """OPEN requests at hospitals sharing at least one reachable donor with `hospital_ids`"""
+    donors = DonorReachability.objects.filter(hospital_id__in=hospital_ids).values('donor_id')
+    region_hospitals = set(
+        DonorReachability.objects.filter(donor_id__in=donors).values_list('hospital_id', flat=True)
+    )
+    region_hospitals.update(hospital_ids)
+    return BloodRequest.objects.filter(
+        status=BloodRequest.RequestStatus.OPEN,
+        hospital_id__in=region_hospitals
+    ).select_related('hospital')
+
+
+def reallocate(hospital_ids):
+    """
+    Re-solve the region around `hospital_ids` and persist the new rows.
+    Returns {BloodRequest: [newly allocated donor ids]} for the requests
+    that gained donors, which the caller alerts.
+    """
+    from .services import DonorMatchingService
+
+    per_request = getattr(settings, 'DONOR_ALLOCATION_PER_REQUEST', 10)
+    per_donor = getattr(settings, 'DONOR_ALLOCATION_PER_DONOR', 1)
+
+    with transaction.atomic():
+        # Lock the region's open requests so overlapping re-solves queue up
+        # instead of handing the same donor out twice
+        requests = list(region_requests(hospital_ids).order_by('id').select_for_update(of=('self',)))
+        if not requests:
+            return {}
+
+        # Rows of requests that were closed without release() (e.g. admin
+        # bulk actions) would otherwise hold their donors forever
+        DonorAllocation.objects.exclude(request__status=BloodRequest.RequestStatus.OPEN).delete()
+
+        candidates = DonorMatchingService.find_compatible_donors_bulk(
+            requests, rank_by=getattr(settings, 'DONOR_ALERT_RANKING', None)
+        )
+        donor_ids = {donor_id for ids in candidates.values() for donor_id in ids}
+
+        fixed = {}
+        for request_id, donor_id in DonorAllocation.objects.filter(donor_id__in=donor_ids).values_list(
+            'request_id', 'donor_id'
+        ):
+            fixed.setdefault(request_id, []).append(donor_id)
+
+        allocated = solve(candidates, per_request, per_donor, fixed)
+
+        DonorAllocation.objects.bulk_create(
+            [
+                DonorAllocation(request_id=request_id, donor_id=donor_id)
+                for request_id, new_ids in allocated.items()
+                for donor_id in new_ids
+            ],
+            ignore_conflicts=True
+        )
+
+    by_id = {blood_request.id: blood_request for blood_request in requests}
+    new_allocations = {by_id[request_id]: new_ids for request_id, new_ids in allocated.items() if new_ids}
+
+    logger.info(
+        f"Allocated {sum(len(ids) for ids in new_allocations.values())} donors across "
+        f"{len(requests)} open requests ({len(donor_ids)} candidate donors)"
+    )
+    return new_allocations
+
+
+def allocate_for(blood_request):
+    """A request opened: re-solve its region"""
+    return reallocate([blood_request.hospital_id])
+
+
+def release(blood_request):
+    """
+    A request left OPEN: free its donors and re-solve its region so other
+    requests can take them. Returns the top-ups to alert.
+    """
+    released, _ = DonorAllocation.objects.filter(request=blood_request).delete()
+    logger.info(f"Released {released} donor allocations from request ID: {blood_request.id}")
+    return reallocate([blood_request.hospital_id])
+
+
+def alert(notify, new_allocations):
+    """
+    Call `notify(recipients, blood_request)` once per request with its newly
+    allocated donors, as the same Recipient records as
+    DonorMatchingService.iter_compatible_donors (e.g. queue_donor_alerts, so
+    each request is one bulk fan-out)
+    """
+    from .services import DonorMatchingService
+
+    donor_ids = {donor_id for ids in new_allocations.values() for donor_id in ids}
+    if not donor_ids:
+        return
+
+    recipients = {
+        row.id: row
+        for row in DonorMatchingService.recipient_rows(Donor.objects.filter(id__in=donor_ids))
+    }
+    for blood_request, allocated in new_allocations.items():
+        if not allocated:
+            continue
+        try:
+            notify([recipients[donor_id] for donor_id in allocated], blood_request)
+        except Exception as e:
+            logger.exception(f"Failed to alert allocated donors for request ID: {blood_request.id} - {str(e)}")
+            continue
+        logger.info(f"Notified {len(allocated)} allocated donors for request ID: {blood_request.id}")
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class BloodRequestsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.blood_requests'
+
+    def ready(self):
+        from . import signals  # noqa: F401
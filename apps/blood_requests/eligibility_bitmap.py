@@ -0,0 +1,399 @@
+"""
+Shared-memory donor eligibility bitmap.
+
+A single writer per node (`manage.py run_eligibility_writer`) keeps a
+compact bitmap index of donor eligibility in DONOR_ELIGIBILITY_BITMAP_PATH.
+Every WSGI worker on the node maps that file read-only and reads it through
+NumPy views of the mapped pages, so matching is a few vectorized ANDs/ORs
+over shared memory - no per-worker copy and no SQL.
+
+File layout (little-endian):
+
+    header        HEADER struct (magic, version, generation, rows, LGAs,
+                  day ordinal the file was built for, bytes per plane)
+    donor_ids     int64[rows]      row -> donor id
+    lga_ids       int64[LGAs]      LGA plane -> LGA id
+    eligible      plane            available, verified, past cooldown
+    types         8 planes         one per BloodCompatibility type code
+    antigens      14 planes        one per Antigens.NAMES entry, bit set if
+                                   the donor was typed negative for it
+    lgas          LGA planes       one per LGA, bit set if the donor serves it
+
+A plane is one bit per row. The writer never edits the live file: it
+writes a new one next to it and os.replace()s it, and readers remap when
+the inode changes, so a reader never sees a half-written index.
+
+Cooldowns are resolved at build time, so a file built for an earlier day
+is treated as stale and matching falls back to the database until the
+writer rebuilds it. Workers hand changed donor ids to the writer through an
+append-only journal (DONOR_ELIGIBILITY_BITMAP_PATH + '.dirty'); the writer
+also does a full rebuild every DONOR_ELIGIBILITY_BITMAP_REBUILD_INTERVAL
+seconds to pick up changes made on other nodes or by bulk `.update()` calls.
+
+NumPy is optional: without it `get_bitmap_reader()` returns None and
+DonorMatchingService stays on the ORM path.
+"""
+import mmap
+import os
+import struct
+import threading
+
+from django.conf import settings
+from django.utils import timezone
+
+from apps.core.antigens import Antigens
+from apps.core.blood_compatibility import BloodCompatibility
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - optional dependency
+    np = None
+
+import logging
+logger = logging.getLogger('apps.blood_requests')
+
+
+MAGIC = b'LLEB'
+VERSION = 2
+HEADER = struct.Struct('<4sIqIIiI')
+TYPE_PLANES = len(BloodCompatibility.BLOOD_TYPES)
+ANTIGEN_PLANES = len(Antigens.NAMES)
+LGA_PLANES_START = 1 + TYPE_PLANES + ANTIGEN_PLANES
+
+
+def bitmap_engine_enabled():
+    return getattr(settings, 'DONOR_MATCHING_ENGINE', 'orm') == 'bitmap' and np is not None
+
+
+def bitmap_path():
+    return str(getattr(settings, 'DONOR_ELIGIBILITY_BITMAP_PATH', 'donor_eligibility.bin'))
+
+
+# ----------------------------------------------------------------------
+# Writer side
+# ----------------------------------------------------------------------
+
+class EligibilityBitmapWriter:
+    """In-memory copy of the index owned by the single writer process"""
+
+    def __init__(self, path=None):
+        self.path = path or bitmap_path()
+        self.generation = 0
+        self.built_day = None
+
+    def load(self):
+        """Rebuild every plane from the database"""
+        from apps.donors.models import Donor
+
+        self.built_day = timezone.now().date()
+        rows = list(Donor.objects.values_list(
+            'id', 'blood_type', 'is_available', 'available_from', 'user__is_verified', 'antigen_negative'
+        ))
+        self.donor_ids = [row[0] for row in rows]
+        self.row_of = {donor_id: row for row, donor_id in enumerate(self.donor_ids)}
+        self.eligible = bytearray(self._plane_bytes())
+        self.types = [bytearray(self._plane_bytes()) for _ in range(TYPE_PLANES)]
+        self.antigens = [bytearray(self._plane_bytes()) for _ in range(ANTIGEN_PLANES)]
+        self.lgas = {}
+
+        for donor_id, blood_type, is_available, available_from, is_verified, antigens in rows:
+            self._set_donor(self.row_of[donor_id], blood_type, is_available, available_from, is_verified, antigens)
+        for donor_id, lga_id in Donor.service_locations.through.objects.values_list(
+            'donor_id', 'localgovernment_id'
+        ):
+            self._set_bit(self._lga_plane(lga_id), self.row_of[donor_id], True)
+
+    def patch(self, donor_ids):
+        """Re-read the given donors; new donors are appended as new rows"""
+        from apps.donors.models import Donor
+
+        donor_ids = set(donor_ids)
+        rows = Donor.objects.filter(id__in=donor_ids).values_list(
+            'id', 'blood_type', 'is_available', 'available_from', 'user__is_verified', 'antigen_negative'
+        )
+        seen = set()
+        for donor_id, blood_type, is_available, available_from, is_verified, antigens in rows:
+            seen.add(donor_id)
+            row = self.row_of.get(donor_id)
+            if row is None:
+                row = self._append_row(donor_id)
+            self._set_donor(row, blood_type, is_available, available_from, is_verified, antigens)
+            for plane in self.lgas.values():
+                self._set_bit(plane, row, False)
+
+        # Deleted donors keep their row with every bit cleared
+        for donor_id in donor_ids - seen:
+            row = self.row_of.get(donor_id)
+            if row is not None:
+                self._set_donor(row, None, False, None, False, 0)
+                for plane in self.lgas.values():
+                    self._set_bit(plane, row, False)
+
+        for donor_id, lga_id in Donor.service_locations.through.objects.filter(
+            donor_id__in=seen
+        ).values_list('donor_id', 'localgovernment_id'):
+            self._set_bit(self._lga_plane(lga_id), self.row_of[donor_id], True)
+
+    def write(self):
+        """Serialize to a temp file and atomically swap it in"""
+        self.generation += 1
+        lga_ids = sorted(self.lgas)
+        plane_bytes = self._plane_bytes()
+
+        tmp_path = f'{self.path}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(HEADER.pack(
+                MAGIC, VERSION, self.generation, len(self.donor_ids), len(lga_ids),
+                self.built_day.toordinal(), plane_bytes,
+            ))
+            f.write(struct.pack(f'<{len(self.donor_ids)}q', *self.donor_ids))
+            f.write(struct.pack(f'<{len(lga_ids)}q', *lga_ids))
+            f.write(self._padded(self.eligible))
+            for plane in self.types + self.antigens:
+                f.write(self._padded(plane))
+            for lga_id in lga_ids:
+                f.write(self._padded(self.lgas[lga_id]))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    # Row helpers
+
+    def _plane_bytes(self):
+        return (len(self.donor_ids) + 7) // 8
+
+    def _padded(self, plane):
+        # Planes grow as rows are appended; older LGA planes may be shorter
+        return bytes(plane) + bytes(self._plane_bytes() - len(plane))
+
+    def _append_row(self, donor_id):
+        row = len(self.donor_ids)
+        self.donor_ids.append(donor_id)
+        self.row_of[donor_id] = row
+        return row
+
+    def _lga_plane(self, lga_id):
+        plane = self.lgas.get(lga_id)
+        if plane is None:
+            plane = self.lgas[lga_id] = bytearray(self._plane_bytes())
+        return plane
+
+    @staticmethod
+    def _set_bit(plane, row, value):
+        byte_index, bit = divmod(row, 8)
+        if byte_index >= len(plane):
+            if not value:
+                return
+            plane.extend(bytes(byte_index + 1 - len(plane)))
+        if value:
+            plane[byte_index] |= 1 << bit
+        else:
+            plane[byte_index] &= ~(1 << bit) & 0xFF
+
+    def _set_donor(self, row, blood_type, is_available, available_from, is_verified, antigens):
+        eligible = bool(is_available and is_verified) and (
+            available_from is None or available_from <= self.built_day
+        )
+        self._set_bit(self.eligible, row, eligible)
+        code = BloodCompatibility.type_to_code(blood_type)
+        for type_code, plane in enumerate(self.types):
+            self._set_bit(plane, row, type_code == code)
+        for bit, plane in enumerate(self.antigens):
+            self._set_bit(plane, row, bool(antigens >> bit & 1))
+
+
+def acquire_writer_lock(path=None):
+    """
+    Take the per-node writer lock. Returns the open lock file (keep it open
+    for as long as the lock should be held) or None if another writer has it.
+    The writer needs flock(), so it only runs on POSIX hosts.
+    """
+    import fcntl
+
+    lock_file = open(f'{path or bitmap_path()}.lock', 'w')
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        lock_file.close()
+        return None
+    return lock_file
+
+
+def mark_dirty(donor_ids):
+    """Queue donors for the writer (called from model signals in any worker)"""
+    donor_ids = list(donor_ids)
+    if not donor_ids:
+        return
+    try:
+        # Small O_APPEND writes from concurrent processes do not interleave
+        with open(f'{bitmap_path()}.dirty', 'a') as journal:
+            journal.write(''.join(f'{donor_id}\n' for donor_id in donor_ids))
+    except OSError as e:
+        # The periodic rebuild still picks the change up
+        logger.warning(f"Could not queue donors {donor_ids} for the eligibility bitmap: {str(e)}")
+
+
+def take_dirty(path=None):
+    """Claim and empty the journal, returning the queued donor ids"""
+    journal = f'{path or bitmap_path()}.dirty'
+    claimed = f'{journal}.claimed'
+    try:
+        os.replace(journal, claimed)
+    except FileNotFoundError:
+        return set()
+    with open(claimed) as f:
+        donor_ids = {int(line) for line in f if line.strip()}
+    os.remove(claimed)
+    return donor_ids
+
+
+# ----------------------------------------------------------------------
+# Reader side
+# ----------------------------------------------------------------------
+
+class EligibilityBitmapReader:
+    """
+    Read-only view of the bitmap file, remapped when the writer swaps it.
+    The row -> donor id table and the planes are NumPy views straight over
+    the mapped pages; only the per-call area/result planes are allocated.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or bitmap_path()
+        self._lock = threading.Lock()
+        self._file_id = None
+        self._mm = None
+        self.donor_ids = None
+        self._id_order = self._sorted_ids = None
+        self._planes = None
+
+    def _refresh(self):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            self._close()
+            return False
+
+        file_id = (stat.st_ino, stat.st_mtime_ns)
+        if file_id == self._file_id:
+            return True
+
+        self._close()
+        with open(self.path, 'rb') as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, generation, rows, n_lgas, built_day, plane_bytes = HEADER.unpack_from(mm, 0)
+        if magic != MAGIC or version != VERSION:
+            mm.close()
+            logger.error(f"Ignoring donor eligibility bitmap with bad header: {self.path}")
+            return False
+
+        offset = HEADER.size
+        self.rows = rows
+        self.donor_ids = np.frombuffer(mm, dtype='<i8', count=rows, offset=offset)
+        offset += 8 * rows
+        self.lga_ids = np.frombuffer(mm, dtype='<i8', count=n_lgas, offset=offset)
+        # LGA id -> plane index; one entry per LGA, not per donor
+        self.lga_plane = {int(lga_id): index for index, lga_id in enumerate(self.lga_ids)}
+        offset += 8 * n_lgas
+
+        self._planes = np.frombuffer(
+            mm, dtype=np.uint8, count=(LGA_PLANES_START + n_lgas) * plane_bytes, offset=offset
+        ).reshape(LGA_PLANES_START + n_lgas, plane_bytes)
+        self.generation = generation
+        self.built_day = built_day
+        self.plane_bytes = plane_bytes
+        self._mm = mm
+        self._file_id = file_id
+        return True
+
+    def _close(self):
+        # Views must go before the map can be closed
+        self.donor_ids = self.lga_ids = self._planes = None
+        self._id_order = self._sorted_ids = None
+        if self._mm is not None:
+            try:
+                self._mm.close()
+            except BufferError:
+                # A caller still holds a view; the map is released with it
+                pass
+        self._mm = None
+        self._file_id = None
+
+    def is_fresh(self, today):
+        with self._lock:
+            return self._refresh() and self.built_day == today.toordinal()
+
+    def match(self, compatible_types, service_area_ids, today, antigen_mask=0):
+        """
+        Donor ids that are eligible, of a compatible type, negative for every
+        antigen in `antigen_mask` and serve one of the LGAs, or None when the
+        file is missing or built for another day.
+        """
+        with self._lock:
+            if not self._refresh() or self.built_day != today.toordinal():
+                return None
+
+            planes = self._planes
+            area = np.zeros(self.plane_bytes, dtype=np.uint8)
+            for lga_id in service_area_ids:
+                index = self.lga_plane.get(lga_id)
+                if index is not None:
+                    np.bitwise_or(area, planes[LGA_PLANES_START + index], out=area)
+            if not area.any():
+                return []
+
+            types = np.zeros(self.plane_bytes, dtype=np.uint8)
+            for blood_type in compatible_types:
+                code = BloodCompatibility.type_to_code(blood_type)
+                if code is not None:
+                    np.bitwise_or(types, planes[1 + code], out=types)
+
+            matched = np.bitwise_and(planes[0], types, out=types)
+            np.bitwise_and(matched, area, out=matched)
+            for bit in range(ANTIGEN_PLANES):
+                if antigen_mask >> bit & 1:
+                    np.bitwise_and(matched, planes[1 + TYPE_PLANES + bit], out=matched)
+
+            rows = np.flatnonzero(np.unpackbits(matched, count=self.rows, bitorder='little'))
+            return self.donor_ids[rows].tolist()
+
+    def _row_of(self, donor_id):
+        """Row of a donor id by binary search; the id order is sorted once per file"""
+        if self._id_order is None:
+            # Rows follow load order plus appended donors, so ids aren't sorted on disk
+            self._id_order = np.argsort(self.donor_ids, kind='stable')
+            self._sorted_ids = self.donor_ids[self._id_order]
+        position = int(np.searchsorted(self._sorted_ids, donor_id))
+        if position == len(self._sorted_ids) or self._sorted_ids[position] != donor_id:
+            return None
+        return int(self._id_order[position])
+
+    def donor_service_area_ids(self, donor_id, today):
+        """The donor's LGA ids, or None when the file is stale or lacks the donor"""
+        with self._lock:
+            if not self._refresh() or self.built_day != today.toordinal():
+                return None
+            row = self._row_of(donor_id)
+            if row is None:
+                return None
+
+            byte_index, bit = divmod(row, 8)
+            column = self._planes[LGA_PLANES_START:, byte_index]
+            return self.lga_ids[np.flatnonzero(column >> bit & 1)].tolist()
+
+
+_reader = None
+_reader_lock = threading.Lock()
+
+
+def get_bitmap_reader():
+    """Process-wide reader, or None when the bitmap engine is disabled"""
+    global _reader
+
+    if not bitmap_engine_enabled():
+        return None
+    with _reader_lock:
+        if _reader is None:
+            _reader = EligibilityBitmapReader()
+    return _reader
@@ -0,0 +1,132 @@
+"""
+Cache of matched donor ids per blood request.
+
+An entry is keyed by the request id, the request fields matching reads
+(hospital, blood type, component, antigen mask - editing any of them
+misses), today's date (cooldowns expire at midnight) and a version stamp
+assembled from:
+
+- one version per hospital, bumped when its service locations change
+- one version per (hospital, donor blood type), bumped when a donor of
+  that type who serves the hospital changes availability, cooldown,
+  verification, blood type or service locations
+
+so a donor edit only invalidates requests of the hospitals that donor can
+reach and whose compatible types include the donor's type. Invalidation
+never deletes entries: bumping a version makes old keys unreachable and
+they expire after DONOR_MATCH_CACHE_TIMEOUT, which also bounds drift
+from bulk `.update()` calls that bypass signals.
+
+Uses Django's default cache and is off by default. With the default
+per-process LocMemCache each worker invalidates only its own entries, so
+only set DONOR_MATCH_CACHE_TIMEOUT with a shared CACHES backend when
+running several workers.
+"""
+import threading
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+import logging
+logger = logging.getLogger('apps.blood_requests')
+
+
+_stats = {'hits': 0, 'misses': 0, 'invalidations': 0}
+_stats_lock = threading.Lock()
+
+
+def _count(name, amount=1):
+    with _stats_lock:
+        _stats[name] += amount
+
+
+def cache_timeout():
+    return getattr(settings, 'DONOR_MATCH_CACHE_TIMEOUT', 0)
+
+
+def cache_enabled():
+    return cache_timeout() > 0
+
+
+def _hospital_version_key(hospital_id):
+    return f'match:v:h{hospital_id}'
+
+
+def _type_version_key(hospital_id, blood_type):
+    return f'match:v:h{hospital_id}:{blood_type}'
+
+
+def _entry_key(blood_request, compatible_types):
+    version_keys = [_hospital_version_key(blood_request.hospital_id)] + [
+        _type_version_key(blood_request.hospital_id, blood_type) for blood_type in compatible_types
+    ]
+    versions = cache.get_many(version_keys)
+    stamp = '.'.join(str(versions.get(key, 0)) for key in version_keys)
+    fields = (
+        f'h{blood_request.hospital_id}:{blood_request.blood_type}:'
+        f'{blood_request.component}:a{blood_request.antigen_negative_required or 0}'
+    )
+    return f'match:r{blood_request.id}:{fields}:{timezone.now().date().isoformat()}:{stamp}'
+
+
+def get_matched_donor_ids(blood_request, compatible_types, compute):
+    """
+    Cached list of matched donor ids for the request; `compute()` is called
+    (and its result stored) on a miss.
+    """
+    if not cache_enabled() or blood_request.id is None:
+        return compute()
+
+    key = _entry_key(blood_request, compatible_types)
+    donor_ids = cache.get(key)
+    if donor_ids is not None:
+        _count('hits')
+        return donor_ids
+
+    _count('misses')
+    donor_ids = list(compute())
+    cache.set(key, donor_ids, cache_timeout())
+    return donor_ids
+
+
+def _bump(keys):
+    for key in keys:
+        try:
+            cache.incr(key)
+        except ValueError:
+            # Missing versions read as 0, so starting at 1 still invalidates
+            cache.add(key, 1, timeout=None)
+    _count('invalidations', len(keys))
+
+
+def invalidate_hospitals(hospital_ids):
+    """A hospital's service areas changed: every one of its requests is stale"""
+    if cache_enabled():
+        _bump([_hospital_version_key(hospital_id) for hospital_id in set(hospital_ids)])
+
+
+def invalidate_donor_types(hospital_ids, blood_types):
+    """Donors of `blood_types` serving `hospital_ids` changed"""
+    if cache_enabled():
+        _bump([
+            _type_version_key(hospital_id, blood_type)
+            for hospital_id in set(hospital_ids)
+            for blood_type in set(blood_types)
+            if blood_type
+        ])
+
+
+def stats():
+    """Hit/miss/invalidation counters for this process"""
+    with _stats_lock:
+        snapshot = dict(_stats)
+    lookups = snapshot['hits'] + snapshot['misses']
+    snapshot['hit_rate'] = snapshot['hits'] / lookups if lookups else 0.0
+    return snapshot
+
+
+def reset_stats():
+    with _stats_lock:
+        for name in _stats:
+            _stats[name] = 0
@@ -0,0 +1,268 @@
+"""
+Columnar in-process donor matching engine.
+
+Keeps a NumPy snapshot of every donor's match-relevant columns (blood type
+code, available_from as a day ordinal, availability/verification flags,
+the antigen-negative mask and an LGA membership bitset) so a match is a handful of vectorized masks
+instead of a four-way join. The snapshot is patched per donor from model
+signals (see signals.py) and fully reloaded once it is older than
+DONOR_MATCHING_SNAPSHOT_TTL, which bounds drift from bulk `.update()` calls
+and from saves made in other worker processes.
+
+NumPy is optional: when it is not installed `get_columnar_index()` returns
+None and DonorMatchingService stays on the ORM path.
+"""
+import threading
+import time
+
+from django.conf import settings
+
+from apps.core.blood_compatibility import BloodCompatibility
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - optional dependency
+    np = None
+
+import logging
+logger = logging.getLogger('apps.blood_requests')
+
+
+UNKNOWN_TYPE_CODE = len(BloodCompatibility.BLOOD_TYPES)  # never set in any mask
+WORD_BITS = 64
+
+
+class ColumnarDonorIndex:
+    """Vectorized snapshot of donor eligibility columns"""
+
+    def __init__(self, initial_capacity=1024):
+        self._lock = threading.RLock()
+        self._initial_capacity = initial_capacity
+        self._loaded_at = None
+        self._reset(initial_capacity, n_words=1)
+
+    def _reset(self, capacity, n_words):
+        self.size = 0
+        self.capacity = capacity
+        self.row_of = {}            # donor_id -> row
+        self.lga_bit = {}           # lga_id -> bit position
+        self.donor_ids = np.zeros(capacity, dtype=np.int64)
+        self.type_codes = np.full(capacity, UNKNOWN_TYPE_CODE, dtype=np.uint8)
+        self.available_from = np.zeros(capacity, dtype=np.int32)   # 0 == no cooldown
+        self.is_available = np.zeros(capacity, dtype=bool)
+        self.is_verified = np.zeros(capacity, dtype=bool)
+        self.active = np.zeros(capacity, dtype=bool)
+        self.antigen_negative = np.zeros(capacity, dtype=np.uint32)
+        self.lga_words = np.zeros((capacity, n_words), dtype=np.uint64)
+
+    @property
+    def is_loaded(self):
+        return self._loaded_at is not None
+
+    def is_stale(self):
+        ttl = getattr(settings, 'DONOR_MATCHING_SNAPSHOT_TTL', 300)
+        return not self.is_loaded or (time.monotonic() - self._loaded_at) > ttl
+
+    # ------------------------------------------------------------------
+    # Loading
+    # ------------------------------------------------------------------
+
+    def load(self):
+        """Rebuild the whole snapshot from the database"""
+        from apps.donors.models import Donor
+
+        started = time.monotonic()
+        rows = list(
+            Donor.objects.values_list(
+                'id', 'blood_type', 'is_available', 'available_from', 'user__is_verified', 'antigen_negative'
+            )
+        )
+        memberships = _memberships_for(None)
+
+        with self._lock:
+            capacity = max(self._initial_capacity, len(rows) * 2)
+            self._reset(capacity, n_words=1)
+            for lga_id in sorted({lga_id for _, lga_id in memberships}):
+                self._bit_for(lga_id)
+
+            lga_by_donor = {}
+            for donor_id, lga_id in memberships:
+                lga_by_donor.setdefault(donor_id, []).append(lga_id)
+
+            for donor_id, blood_type, is_available, available_from, is_verified, antigens in rows:
+                self._write_row(
+                    donor_id, blood_type, is_available, available_from, is_verified, antigens,
+                    lga_by_donor.get(donor_id, ()),
+                )
+
+            self._loaded_at = time.monotonic()
+
+        logger.info(
+            f"Columnar donor index loaded: {len(rows)} donors, {len(self.lga_bit)} LGAs "
+            f"in {(time.monotonic() - started) * 1000:.1f}ms"
+        )
+
+    def ensure_fresh(self):
+        if self.is_stale():
+            self.load()
+
+    def refresh_donors(self, donor_ids):
+        """Re-read the given donors from the database and patch their rows"""
+        from apps.donors.models import Donor
+
+        donor_ids = set(donor_ids)
+        if not donor_ids or not self.is_loaded:
+            return
+
+        rows = Donor.objects.filter(id__in=donor_ids).values_list(
+            'id', 'blood_type', 'is_available', 'available_from', 'user__is_verified', 'antigen_negative'
+        )
+        lga_by_donor = {}
+        for donor_id, lga_id in _memberships_for(donor_ids):
+            lga_by_donor.setdefault(donor_id, []).append(lga_id)
+
+        with self._lock:
+            seen = set()
+            for donor_id, blood_type, is_available, available_from, is_verified, antigens in rows:
+                seen.add(donor_id)
+                self._write_row(
+                    donor_id, blood_type, is_available, available_from, is_verified, antigens,
+                    lga_by_donor.get(donor_id, ()),
+                )
+            for donor_id in donor_ids - seen:
+                self._drop_row(donor_id)
+
+    def remove_donor(self, donor_id):
+        with self._lock:
+            self._drop_row(donor_id)
+
+    # ------------------------------------------------------------------
+    # Matching
+    # ------------------------------------------------------------------
+
+    def match(self, compatible_types, service_area_ids, today, antigen_mask=0):
+        """
+        Return donor IDs that are active, available, verified, past cooldown,
+        of a compatible type, negative for every antigen in `antigen_mask`
+        and serve at least one of the given LGAs.
+        """
+        donor_mask = BloodCompatibility.types_to_mask(compatible_types)
+
+        with self._lock:
+            n = self.size
+            if n == 0 or donor_mask == 0:
+                return []
+
+            area_words = np.zeros(self.lga_words.shape[1], dtype=np.uint64)
+            for lga_id in service_area_ids:
+                bit = self.lga_bit.get(lga_id)
+                if bit is not None:
+                    area_words[bit // WORD_BITS] |= np.uint64(1) << np.uint64(bit % WORD_BITS)
+            if not area_words.any():
+                return []
+
+            eligible = self.active[:n] & self.is_available[:n] & self.is_verified[:n]
+            eligible &= self.available_from[:n] <= today.toordinal()
+            eligible &= (np.right_shift(donor_mask, self.type_codes[:n]) & 1).astype(bool)
+            eligible &= (self.lga_words[:n] & area_words).any(axis=1)
+            if antigen_mask:
+                eligible &= (self.antigen_negative[:n] & np.uint32(antigen_mask)) == antigen_mask
+
+            return self.donor_ids[:n][eligible].tolist()
+
+    # ------------------------------------------------------------------
+    # Row helpers (caller holds the lock)
+    # ------------------------------------------------------------------
+
+    def _bit_for(self, lga_id):
+        bit = self.lga_bit.get(lga_id)
+        if bit is None:
+            bit = len(self.lga_bit)
+            self.lga_bit[lga_id] = bit
+            if bit // WORD_BITS >= self.lga_words.shape[1]:
+                extra = np.zeros((self.capacity, 1), dtype=np.uint64)
+                self.lga_words = np.hstack([self.lga_words, extra])
+        return bit
+
+    def _grow(self):
+        new_capacity = self.capacity * 2
+        for name in ('donor_ids', 'type_codes', 'available_from', 'is_available',
+                     'is_verified', 'active', 'antigen_negative', 'lga_words'):
+            old = getattr(self, name)
+            new = np.zeros((new_capacity,) + old.shape[1:], dtype=old.dtype)
+            if name == 'type_codes':
+                new.fill(UNKNOWN_TYPE_CODE)
+            new[:self.capacity] = old
+            setattr(self, name, new)
+        self.capacity = new_capacity
+
+    def _write_row(self, donor_id, blood_type, is_available, available_from, is_verified, antigens, lga_ids):
+        row = self.row_of.get(donor_id)
+        if row is None:
+            if self.size == self.capacity:
+                self._grow()
+            row = self.size
+            self.size += 1
+            self.row_of[donor_id] = row
+
+        code = BloodCompatibility.type_to_code(blood_type)
+        self.donor_ids[row] = donor_id
+        self.type_codes[row] = UNKNOWN_TYPE_CODE if code is None else code
+        self.available_from[row] = available_from.toordinal() if available_from else 0
+        self.is_available[row] = bool(is_available)
+        self.is_verified[row] = bool(is_verified)
+        self.antigen_negative[row] = antigens
+        self.active[row] = True
+
+        # Assign bits first: a new LGA may widen lga_words
+        bits = [self._bit_for(lga_id) for lga_id in lga_ids]
+        words = np.zeros(self.lga_words.shape[1], dtype=np.uint64)
+        for bit in bits:
+            words[bit // WORD_BITS] |= np.uint64(1) << np.uint64(bit % WORD_BITS)
+        self.lga_words[row] = words
+
+    def _drop_row(self, donor_id):
+        # Rows are tombstoned rather than compacted; the next full load()
+        # reclaims them
+        row = self.row_of.pop(donor_id, None)
+        if row is not None:
+            self.active[row] = False
+            self.lga_words[row] = 0
+
+
+def _memberships_for(donor_ids):
+    """(donor_id, lga_id) pairs straight from the M2M through table"""
+    from apps.donors.models import Donor
+
+    through = Donor.service_locations.through.objects.all()
+    if donor_ids is not None:
+        through = through.filter(donor_id__in=donor_ids)
+    return list(through.values_list('donor_id', 'localgovernment_id'))
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def columnar_engine_enabled():
+    return getattr(settings, 'DONOR_MATCHING_ENGINE', 'orm') == 'columnar' and np is not None
+
+
+def get_columnar_index(load=True):
+    """
+    Process-wide ColumnarDonorIndex, or None when the engine is disabled or
+    NumPy is unavailable. With load=False an unloaded index is returned as-is
+    (used by signal handlers, which only patch an index that already exists).
+    """
+    global _index
+
+    if not columnar_engine_enabled():
+        return None
+
+    with _index_lock:
+        if _index is None:
+            _index = ColumnarDonorIndex()
+
+    if load:
+        _index.ensure_fresh()
+    return _index
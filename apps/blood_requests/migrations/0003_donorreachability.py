@@ -0,0 +1,41 @@
+# Generated by Django 5.2.6 on 2026-10-17 06:31
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_reachability(apps, schema_editor):
+    from apps.blood_requests.reachability import rebuild_all
+
+    rebuild_all(
+        donor_model=apps.get_model('donors', 'Donor'),
+        hospital_model=apps.get_model('hospitals', 'Hospital'),
+        reachability_model=apps.get_model('blood_requests', 'DonorReachability'),
+        using=schema_editor.connection.alias,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blood_requests', '0002_donorresponse_fulfilled'),
+        ('donors', '0002_alter_donor_available_from'),
+        ('hospitals', '0002_alter_hospital_user'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DonorReachability',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('donor_blood_type', models.CharField(choices=[('A+', 'A+'), ('A-', 'A-'), ('B+', 'B+'), ('B-', 'B-'), ('AB+', 'AB+'), ('AB-', 'AB-'), ('O+', 'O+'), ('O-', 'O-')], max_length=3)),
+                ('donor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reachable_hospitals', to='donors.donor')),
+                ('hospital', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reachable_donors', to='hospitals.hospital')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['hospital', 'donor_blood_type', 'donor'], name='reach_hosp_type_donor_idx')],
+                'unique_together': {('hospital', 'donor')},
+            },
+        ),
+        migrations.RunPython(backfill_reachability, migrations.RunPython.noop),
+    ]
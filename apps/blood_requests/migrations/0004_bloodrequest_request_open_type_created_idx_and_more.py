@@ -0,0 +1,26 @@
+# Generated by Django 5.2.6 on 2026-10-17 06:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blood_requests', '0003_donorreachability'),
+        ('hospitals', '0002_alter_hospital_user'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='bloodrequest',
+            index=models.Index(condition=models.Q(('status', 'OPEN')), fields=['blood_type', '-created_at'], name='request_open_type_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bloodrequest',
+            index=models.Index(fields=['status', 'blood_type', 'created_at'], name='request_status_type_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bloodrequest',
+            index=models.Index(fields=['hospital', '-created_at'], name='request_hospital_created_idx'),
+        ),
+    ]
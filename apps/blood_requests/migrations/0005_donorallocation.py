@@ -0,0 +1,27 @@
+# Generated by Django 5.2.6 on 2026-10-17 06:37
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blood_requests', '0004_bloodrequest_request_open_type_created_idx_and_more'),
+        ('donors', '0003_donor_donor_available_type_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DonorAllocation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('allocated_at', models.DateTimeField(auto_now_add=True)),
+                ('donor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='allocations', to='donors.donor')),
+                ('request', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='allocations', to='blood_requests.bloodrequest')),
+            ],
+            options={
+                'unique_together': {('request', 'donor')},
+            },
+        ),
+    ]
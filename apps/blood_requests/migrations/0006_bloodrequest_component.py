@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-17 06:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blood_requests', '0005_donorallocation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bloodrequest',
+            name='component',
+            field=models.CharField(choices=[('RED_CELLS', 'Red cells'), ('WHOLE_BLOOD', 'Whole blood'), ('PLASMA', 'Plasma'), ('PLATELETS', 'Platelets')], default='RED_CELLS', max_length=20),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-17 06:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blood_requests', '0006_bloodrequest_component'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bloodrequest',
+            name='antigen_negative_required',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
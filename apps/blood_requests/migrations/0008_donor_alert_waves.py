@@ -0,0 +1,53 @@
+# Generated by Django 5.2.6 on 2026-10-17 06:54
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blood_requests', '0007_bloodrequest_antigen_negative_required'),
+        ('donors', '0005_donor_notification_channel'),
+        ('hospitals', '0002_alter_hospital_user'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DonorAlert',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('wave', models.PositiveSmallIntegerField(default=1)),
+                ('channel', models.CharField(choices=[('EMAIL', 'Email'), ('SMS', 'SMS'), ('PUSH', 'Push notification')], max_length=5)),
+                ('alerted_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='bloodrequest',
+            name='alert_waves_sent',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='bloodrequest',
+            name='next_alert_wave_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='bloodrequest',
+            index=models.Index(condition=models.Q(('next_alert_wave_at__isnull', False)), fields=['next_alert_wave_at'], name='request_next_wave_idx'),
+        ),
+        migrations.AddField(
+            model_name='donoralert',
+            name='donor',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='alerts', to='donors.donor'),
+        ),
+        migrations.AddField(
+            model_name='donoralert',
+            name='request',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='alerts', to='blood_requests.bloodrequest'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='donoralert',
+            unique_together={('request', 'donor')},
+        ),
+    ]
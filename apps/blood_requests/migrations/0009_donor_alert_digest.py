@@ -0,0 +1,27 @@
+# Generated by Django 5.2.6 on 2026-10-17 06:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blood_requests', '0008_donor_alert_waves'),
+        ('donors', '0005_donor_notification_channel'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='donoralert',
+            name='delivery',
+            field=models.CharField(choices=[('SENT', 'Sent'), ('DEFERRED', 'Deferred to digest'), ('DIGEST', 'Sent in digest'), ('DROPPED', 'Dropped (request closed)')], default='SENT', max_length=10),
+        ),
+        migrations.AddIndex(
+            model_name='donoralert',
+            index=models.Index(fields=['donor', 'alerted_at'], name='alert_donor_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='donoralert',
+            index=models.Index(condition=models.Q(('delivery', 'DEFERRED')), fields=['donor'], name='alert_deferred_donor_idx'),
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.6 on 2026-10-17 07:00
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import F
+
+
+def backfill_needed_by(apps, schema_editor):
+    """Existing requests were all treated as urgent"""
+    BloodRequest = apps.get_model('blood_requests', 'BloodRequest')
+    hours = getattr(settings, 'BLOOD_REQUEST_DEADLINE_HOURS', {}).get('URGENT', 6)
+    BloodRequest.objects.filter(needed_by__isnull=True).update(
+        needed_by=F('created_at') + timedelta(hours=hours)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blood_requests', '0009_donor_alert_digest'),
+        ('hospitals', '0002_alter_hospital_user'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='bloodrequest',
+            name='request_next_wave_idx',
+        ),
+        migrations.AddField(
+            model_name='bloodrequest',
+            name='needed_by',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='bloodrequest',
+            name='urgency',
+            field=models.CharField(choices=[('CRITICAL', 'Critical'), ('URGENT', 'Urgent'), ('ROUTINE', 'Routine')], default='URGENT', max_length=10),
+        ),
+        migrations.RunPython(backfill_needed_by, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='bloodrequest',
+            name='needed_by',
+            field=models.DateTimeField(blank=True),
+        ),
+        migrations.AddIndex(
+            model_name='bloodrequest',
+            index=models.Index(condition=models.Q(('next_alert_wave_at__isnull', False)), fields=['needed_by', 'next_alert_wave_at'], name='request_next_wave_idx'),
+        ),
+    ]
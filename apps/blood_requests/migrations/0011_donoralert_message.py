@@ -0,0 +1,20 @@
+# Generated by Django 5.2.6 on 2026-10-17 07:08
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blood_requests', '0010_urgency_deadline'),
+        ('core', '0004_outboxmessage_html_body'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='donoralert',
+            name='message',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='core.outboxmessage'),
+        ),
+    ]
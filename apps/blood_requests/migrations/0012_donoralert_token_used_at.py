@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-17 07:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blood_requests', '0011_donoralert_message'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='donoralert',
+            name='token_used_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.6 on 2026-10-17 07:42
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blood_requests', '0012_donoralert_token_used_at'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='bloodrequest',
+            name='request_open_type_created_idx',
+        ),
+    ]
@@ -1,4 +1,9 @@
+from datetime import timedelta
+
+from django.conf import settings
 from django.db import models
+from django.utils import timezone
+from apps.core.models import NotificationChannel
 
 # Create your models here.
 class BloodType(models.TextChoices):
@@ -18,19 +23,64 @@ class BloodRequest(models.Model):
         FULFILLED = 'FULFILLED', 'Fulfilled'
         CANCELLED = 'CANCELLED', 'Cancelled'
 
+    class Component(models.TextChoices):
+        # Values match BloodCompatibility.COMPONENTS
+        RED_CELLS = 'RED_CELLS', 'Red cells'
+        WHOLE_BLOOD = 'WHOLE_BLOOD', 'Whole blood'
+        PLASMA = 'PLASMA', 'Plasma'
+        PLATELETS = 'PLATELETS', 'Platelets'
+
+    class Urgency(models.TextChoices):
+        CRITICAL = 'CRITICAL', 'Critical'
+        URGENT = 'URGENT', 'Urgent'
+        ROUTINE = 'ROUTINE', 'Routine'
+
     hospital = models.ForeignKey('hospitals.Hospital', on_delete=models.CASCADE, related_name='requests')
     blood_type = models.CharField(max_length=3, choices=BloodType.choices)
+    component = models.CharField(max_length=20, choices=Component.choices, default=Component.RED_CELLS)
+    # Antigens donors must be negative for (patient antibodies), as an Antigens mask
+    antigen_negative_required = models.PositiveIntegerField(default=0)
     contact_phone = models.CharField(max_length=20)
     notes = models.TextField(blank=True)
     status = models.CharField(max_length=20, choices=RequestStatus.choices, default=RequestStatus.OPEN)
+    urgency = models.CharField(max_length=10, choices=Urgency.choices, default=Urgency.URGENT)
+    # Deadline; alert work is dispatched earliest-deadline-first. Defaults from urgency on save.
+    needed_by = models.DateTimeField(blank=True)
+    # Staged alerts (waves.py): waves sent so far, and when the next one is due
+    alert_waves_sent = models.PositiveSmallIntegerField(default=0)
+    next_alert_wave_at = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Wave scheduler: requests with a wave due, earliest deadline first
+            models.Index(
+                fields=['needed_by', 'next_alert_wave_at'],
+                condition=models.Q(next_alert_wave_at__isnull=False),
+                name='request_next_wave_idx',
+            ),
+            # Donor-facing list: OPEN requests of given types (the few matches
+            # are sorted newest first after the lookup)
+            models.Index(fields=['status', 'blood_type', 'created_at'], name='request_status_type_idx'),
+            # Hospital-facing list: own requests, newest first
+            models.Index(fields=['hospital', '-created_at'], name='request_hospital_created_idx'),
+        ]
 
     def __str__(self):
-        return f"{self.blood_type} - {self.hospital.name} ({self.status})"
+        return f"{self.blood_type} {self.get_component_display()} - {self.hospital.name} ({self.status})"
+
+    @classmethod
+    def default_deadline(cls, urgency, start=None):
+        """`start` plus the BLOOD_REQUEST_DEADLINE_HOURS allowance for `urgency`"""
+        hours = getattr(settings, 'BLOOD_REQUEST_DEADLINE_HOURS', {}).get(urgency, 24)
+        return (start or timezone.now()) + timedelta(hours=hours)
+
+    def save(self, *args, **kwargs):
+        if self.needed_by is None:
+            self.needed_by = self.default_deadline(self.urgency)
+        super().save(*args, **kwargs)
     
 
 class DonorResponse(models.Model):
@@ -44,3 +94,84 @@ class DonorResponse(models.Model):
     class Meta:
         unique_together = ['request', 'donor']
 
+
+
+class DonorReachability(models.Model):
+    """
+    Materialized hospital -> donor reachability: one row per (hospital, donor)
+    whose service locations overlap. Maintained by signals in signals.py and
+    rebuilt with `manage.py rebuild_reachability`.
+    """
+    hospital = models.ForeignKey('hospitals.Hospital', on_delete=models.CASCADE, related_name='reachable_donors')
+    donor = models.ForeignKey('donors.Donor', on_delete=models.CASCADE, related_name='reachable_hospitals')
+    donor_blood_type = models.CharField(max_length=3, choices=BloodType.choices)
+
+    class Meta:
+        unique_together = ['hospital', 'donor']
+        indexes = [
+            # Covers the matching lookup: hospital + blood type -> donor ids
+            models.Index(fields=['hospital', 'donor_blood_type', 'donor'], name='reach_hosp_type_donor_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.hospital_id} -> {self.donor_id} ({self.donor_blood_type})"
+
+
+class DonorAllocation(models.Model):
+    """
+    Donors the scarce-type allocator (allocation.py) assigned to an OPEN
+    request. A row means the donor was alerted for that request, so rows
+    are kept while the request stays open and only new ones are added.
+    """
+    request = models.ForeignKey(BloodRequest, on_delete=models.CASCADE, related_name='allocations')
+    donor = models.ForeignKey('donors.Donor', on_delete=models.CASCADE, related_name='allocations')
+    allocated_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ['request', 'donor']
+
+    def __str__(self):
+        return f"{self.request_id} -> {self.donor_id}"
+
+
+class DonorAlert(models.Model):
+    """
+    Ledger of alerts sent to donors: one row per (request, donor), written
+    when the alert is queued, with the wave it went out in (waves.py).
+    Alerts for a donor alerted within DONOR_ALERT_DEDUPE_WINDOW are
+    DEFERRED and later collapse into one digest (notifications.py).
+    """
+    class Delivery(models.TextChoices):
+        SENT = 'SENT', 'Sent'
+        DEFERRED = 'DEFERRED', 'Deferred to digest'
+        DIGEST = 'DIGEST', 'Sent in digest'
+        DROPPED = 'DROPPED', 'Dropped (request closed)'
+
+    request = models.ForeignKey(BloodRequest, on_delete=models.CASCADE, related_name='alerts')
+    donor = models.ForeignKey('donors.Donor', on_delete=models.CASCADE, related_name='alerts')
+    wave = models.PositiveSmallIntegerField(default=1)
+    channel = models.CharField(max_length=5, choices=NotificationChannel.choices)
+    delivery = models.CharField(max_length=10, choices=Delivery.choices, default=Delivery.SENT)
+    alerted_at = models.DateTimeField(auto_now_add=True)
+    # Set when the donor used the one-click accept link (accept_tokens.py); links work once
+    token_used_at = models.DateTimeField(null=True, blank=True)
+    # Outbox message that carried the alert or digest (delivery metrics)
+    message = models.ForeignKey(
+        'core.OutboxMessage', on_delete=models.SET_NULL, null=True, blank=True, related_name='+'
+    )
+
+    class Meta:
+        unique_together = ['request', 'donor']
+        indexes = [
+            # Dedupe anti-join: was this donor messaged since the window start?
+            models.Index(fields=['donor', 'alerted_at'], name='alert_donor_recent_idx'),
+            # Digest scheduler: deferred alerts by donor
+            models.Index(
+                fields=['donor'],
+                condition=models.Q(delivery='DEFERRED'),
+                name='alert_deferred_donor_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.request_id} -> {self.donor_id} (wave {self.wave})"
@@ -0,0 +1,331 @@
+"""
+Donor alerts for blood requests, routed to each donor's preferred channel
+(apps.core.channels.route) and queued in the notification outbox.
+
+Recipients are the slim Recipient records streamed by
+DonorMatchingService.recipient_rows(). Every queued alert is also recorded
+in the DonorAlert ledger and posted to the donor's in-app inbox
+(apps/donors/inbox.py), deferred ones included. The ledger holds one row
+per (request, donor), so re-running a fan-out (an admin edit, a repeated
+allocation) only alerts donors not alerted for the request yet.
+
+Dedupe: with DONOR_ALERT_DEDUPE_WINDOW set, a donor who was messaged less
+than that many seconds ago is not alerted again right away. The alert is
+recorded as DEFERRED instead, and once the window since their last message
+has passed `send_digests()` (run by the run_notification_waves scheduler)
+sends one digest listing every deferred request that is still OPEN.
+
+Message content comes from templates/blood_requests/alerts/ (a short line
+for SMS/push, text and HTML parts for email). Django caches the compiled
+templates, and an alert is rendered once per request (render_alert) with
+only the greeting filled in per donor, so a large fan-out costs one render.
+"""
+from datetime import timedelta
+from itertools import groupby
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Case, Count, Exists, Max, Min, OuterRef, Q, Value, When
+from django.template.loader import render_to_string
+from django.utils import timezone
+from django.utils.html import escape
+
+from apps.core import metrics
+from apps.core.channels import route
+from apps.core.models import NotificationChannel, OutboxMessage
+from apps.core.outbox import enqueue_messages
+from apps.donors import inbox
+from apps.donors.models import Donor
+from . import accept_tokens
+from .models import BloodRequest, DonorAlert
+
+import logging
+logger = logging.getLogger('apps.blood_requests')
+
+# Stand in for the donor's greeting and accept-link token in content
+# rendered once per request
+GREETING_SLOT = '[[greeting]]'
+TOKEN_SLOT = '[[token]]'
+
+
+def dedupe_window():
+    return getattr(settings, 'DONOR_ALERT_DEDUPE_WINDOW', 0)
+
+
+def dedupe_since(now=None):
+    """Start of the dedupe window, or None when dedupe is off"""
+    window = dedupe_window()
+    if not window:
+        return None
+    return (now or timezone.now()) - timedelta(seconds=window)
+
+
+class RenderedAlert:
+    """
+    A request's alert content, rendered once per request: the SMS/push line,
+    and the email text and HTML, with slots for the donor's greeting and
+    signed accept-link token
+    """
+
+    __slots__ = ('blood_request_id', 'deadline', 'subject', 'short', 'text', 'html')
+
+    def __init__(self, blood_request_id, deadline, subject, short, text, html):
+        self.blood_request_id = blood_request_id
+        self.deadline = deadline
+        self.subject = subject
+        self.short = short
+        self.text = text
+        self.html = html
+
+    def inbox_body(self):
+        """The SMS/push line without a token; the inbox is read signed in"""
+        return self.short.replace(TOKEN_SLOT, '')
+
+    def message(self, recipient):
+        """(channel, address, subject, body, deadline, html_body) for one donor"""
+        channel, address = route(
+            recipient.preferred_channel,
+            recipient.email,
+            recipient.phone,
+            recipient.push_token
+        )
+        token = ''
+        if self.blood_request_id is not None:
+            token = f"?token={accept_tokens.make_token(self.blood_request_id, recipient.id)}"
+
+        if channel != NotificationChannel.EMAIL:
+            # SMS/push: one short line
+            return channel, address, self.subject, self.short.replace(TOKEN_SLOT, token), self.deadline, ''
+
+        greeting = f"Hello {recipient.first_name},"
+        return (
+            channel, address, self.subject,
+            self.text.replace(GREETING_SLOT, greeting, 1).replace(TOKEN_SLOT, token),
+            self.deadline,
+            self.html.replace(GREETING_SLOT, escape(greeting), 1).replace(TOKEN_SLOT, escape(token))
+        )
+
+
+def _render(name, context):
+    """Render the short, text and HTML parts of templates/blood_requests/alerts/<name>"""
+    context = dict(context, greeting=GREETING_SLOT)
+    return (
+        render_to_string(f'blood_requests/alerts/{name}_short.txt', context).strip(),
+        render_to_string(f'blood_requests/alerts/{name}.txt', context).strip() + '\n',
+        render_to_string(f'blood_requests/alerts/{name}.html', context),
+    )
+
+
+def _request_context(blood_request, token=TOKEN_SLOT):
+    hospital = blood_request.hospital
+    return {
+        'blood_request': blood_request,
+        'hospital': hospital,
+        'location': hospital.primary_location,
+        'urgency': blood_request.get_urgency_display(),
+        'needed_by': timezone.localtime(blood_request.needed_by).strftime('%d %b %H:%M'),
+        'accept_url': f"{settings.FRONTEND_URL}/requests/{blood_request.id}/accept/{token}",
+    }
+
+
+def render_alert(blood_request):
+    """Render a request's alert once; RenderedAlert.message() personalises it per donor"""
+    return RenderedAlert(
+        blood_request.id,
+        blood_request.needed_by,
+        f"{blood_request.get_urgency_display()}: {blood_request.blood_type} Blood Needed",
+        *_render('donor_alert', _request_context(blood_request))
+    )
+
+
+def donor_alert(recipient, blood_request):
+    """(channel, address, subject, body, deadline, html_body) alerting one donor"""
+    return render_alert(blood_request).message(recipient)
+
+
+def _record(alerts, blood_request, wave, message_ids=None):
+    """
+    Write DonorAlert rows for [(donor_id, channel, delivery)], linking SENT
+    alerts to their queued outbox message through `message_ids`
+    ({donor_id: message id})
+    """
+    message_ids = message_ids or {}
+    DonorAlert.objects.bulk_create(
+        [
+            DonorAlert(
+                request=blood_request, donor_id=donor_id, wave=wave, channel=channel, delivery=delivery,
+                message_id=message_ids.get(donor_id) if delivery == DonorAlert.Delivery.SENT else None
+            )
+            for donor_id, channel, delivery in alerts
+        ],
+        ignore_conflicts=True
+    )
+
+
+def queue_donor_alerts(recipients, blood_request, chunk_size=500, wave=1):
+    """
+    Queue alerts for an iterable of recipients with one bulk INSERT per
+    `chunk_size` donors; recipients flagged recently_alerted are deferred
+    to their digest, and donors already in the request's ledger are
+    skipped. Returns the number alerted (queued or deferred).
+    """
+    queued = 0
+    chunk = []
+    rendered = render_alert(blood_request)
+
+    def flush(chunk):
+        already_alerted = set(
+            DonorAlert.objects.filter(request=blood_request, donor_id__in=[recipient.id for recipient in chunk])
+            .values_list('donor_id', flat=True)
+        )
+        alerts, sent_to, ledger = [], [], []
+        for recipient in chunk:
+            if recipient.id in already_alerted:
+                continue
+            if recipient.recently_alerted:
+                ledger.append((recipient.id, recipient.preferred_channel, DonorAlert.Delivery.DEFERRED))
+            else:
+                alert = rendered.message(recipient)
+                alerts.append(alert)
+                sent_to.append(recipient.id)
+                ledger.append((recipient.id, alert[0], DonorAlert.Delivery.SENT))
+
+        messages = enqueue_messages(alerts)
+        _record(ledger, blood_request, wave, {donor_id: message.id for donor_id, message in zip(sent_to, messages)})
+        inbox.post([donor_id for donor_id, _, _ in ledger], rendered.subject, rendered.inbox_body(), blood_request)
+        return len(ledger)
+
+    for recipient in recipients:
+        chunk.append(recipient)
+        if len(chunk) >= chunk_size:
+            queued += flush(chunk)
+            chunk = []
+    if chunk:
+        queued += flush(chunk)
+    return queued
+
+
+def record_request_metrics(message_ids, sent_at):
+    """
+    Live per-request metrics for a delivered outbox batch, with the same
+    definitions as `manage.py notification_metrics`: once every alert of a
+    request has left the outbox and no further wave is due, observe its
+    donors alerted and the time from posting to its last alert sent.
+    Recorded once per request (a cache key claims it).
+    """
+    request_ids = set(
+        DonorAlert.objects.filter(message_id__in=message_ids).values_list('request_id', flat=True)
+    )
+    if not request_ids:
+        return
+    outstanding = DonorAlert.objects.filter(request=OuterRef('pk')).filter(
+        Q(delivery=DonorAlert.Delivery.DEFERRED)
+        | Q(message__status__in=[OutboxMessage.Status.PENDING, OutboxMessage.Status.SENDING])
+    )
+    finished = (
+        BloodRequest.objects.filter(id__in=request_ids, next_alert_wave_at__isnull=True)
+        .exclude(Exists(outstanding))
+        .annotate(alerted=Count('alerts'), last_sent=Max('alerts__message__sent_at'))
+        .values_list('id', 'created_at', 'alerted', 'last_sent')
+    )
+    for request_id, created_at, alerted, last_sent in finished:
+        if not cache.add(f'blood_requests:alert_metrics:{request_id}', 1, timeout=7 * 24 * 3600):
+            continue
+        metrics.observe('donor_alert_fanout', alerted)
+        metrics.observe('request_alert_seconds', ((last_sent or sent_at) - created_at).total_seconds())
+
+
+def donor_digest(recipient, blood_requests):
+    """(channel, address, subject, body, deadline, html_body) listing several open requests for one donor"""
+    return RenderedAlert(
+        None,
+        min(blood_request.needed_by for blood_request in blood_requests),
+        f"Urgent: {len(blood_requests)} blood requests need you",
+        *_render('donor_digest', {
+            # Rendered per donor anyway, so each link gets its token directly
+            'items': [
+                _request_context(
+                    blood_request, token=f"?token={accept_tokens.make_token(blood_request.id, recipient.id)}"
+                )
+                for blood_request in blood_requests
+            ]
+        })
+    ).message(recipient)
+
+
+def send_digests(now=None, limit=500):
+    """
+    Send one digest per donor whose deferred alerts are due (no message
+    within the dedupe window), listing the deferred requests still OPEN;
+    deferred alerts for closed requests are dropped. Returns
+    (digests sent, alerts digested, alerts dropped).
+    """
+    from .services import DonorMatchingService
+
+    now = now or timezone.now()
+    since = dedupe_since(now) or now
+    recently_messaged = DonorAlert.objects.filter(
+        donor_id=OuterRef('donor_id'),
+        alerted_at__gte=since,
+        delivery__in=[DonorAlert.Delivery.SENT, DonorAlert.Delivery.DIGEST]
+    )
+
+    with transaction.atomic():
+        # Whole donors at a time, so nobody's digest is split across runs,
+        # starting with the donors holding the earliest deadlines
+        donor_ids = list(
+            DonorAlert.objects.filter(delivery=DonorAlert.Delivery.DEFERRED)
+            .filter(~Exists(recently_messaged))
+            .values('donor_id').annotate(deadline=Min('request__needed_by'))
+            .order_by('deadline').values_list('donor_id', flat=True)[:limit]
+        )
+        if not donor_ids:
+            return 0, 0, 0
+
+        deferred = DonorAlert.objects.filter(
+            delivery=DonorAlert.Delivery.DEFERRED, donor_id__in=donor_ids
+        ).select_related('request__hospital__primary_location').order_by('donor_id', 'request__created_at')
+        if connection.features.has_select_for_update_skip_locked:
+            deferred = deferred.select_for_update(skip_locked=True, of=('self',))
+
+        recipients = {
+            row.id: row
+            for row in DonorMatchingService.recipient_rows(Donor.objects.filter(id__in=donor_ids))
+        }
+
+        messages, messaged_donors = [], []
+        rendered = {}
+        digested, dropped = [], []
+        for donor_id, alerts in groupby(deferred, key=lambda alert: alert.donor_id):
+            still_open = []
+            for alert in alerts:
+                if alert.request.status == BloodRequest.RequestStatus.OPEN:
+                    still_open.append(alert)
+                else:
+                    dropped.append(alert.id)
+            if len(still_open) == 1:
+                request_id = still_open[0].request_id
+                if request_id not in rendered:
+                    rendered[request_id] = render_alert(still_open[0].request)
+                messages.append(rendered[request_id].message(recipients[donor_id]))
+            elif still_open:
+                messages.append(donor_digest(recipients[donor_id], [alert.request for alert in still_open]))
+            if still_open:
+                messaged_donors.append(donor_id)
+            digested.extend(alert.id for alert in still_open)
+
+        queued = enqueue_messages(messages)
+        # Digest time restarts the donor's dedupe window
+        DonorAlert.objects.filter(id__in=digested).update(
+            delivery=DonorAlert.Delivery.DIGEST,
+            alerted_at=now,
+            message_id=Case(
+                *[When(donor_id=donor_id, then=Value(row.id)) for donor_id, row in zip(messaged_donors, queued)],
+                default=None
+            )
+        )
+        DonorAlert.objects.filter(id__in=dropped).update(delivery=DonorAlert.Delivery.DROPPED)
+
+    logger.info(f"Sent {len(messages)} alert digests ({len(digested)} alerts, {len(dropped)} dropped)")
+    return len(messages), len(digested), len(dropped)
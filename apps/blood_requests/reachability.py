@@ -0,0 +1,110 @@
+"""
+Maintenance of the DonorReachability table.
+
+A row (hospital, donor, donor_blood_type) exists whenever one of the
+donor's service locations is also one of the hospital's service locations.
+Rows are rebuilt with a single INSERT ... SELECT over the two M2M through
+tables, either for one donor, one hospital or a range of donor ids.
+"""
+from django.db import connection, connections, transaction
+
+import logging
+logger = logging.getLogger('apps.blood_requests')
+
+
+def _tables(donor_model, hospital_model, reachability_model):
+    return {
+        'reach': reachability_model._meta.db_table,
+        'donor': donor_model._meta.db_table,
+        'donor_areas': donor_model.service_locations.through._meta.db_table,
+        'hospital_areas': hospital_model.service_locations.through._meta.db_table,
+    }
+
+
+def _insert_sql(tables, where):
+    return (
+        f"INSERT INTO {tables['reach']} (hospital_id, donor_id, donor_blood_type) "
+        f"SELECT DISTINCT hs.hospital_id, ds.donor_id, d.blood_type "
+        f"FROM {tables['hospital_areas']} hs "
+        f"INNER JOIN {tables['donor_areas']} ds ON ds.localgovernment_id = hs.localgovernment_id "
+        f"INNER JOIN {tables['donor']} d ON d.id = ds.donor_id "
+        f"WHERE {where}"
+    )
+
+
+def _default_tables():
+    from apps.donors.models import Donor
+    from apps.hospitals.models import Hospital
+    from .models import DonorReachability
+    return _tables(Donor, Hospital, DonorReachability)
+
+
+def refresh_donor(donor_id):
+    """Recompute every reachability row for one donor"""
+    from .models import DonorReachability
+
+    with transaction.atomic():
+        DonorReachability.objects.filter(donor_id=donor_id).delete()
+        with connection.cursor() as cursor:
+            cursor.execute(_insert_sql(_default_tables(), 'ds.donor_id = %s'), [donor_id])
+
+
+def refresh_hospital(hospital_id):
+    """Recompute every reachability row for one hospital"""
+    from .models import DonorReachability
+
+    with transaction.atomic():
+        DonorReachability.objects.filter(hospital_id=hospital_id).delete()
+        with connection.cursor() as cursor:
+            cursor.execute(_insert_sql(_default_tables(), 'hs.hospital_id = %s'), [hospital_id])
+
+
+def refresh_donor_blood_type(donor_id, blood_type):
+    """Keep the denormalized blood type in step with the donor row"""
+    from .models import DonorReachability
+
+    DonorReachability.objects.filter(donor_id=donor_id).exclude(
+        donor_blood_type=blood_type
+    ).update(donor_blood_type=blood_type)
+
+
+def rebuild_all(chunk_size=5000, donor_model=None, hospital_model=None, reachability_model=None, using='default'):
+    """
+    Rebuild the whole table in donor-id ranges of `chunk_size`, one
+    transaction per chunk so a large rebuild never holds long locks.
+    Historical models can be passed in from a data migration.
+    """
+    if donor_model is None:
+        from apps.donors.models import Donor as donor_model
+        from apps.hospitals.models import Hospital as hospital_model
+        from .models import DonorReachability as reachability_model
+
+    tables = _tables(donor_model, hospital_model, reachability_model)
+    manager = reachability_model.objects.using(using)
+    donor_ids = donor_model.objects.using(using).order_by('id').values_list('id', flat=True)
+
+    first = donor_ids.first()
+    last = donor_ids.last()
+    if first is None:
+        manager.all().delete()
+        return 0
+
+    total = 0
+    start = first
+    while start <= last:
+        end = start + chunk_size
+        with transaction.atomic(using=using):
+            manager.filter(donor_id__gte=start, donor_id__lt=end).delete()
+            with connections[using].cursor() as cursor:
+                cursor.execute(
+                    _insert_sql(tables, 'ds.donor_id >= %s AND ds.donor_id < %s'),
+                    [start, end]
+                )
+                total += max(cursor.rowcount, 0)
+        start = end
+
+    # Rows for donors deleted outside the signal path
+    manager.filter(donor_id__gt=last).delete()
+
+    logger.info(f"Donor reachability rebuilt: {total} rows")
+    return total
@@ -1,4 +1,6 @@
+from django.utils import timezone
 from rest_framework import serializers
+from apps.core.antigens import AntigenMaskSerializerField
 from .models import BloodRequest, DonorResponse
 
 import logging
@@ -6,9 +8,22 @@ logger = logging.getLogger('apps.blood_requests')
 
 
 class BloodRequestCreateSerializer(serializers.ModelSerializer):
+    # Antigen names the patient has antibodies against, e.g. ["K", "Fya"]
+    antigen_negative_required = AntigenMaskSerializerField(required=False)
+
     class Meta:
         model = BloodRequest
-        fields = ['blood_type', 'contact_phone', 'notes']
+        fields = [
+            'blood_type', 'component', 'antigen_negative_required', 'urgency', 'needed_by',
+            'contact_phone', 'notes'
+        ]
+        # Omitted needed_by defaults from the urgency (BloodRequest.save)
+        extra_kwargs = {'needed_by': {'required': False}}
+
+    def validate_needed_by(self, value):
+        if value is not None and value <= timezone.now():
+            raise serializers.ValidationError("needed_by must be in the future.")
+        return value
     
     def create(self, validated_data):
         user = self.context['request'].user
@@ -43,6 +58,7 @@ class BloodRequestCreateSerializer(serializers.ModelSerializer):
             logger.info(
                 f"Blood request created - ID: {blood_request.id}, "
                 f"Hospital: {hospital.name}, Blood Type: {blood_request.blood_type}, "
+                f"Component: {blood_request.component}, "
                 f"Created by: {user.email}"
             )
             
@@ -62,12 +78,13 @@ class BloodRequestSerializer(serializers.ModelSerializer):
     hospital_name = serializers.CharField(source='hospital.name', read_only=True)
     hospital_location = serializers.CharField(source='hospital.primary_location.name', read_only=True)
     matched_donors_count = serializers.IntegerField(source='responses.count', read_only=True)
+    antigen_negative_required = AntigenMaskSerializerField(read_only=True)
     
     class Meta:
         model = BloodRequest
         fields = [
-            'id', 'hospital_name', 'hospital_location', 'blood_type',
-            'contact_phone', 'notes', 'status',
+            'id', 'hospital_name', 'hospital_location', 'blood_type', 'component',
+            'antigen_negative_required', 'urgency', 'needed_by', 'contact_phone', 'notes', 'status',
             'matched_donors_count', 'created_at', 'updated_at'
         ]
         read_only_fields = ['id', 'status', 'created_at', 'updated_at']
@@ -1,23 +1,145 @@
-from django.db.models import Q
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Avg, Case, Count, Exists, F, FloatField, IntegerField, OuterRef, Q, Subquery, Value, When
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 from datetime import timedelta
-from apps.donors.models import Donor
+from apps.donors.availability import available_now
+from apps.donors.models import AvailabilityWindow, Donor
+from apps.hospitals.models import Hospital
+from apps.core.antigens import Antigens
 from apps.core.blood_compatibility import BloodCompatibility
+from apps.locations.distances import get_distance_matrix
+
+from . import match_cache, notifications
+from .eligibility_bitmap import get_bitmap_reader
+from .matching_engine import get_columnar_index
+from .models import BloodRequest, DonorAlert
 
 import logging
 
 logger = logging.getLogger('apps.blood_requests')
 
+def _negative_for(donors, antigen_mask):
+    """Keep donors typed negative for every antigen in the mask (subset test in SQL)"""
+    if not antigen_mask:
+        return donors
+    return donors.alias(
+        required_negatives=F('antigen_negative').bitand(antigen_mask)
+    ).filter(required_negatives=antigen_mask)
+
+
+def _nearest_first(primary_location_id):
+    """
+    ORDER BY the mean distance from the hospital's LGA to the donor's
+    service LGAs - where a donor is willing to travel is the best proxy we
+    have for where they live. Distances come from the in-process LGA matrix
+    and are inlined as a CASE over the through table; donors whose areas
+    have no coordinates sort last.
+    """
+    distances = get_distance_matrix().distances_from(primary_location_id)
+    if not distances:
+        return ('id',)
+
+    distance = Case(
+        *[When(localgovernment_id=lga_id, then=Value(km)) for lga_id, km in distances.items()],
+        default=Value(None),
+        output_field=FloatField()
+    )
+    mean_distance = Donor.service_locations.through.objects.filter(
+        donor_id=OuterRef('pk')
+    ).values('donor_id').annotate(km=Avg(distance)).values('km')
+    return (Subquery(mean_distance, output_field=FloatField()).asc(nulls_last=True), 'id')
+
+
+def _fewest_recently_alerted(primary_location_id):
+    """
+    ORDER BY the donor's alerts in the last DONOR_ALERT_FATIGUE_DAYS, counted
+    on the DonorAlert ledger (alert_donor_recent_idx), so alerts spread over
+    the donor pool instead of reaching the same donors every time; ties go
+    to the longest rested. The window moves, so the ordering is built per query.
+    """
+    since = timezone.now() - timedelta(days=getattr(settings, 'DONOR_ALERT_FATIGUE_DAYS', 30))
+    recent_alerts = DonorAlert.objects.filter(
+        donor_id=OuterRef('pk'), alerted_at__gte=since
+    ).values('donor_id').annotate(alerts=Count('id')).values('alerts')
+    return (
+        Coalesce(Subquery(recent_alerts, output_field=IntegerField()), 0).asc(),
+        F('last_donation_date').asc(nulls_first=True),
+        'id',
+    )
+
+
+class Recipient:
+    """One donor to alert: the few columns an alert needs, without a model instance"""
+
+    __slots__ = ('id', 'email', 'first_name', 'phone', 'preferred_channel', 'push_token', 'recently_alerted')
+
+    def __init__(self, id, email, first_name, phone, preferred_channel, push_token, recently_alerted=False):
+        self.id = id
+        self.email = email
+        self.first_name = first_name
+        self.phone = phone
+        self.preferred_channel = preferred_channel
+        self.push_token = push_token
+        self.recently_alerted = recently_alerted
+
+    def deferred(self):
+        """A copy flagged recently_alerted, so its alert goes to the digest"""
+        return Recipient(
+            self.id, self.email, self.first_name, self.phone,
+            self.preferred_channel, self.push_token, recently_alerted=True
+        )
+
+    def __repr__(self):
+        return f"<Recipient {self.id} {self.email}>"
+
+
 class DonorMatchingService:
+    # Ranking keys accepted by find_compatible_donors(rank_by=...); each maps
+    # to an ORDER BY that ends in a unique column so ranks are stable, or to
+    # a callable building one per query from the hospital's primary LGA id
+    RANKINGS = {
+        # Most recently logged in first - likeliest to see the alert quickly
+        'recently_active': (F('user__last_login').desc(nulls_last=True), 'id'),
+        # Longest since last donation first - spreads load across donors
+        'longest_rested': (F('last_donation_date').asc(nulls_first=True), 'id'),
+        # Closest to the hospital first - fastest to arrive
+        'nearest': _nearest_first,
+        # Fewest alerts lately first - spreads notifications across donors
+        'fewest_notified': _fewest_recently_alerted,
+    }
+    # Rankings whose order depends on the hospital's location
+    LOCATION_RANKINGS = {'nearest'}
+
     @staticmethod
-    def find_compatible_donors(blood_request):
+    def ranking_order(rank_by, primary_location_id):
+        """ORDER BY expressions for a RANKINGS key"""
+        ordering = DonorMatchingService.RANKINGS[rank_by]
+        if callable(ordering):
+            return ordering(primary_location_id)
+        return ordering
+
+    @staticmethod
+    def find_compatible_donors(blood_request, limit=None, rank_by=None):
         """
         Find donors who:
         1. Have compatible blood type
-        2. Are available and eligible (past 56-day cooldown)
+        2. Are available and eligible (past 56-day cooldown), not snoozed
+           and inside one of their weekly availability windows, if any
         3. Are verified
         4. Service locations overlap with hospital's service locations
+
+        With `rank_by` (a key of RANKINGS) the queryset is ordered by that
+        ranking, and `limit` keeps only the top K.
         """
+        if rank_by is not None and rank_by not in DonorMatchingService.RANKINGS:
+            raise ValueError(
+                f"Unknown donor ranking '{rank_by}', expected one of {sorted(DonorMatchingService.RANKINGS)}"
+            )
+
         hospital = blood_request.hospital
         required_blood_type = blood_request.blood_type
 
@@ -28,31 +150,253 @@ class DonorMatchingService:
 
         try:
             # Get compatible blood types
-            compatible_types = BloodCompatibility.get_compatible_donor_types(required_blood_type)
-            logger.debug(f"Compatible blood types for {required_blood_type}: {compatible_types}")
-            
-            # Get hospital's service locations
-            hospital_service_areas = hospital.service_locations.all()
-            logger.debug(f"Hospital {hospital.name} has {hospital_service_areas.count()} service locations")
+            compatible_types = BloodCompatibility.get_compatible_donor_types(
+                required_blood_type, blood_request.component
+            )
+            logger.debug(
+                f"Compatible blood types for {required_blood_type} {blood_request.component}: {compatible_types}"
+            )
             
-            # Build query
             today = timezone.now().date()
-            
-            matching_donors = Donor.objects.filter(
-                blood_type__in=compatible_types,
-                is_available=True,
-                user__is_verified=True,
-                service_locations__in=hospital_service_areas
-            ).filter(
-                Q(available_from__isnull=True) | Q(available_from__lte=today)
-            ).distinct()
-            
-            return matching_donors
+
+            def match():
+                # Get hospital's service locations
+                service_area_ids = list(hospital.service_locations.values_list('id', flat=True))
+                logger.debug(f"Hospital {hospital.name} has {len(service_area_ids)} service locations")
+                return DonorMatchingService.match_donors(
+                    hospital.id, compatible_types, service_area_ids, today,
+                    antigen_mask=blood_request.antigen_negative_required
+                )
+
+            if match_cache.cache_enabled():
+                donor_ids = match_cache.get_matched_donor_ids(
+                    blood_request,
+                    compatible_types,
+                    lambda: match().values_list('id', flat=True)
+                )
+                donors = Donor.objects.filter(id__in=donor_ids)
+            else:
+                donors = match()
+            # Snoozes and weekly windows depend on the time of day, so they are
+            # applied in SQL on top of the (cacheable) match
+            donors = available_now(donors)
+
+            if rank_by is not None:
+                donors = donors.order_by(
+                    *DonorMatchingService.ranking_order(rank_by, hospital.primary_location_id)
+                )
+            if limit is not None:
+                donors = donors[:limit]
+
+            return donors
         
         except Exception as e:
             logger.exception(f"Error finding compatible donors for BloodRequest ID: {blood_request.id} - {str(e)}")
             return Donor.objects.none()
-        
+
+    @staticmethod
+    def match_donors(hospital_id, compatible_types, service_area_ids, today, antigen_mask=0):
+        """
+        Run the configured matching engine and return a Donor queryset.
+        `antigen_mask` lists antigens (apps.core.antigens) donors must be
+        typed negative for.
+        """
+        if getattr(settings, 'DONOR_MATCHING_ENGINE', 'orm') == 'reachability':
+            return DonorMatchingService.query_reachable_donors(hospital_id, compatible_types, today, antigen_mask)
+
+        reader = get_bitmap_reader()
+        if reader is not None:
+            donor_ids = reader.match(compatible_types, service_area_ids, today, antigen_mask)
+            if donor_ids is not None:
+                logger.debug(f"Eligibility bitmap matched {len(donor_ids)} donors for hospital ID: {hospital_id}")
+                return Donor.objects.filter(id__in=donor_ids)
+            logger.warning("Donor eligibility bitmap missing or stale, falling back to the ORM")
+
+        index = get_columnar_index()
+        if index is not None:
+            donor_ids = index.match(compatible_types, service_area_ids, today, antigen_mask)
+            logger.debug(f"Columnar engine matched {len(donor_ids)} donors for hospital ID: {hospital_id}")
+            return Donor.objects.filter(id__in=donor_ids)
+
+        return DonorMatchingService.query_compatible_donors(compatible_types, service_area_ids, today, antigen_mask)
+
+    @staticmethod
+    def find_compatible_donors_bulk(blood_requests, limit=None, rank_by=None, max_workers=None):
+        """
+        Match many requests at once, e.g. after a mass-casualty incident.
+
+        Requests are grouped by (hospital service-area set, compatible donor
+        types); every request in a group has exactly the same candidates,
+        so each group costs one query. Groups run on up to `max_workers`
+        threads (default DONOR_MATCHING_BULK_WORKERS), earliest deadline
+        (BloodRequest.needed_by) first.
+
+        Threads rather than processes: a group is one database query, and
+        the GIL is released while the driver waits on it. Processes would
+        each need Django set up and their own connection, and would not see
+        this worker's in-memory columnar index or mapped bitmap.
+
+        Returns {request_id: [donor_id, ...]} in ranked order.
+        """
+        if rank_by is not None and rank_by not in DonorMatchingService.RANKINGS:
+            raise ValueError(
+                f"Unknown donor ranking '{rank_by}', expected one of {sorted(DonorMatchingService.RANKINGS)}"
+            )
+
+        # Groups are created, and so submitted, in deadline order
+        blood_requests = sorted(blood_requests, key=lambda blood_request: blood_request.needed_by)
+        if not blood_requests:
+            return {}
+
+        hospital_ids = {blood_request.hospital_id for blood_request in blood_requests}
+        areas_by_hospital = {hospital_id: set() for hospital_id in hospital_ids}
+        for hospital_id, area_id in Hospital.service_locations.through.objects.filter(
+            hospital_id__in=hospital_ids
+        ).values_list('hospital_id', 'localgovernment_id'):
+            areas_by_hospital[hospital_id].add(area_id)
+
+        # Distance rankings also depend on where the hospital is
+        by_location = rank_by in DonorMatchingService.LOCATION_RANKINGS
+
+        groups = {}
+        for blood_request in blood_requests:
+            key = (
+                frozenset(areas_by_hospital[blood_request.hospital_id]),
+                tuple(BloodCompatibility.get_compatible_donor_types(
+                    blood_request.blood_type, blood_request.component
+                )),
+                blood_request.hospital.primary_location_id if by_location else None,
+                blood_request.antigen_negative_required,
+            )
+            groups.setdefault(key, []).append(blood_request)
+
+        logger.info(f"Bulk matching {len(blood_requests)} blood requests in {len(groups)} groups")
+
+        today = timezone.now().date()
+        jobs = [
+            # Hospitals sharing an area set reach the same donors, so any
+            # one of them stands in for the group on the reachability engine
+            (group_requests[0].hospital, list(types), sorted(area_ids), today, antigen_mask, rank_by, limit)
+            for (area_ids, types, _, antigen_mask), group_requests in groups.items()
+        ]
+
+        if max_workers is None:
+            max_workers = getattr(settings, 'DONOR_MATCHING_BULK_WORKERS', 1)
+
+        if max_workers > 1 and len(jobs) > 1:
+            with ThreadPoolExecutor(max_workers=min(max_workers, len(jobs))) as executor:
+                results = list(executor.map(_run_match_group_in_thread, jobs))
+        else:
+            results = [_run_match_group(*job) for job in jobs]
+
+        matches = {}
+        for group_requests, donor_ids in zip(groups.values(), results):
+            for blood_request in group_requests:
+                matches[blood_request.id] = donor_ids
+        return matches
+
+    @staticmethod
+    def iter_compatible_donors(blood_request, limit=None, rank_by=None, chunk_size=500):
+        """
+        Stream matching donors in ranked order as slim Recipient records
+        (see recipient_rows) through a server-side cursor, so memory stays
+        flat however many donors match and callers can start notifying
+        before the whole result has been read.
+        """
+        donors = DonorMatchingService.find_compatible_donors(
+            blood_request, limit=limit, rank_by=rank_by
+        )
+        return DonorMatchingService.recipient_rows(donors, chunk_size=chunk_size)
+
+    @staticmethod
+    def recipient_rows(donors, chunk_size=500):
+        """
+        Recipient records with what an alert needs, streamed in the
+        queryset's order from one values_list() query (the user's email and
+        first name are joined in, never loaded per donor). With alert dedupe
+        on, `recently_alerted` flags donors messaged within
+        DONOR_ALERT_DEDUPE_WINDOW (an EXISTS anti-join on the DonorAlert ledger).
+        """
+        columns = [
+            'id', F('user__email'), F('user__first_name'), 'phone', 'preferred_channel', 'push_token'
+        ]
+        since = notifications.dedupe_since()
+        if since is not None:
+            columns.append(Exists(DonorAlert.objects.filter(
+                donor_id=OuterRef('pk'),
+                alerted_at__gte=since,
+                delivery__in=[DonorAlert.Delivery.SENT, DonorAlert.Delivery.DIGEST]
+            )))
+        for row in donors.values_list(*columns).iterator(chunk_size=chunk_size):
+            yield Recipient(*row)
+
+    @staticmethod
+    def query_compatible_donors(compatible_types, service_area_ids, today, antigen_mask=0):
+        """
+        ORM matching path - the reference the other engines must agree with.
+
+        Area overlap is an EXISTS probe on the M2M through table rather than
+        a join, so a donor serving several of the areas is returned once
+        without a DISTINCT over the whole result.
+        """
+        serves_area = Donor.service_locations.through.objects.filter(
+            donor_id=OuterRef('pk'),
+            localgovernment_id__in=service_area_ids
+        )
+        donors = Donor.objects.filter(
+            blood_type__in=compatible_types,
+            is_available=True,
+            user__is_verified=True
+        ).filter(
+            Q(available_from__isnull=True) | Q(available_from__lte=today)
+        ).filter(Exists(serves_area))
+        return _negative_for(donors, antigen_mask)
+
+    @staticmethod
+    def matching_models():
+        """Models read by the matching queries (used by check_query_plans)"""
+        from .models import DonorReachability
+        return [Donor, Donor.service_locations.through, DonorReachability, AvailabilityWindow]
+
+    @staticmethod
+    def open_requests_for_donor(donor_blood_type, donor_service_area_ids, donor_antigen_negative=0):
+        """
+        OPEN requests the donor can give to, from hospitals serving any of
+        the donor's areas (reverse compatibility lookup per component +
+        EXISTS on the hospital M2M through table). Requests needing antigens
+        the donor is not typed negative for are left out.
+        """
+        hospital_serves_donor = Hospital.service_locations.through.objects.filter(
+            hospital_id=OuterRef('hospital_id'),
+            localgovernment_id__in=donor_service_area_ids
+        )
+        can_give = Q()
+        for component in BloodCompatibility.COMPONENTS:
+            can_give |= Q(
+                component=component,
+                blood_type__in=BloodCompatibility.get_compatible_recipient_types(donor_blood_type, component)
+            )
+        # Required antigens outside the donor's negatives must be empty
+        missing_antigens = Antigens.ALL_MASK & ~donor_antigen_negative
+        return BloodRequest.objects.filter(
+            can_give,
+            status=BloodRequest.RequestStatus.OPEN
+        ).alias(
+            unmet_antigens=F('antigen_negative_required').bitand(missing_antigens)
+        ).filter(unmet_antigens=0).filter(Exists(hospital_serves_donor))
+
+    @staticmethod
+    def query_reachable_donors(hospital_id, compatible_types, today, antigen_mask=0):
+        """Matching against the materialized DonorReachability table"""
+        donors = Donor.objects.filter(
+            reachable_hospitals__hospital_id=hospital_id,
+            reachable_hospitals__donor_blood_type__in=compatible_types,
+            is_available=True,
+            user__is_verified=True
+        ).filter(
+            Q(available_from__isnull=True) | Q(available_from__lte=today)
+        )
+        return _negative_for(donors, antigen_mask)
         
     
     @staticmethod
@@ -66,7 +410,7 @@ class DonorMatchingService:
             donor.is_available = False
             donor.last_donation_date = timezone.now() # Changed: removed .date()
             donor.available_from = (timezone.now() + timedelta(days=56)).date() #donor.available_from = donor.last_donation_date + timedelta(days=56)
-            donor.save()
+            donor.save(update_fields=['is_available', 'last_donation_date', 'available_from', 'updated_at'])
 
             logger.info(
                     f"Cooldown set successfully - Donor: {donor.user.email}, "
@@ -77,4 +421,26 @@ class DonorMatchingService:
             logger.exception(
                 f"Failed to set cooldown for donor {donor.user.email}: {str(e)}"
             )
-            raise
\ No newline at end of file
+            raise
+
+
+def _run_match_group(hospital, compatible_types, service_area_ids, today, antigen_mask, rank_by, limit):
+    """One bulk-matching group: donor ids out, in ranked order"""
+    donors = available_now(DonorMatchingService.match_donors(
+        hospital.id, compatible_types, service_area_ids, today, antigen_mask
+    ))
+    if rank_by is not None:
+        donors = donors.order_by(
+            *DonorMatchingService.ranking_order(rank_by, hospital.primary_location_id)
+        )
+    if limit is not None:
+        donors = donors[:limit]
+    return list(donors.values_list('id', flat=True))
+
+
+def _run_match_group_in_thread(job):
+    # Django connections are per thread; release this one when done
+    try:
+        return _run_match_group(*job)
+    finally:
+        connection.close()
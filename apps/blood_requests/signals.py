@@ -0,0 +1,189 @@
+"""
+Signal handlers that keep derived matching state in step with the donor
+and hospital tables:
+
+- the DonorReachability table (always, inside the writing transaction)
+- the in-process columnar index (only when that engine is enabled)
+- the shared eligibility bitmap's change journal (only when that engine is enabled)
+- the per-request match cache versions (only when the cache is enabled)
+
+and record per-request delivery metrics as the outbox sends alerts.
+"""
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from apps.core.outbox import messages_sent
+from apps.donors.models import Donor
+from apps.hospitals.models import Hospital
+
+from . import eligibility_bitmap, match_cache, notifications, reachability
+from .matching_engine import get_columnar_index
+
+# User fields the matching engines read
+MATCHING_USER_FIELDS = {'is_verified'}
+
+
+def _refresh_columnar(donor_ids):
+    donor_ids = list(donor_ids)
+    if eligibility_bitmap.bitmap_engine_enabled():
+        # The bitmap writer re-reads the rows, so queue them only once committed
+        transaction.on_commit(lambda: eligibility_bitmap.mark_dirty(donor_ids))
+
+    index = get_columnar_index(load=False)
+    if index is None or not index.is_loaded:
+        return
+    # Read the rows back only after the writing transaction commits
+    transaction.on_commit(lambda: index.refresh_donors(donor_ids))
+
+
+def _hospitals_serving(area_ids):
+    return set(
+        Hospital.service_locations.through.objects.filter(
+            localgovernment_id__in=area_ids
+        ).values_list('hospital_id', flat=True)
+    )
+
+
+def _invalidate_matches_for_donors(donor_ids, extra_types=()):
+    """Bump match-cache versions for every hospital the donors can reach"""
+    if not match_cache.cache_enabled() or not donor_ids:
+        return
+    donor_areas = Donor.service_locations.through.objects.filter(donor_id__in=donor_ids)
+    hospital_ids = _hospitals_serving(donor_areas.values('localgovernment_id'))
+    blood_types = set(Donor.objects.filter(id__in=donor_ids).values_list('blood_type', flat=True))
+    match_cache.invalidate_donor_types(hospital_ids, blood_types | set(extra_types))
+
+
+def _m2m_targets(instance, action, reverse, pk_set, related_name):
+    """
+    Ids of the owning side (donor or hospital) touched by an M2M change.
+
+    Returns None for the actions we ignore. For clear() from the
+    LocalGovernment side the owners are captured on pre_clear, since they
+    are gone by post_clear.
+    """
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            return [instance.pk]
+        return None
+
+    if action == 'pre_clear':
+        setattr(instance, f'_cleared_{related_name}', list(
+            getattr(instance, related_name).values_list('id', flat=True)
+        ))
+        return None
+    if action == 'post_clear':
+        return getattr(instance, f'_cleared_{related_name}', [])
+    if action in ('post_add', 'post_remove'):
+        return list(pk_set or [])
+    return None
+
+
+@receiver(pre_save, sender=Donor, dispatch_uid='blood_requests_donor_saving')
+def donor_saving(sender, instance, **kwargs):
+    # Remember the stored blood type so a type change invalidates both types
+    if instance.pk and match_cache.cache_enabled():
+        instance._previous_blood_type = Donor.objects.filter(pk=instance.pk).values_list(
+            'blood_type', flat=True
+        ).first()
+
+
+@receiver(post_save, sender=Donor, dispatch_uid='blood_requests_donor_saved')
+def donor_saved(sender, instance, created, **kwargs):
+    if not created:
+        reachability.refresh_donor_blood_type(instance.pk, instance.blood_type)
+        _invalidate_matches_for_donors(
+            [instance.pk], extra_types=[getattr(instance, '_previous_blood_type', None)]
+        )
+    _refresh_columnar([instance.pk])
+
+
+@receiver(pre_delete, sender=Donor, dispatch_uid='blood_requests_donor_deleting')
+def donor_deleting(sender, instance, **kwargs):
+    # Service locations are still there before the cascade
+    _invalidate_matches_for_donors([instance.pk])
+
+
+@receiver(post_delete, sender=Donor, dispatch_uid='blood_requests_donor_deleted')
+def donor_deleted(sender, instance, **kwargs):
+    if eligibility_bitmap.bitmap_engine_enabled():
+        donor_id = instance.pk
+        transaction.on_commit(lambda: eligibility_bitmap.mark_dirty([donor_id]))
+
+    index = get_columnar_index(load=False)
+    if index is not None and index.is_loaded:
+        # Like the bitmap, only drop the donor once the delete has committed
+        donor_id = instance.pk
+        transaction.on_commit(lambda: index.remove_donor(donor_id))
+
+
+@receiver(m2m_changed, sender=Donor.service_locations.through, dispatch_uid='blood_requests_donor_areas_changed')
+def donor_service_locations_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if match_cache.cache_enabled():
+        _invalidate_matches_for_area_change(instance, action, reverse, pk_set)
+
+    donor_ids = _m2m_targets(instance, action, reverse, pk_set, 'donors')
+    if donor_ids is None:
+        return
+
+    for donor_id in donor_ids:
+        reachability.refresh_donor(donor_id)
+    _refresh_columnar(donor_ids)
+
+
+def _invalidate_matches_for_area_change(instance, action, reverse, pk_set):
+    """
+    Hospitals serving the added/removed areas gain or lose the donors, so
+    their versions for the donors' types are bumped. Clears are handled on
+    pre_clear while the rows still exist.
+    """
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+
+    if not reverse:
+        if action == 'pre_clear':
+            area_ids = instance.service_locations.values('id')
+        else:
+            area_ids = pk_set or []
+        match_cache.invalidate_donor_types(_hospitals_serving(area_ids), [instance.blood_type])
+    else:
+        if action == 'pre_clear':
+            blood_types = instance.donors.values_list('blood_type', flat=True)
+        else:
+            blood_types = Donor.objects.filter(id__in=pk_set or []).values_list('blood_type', flat=True)
+        match_cache.invalidate_donor_types(_hospitals_serving([instance.pk]), set(blood_types))
+
+
+@receiver(m2m_changed, sender=Hospital.service_locations.through, dispatch_uid='blood_requests_hospital_areas_changed')
+def hospital_service_locations_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    hospital_ids = _m2m_targets(instance, action, reverse, pk_set, 'service_hospitals')
+    if hospital_ids is None:
+        return
+
+    for hospital_id in hospital_ids:
+        reachability.refresh_hospital(hospital_id)
+    match_cache.invalidate_hospitals(hospital_ids)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL, dispatch_uid='blood_requests_user_saved')
+def user_saved(sender, instance, created, update_fields=None, **kwargs):
+    # Verification lives on the user row; saves of other fields (e.g. last_login) don't affect matching
+    if update_fields is not None and not set(update_fields) & MATCHING_USER_FIELDS:
+        return
+    index = get_columnar_index(load=False)
+    columnar_loaded = index is not None and index.is_loaded
+    if created or not (
+        columnar_loaded or match_cache.cache_enabled() or eligibility_bitmap.bitmap_engine_enabled()
+    ):
+        return
+    donor_id = Donor.objects.filter(user_id=instance.pk).values_list('id', flat=True).first()
+    if donor_id is not None:
+        _invalidate_matches_for_donors([donor_id])
+        _refresh_columnar([donor_id])
+
+
+@receiver(messages_sent, dispatch_uid='blood_requests_alerts_sent')
+def alerts_sent(sender, message_ids, sent_at, **kwargs):
+    notifications.record_request_metrics(message_ids, sent_at)
@@ -1,3 +1,322 @@
+import os
+import tempfile
+import time
+import unittest
+from datetime import timedelta
+from unittest import mock
+
+from django.core.cache import cache
 from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from apps.accounts.models import User
+from apps.core import metrics
+from apps.core.antigens import Antigens
+from apps.core.blood_compatibility import BloodCompatibility
+from apps.core.outbox import deliver_due, enqueue_messages
+from apps.donors.models import Donor
+from apps.hospitals.models import Hospital
+from apps.locations.models import LocalGovernment, State
+
+from . import accept_tokens, reachability
+from .eligibility_bitmap import EligibilityBitmapReader, EligibilityBitmapWriter, np
+from .matching_engine import ColumnarDonorIndex
+from .models import BloodRequest, DonorAlert, DonorResponse
+from .services import DonorMatchingService
+
+
+class MatchingEngineParityTests(TestCase):
+    """The reachability, columnar and bitmap engines return the ORM matching query's donors"""
+
+    # No antigen requirement, a common one (Kell) and a rarer combination
+    ANTIGEN_MASKS = (
+        0,
+        Antigens.names_to_mask(['K']),
+        Antigens.names_to_mask(['K', 'Fya', 'Jkb']),
+    )
+
+    @classmethod
+    def setUpTestData(cls):
+        state = State.objects.create(name='Lagos', code='LA')
+        cls.lgas = [
+            LocalGovernment.objects.create(state=state, name=f'LGA {number}')
+            for number in range(4)
+        ]
+
+        # Two hospitals with overlapping service areas
+        cls.hospitals = []
+        for number, areas in enumerate([cls.lgas[:2], cls.lgas[1:3]]):
+            user = User.objects.create_user(
+                email=f'hospital{number}@example.com', username=f'hospital{number}@example.com',
+                password=None, role='HOSPITAL', is_verified=True
+            )
+            hospital = Hospital.objects.create(
+                user=user, name=f'Hospital {number}', phone='0800', address='Lagos',
+                primary_location=areas[0]
+            )
+            hospital.service_locations.set(areas)
+            cls.hospitals.append(hospital)
+
+        today = timezone.now().date()
+        kell_negative = Antigens.names_to_mask(['K'])
+        rare_negative = Antigens.names_to_mask(['K', 'Fya', 'Jkb', 'E'])
+        # (is_available, is_verified, available_from, antigen_negative): eligible donors
+        # with and without antigen typing, plus each way a donor drops out of a match
+        profiles = [
+            (True, True, None, 0),
+            (True, True, None, kell_negative),
+            (True, True, today - timedelta(days=1), rare_negative),
+            (True, True, today, kell_negative),
+            (True, True, today + timedelta(days=30), rare_negative),   # cooldown
+            (False, True, None, rare_negative),                        # unavailable
+            (True, False, None, kell_negative),                        # unverified
+        ]
+        number = 0
+        for blood_type in BloodCompatibility.BLOOD_TYPES:
+            for index, (is_available, is_verified, available_from, antigens) in enumerate(profiles):
+                user = User.objects.create_user(
+                    email=f'donor{number}@example.com', username=f'donor{number}@example.com',
+                    password=None, role='DONOR', is_verified=is_verified
+                )
+                donor = Donor.objects.create(
+                    user=user, phone='0801', blood_type=blood_type, is_available=is_available,
+                    available_from=available_from, antigen_negative=antigens
+                )
+                # Spread donors over every LGA, including one no hospital serves
+                donor.service_locations.set([cls.lgas[index % 4], cls.lgas[(index + number) % 4]])
+                number += 1
+
+        reachability.rebuild_all()
+
+    def setUp(self):
+        self.today = timezone.now().date()
+
+    def cases(self):
+        for hospital in self.hospitals:
+            service_area_ids = list(hospital.service_locations.values_list('id', flat=True))
+            for blood_type in BloodCompatibility.BLOOD_TYPES:
+                for component in BloodCompatibility.COMPONENTS:
+                    compatible_types = BloodCompatibility.get_compatible_donor_types(blood_type, component)
+                    for antigens in self.ANTIGEN_MASKS:
+                        expected = set(
+                            DonorMatchingService.query_compatible_donors(
+                                compatible_types, service_area_ids, self.today, antigens
+                            ).values_list('id', flat=True)
+                        )
+                        yield hospital, blood_type, component, antigens, compatible_types, service_area_ids, expected
+
+    def assertEngineMatchesOrm(self, engine):
+        matched_cases = 0
+        for hospital, blood_type, component, antigens, compatible_types, service_area_ids, expected in self.cases():
+            with self.subTest(hospital=hospital.name, blood_type=blood_type, component=component, antigens=antigens):
+                self.assertEqual(set(engine(hospital, compatible_types, service_area_ids, antigens)), expected)
+            matched_cases += bool(expected)
+        # The seed data has to exercise the engines, not compare empty sets
+        self.assertGreater(matched_cases, 0)
+
+    def test_orm_excludes_ineligible_donors(self):
+        donors = DonorMatchingService.query_compatible_donors(
+            BloodCompatibility.BLOOD_TYPES, [lga.id for lga in self.lgas], self.today
+        )
+        self.assertFalse(donors.filter(is_available=False).exists())
+        self.assertFalse(donors.filter(user__is_verified=False).exists())
+        self.assertFalse(donors.filter(available_from__gt=self.today).exists())
+        self.assertTrue(donors.filter(available_from=self.today).exists())
+
+    def test_reachability_matches_orm(self):
+        self.assertEngineMatchesOrm(
+            lambda hospital, types, areas, antigens: DonorMatchingService.query_reachable_donors(
+                hospital.id, types, self.today, antigens
+            ).values_list('id', flat=True)
+        )
+
+    def test_fewest_notified_ranking(self):
+        blood_request = BloodRequest.objects.create(
+            hospital=self.hospitals[0], blood_type='AB+', contact_phone='0800'
+        )
+        donor_ids = list(DonorMatchingService.find_compatible_donors(blood_request).values_list('id', flat=True))
+        # Two recent alerts for the first donor, one for the second, one long ago for the third
+        for donor_id, days_ago in ((donor_ids[0], 1), (donor_ids[0], 2), (donor_ids[1], 1), (donor_ids[2], 90)):
+            earlier = BloodRequest.objects.create(
+                hospital=self.hospitals[0], blood_type='AB+', contact_phone='0800'
+            )
+            alert = DonorAlert.objects.create(request=earlier, donor_id=donor_id, channel='EMAIL')
+            DonorAlert.objects.filter(id=alert.id).update(alerted_at=timezone.now() - timedelta(days=days_ago))
+
+        ranked = list(DonorMatchingService.find_compatible_donors(
+            blood_request, rank_by='fewest_notified'
+        ).values_list('id', flat=True))
+        self.assertEqual(set(ranked), set(donor_ids))
+        self.assertEqual(ranked[-1], donor_ids[0])
+        self.assertEqual(ranked[-2], donor_ids[1])
+        self.assertLess(ranked.index(donor_ids[2]), ranked.index(donor_ids[1]))
+
+    @unittest.skipIf(np is None, 'numpy is not installed')
+    def test_columnar_matches_orm(self):
+        index = ColumnarDonorIndex()
+        index.load()
+        self.assertEngineMatchesOrm(
+            lambda hospital, types, areas, antigens: index.match(types, areas, self.today, antigens)
+        )
+
+    @unittest.skipIf(np is None, 'numpy is not installed')
+    def test_bitmap_matches_orm(self):
+        with tempfile.TemporaryDirectory() as bitmap_dir:
+            writer = EligibilityBitmapWriter(os.path.join(bitmap_dir, 'donor_eligibility.bin'))
+            writer.load()
+            writer.write()
+            reader = EligibilityBitmapReader(writer.path)
+            self.assertEngineMatchesOrm(
+                lambda hospital, types, areas, antigens: reader.match(types, areas, self.today, antigens)
+            )
+            reader._close()
+
+    @unittest.skipIf(np is None, 'numpy is not installed')
+    def test_bitmap_matches_orm_after_patch(self):
+        with tempfile.TemporaryDirectory() as bitmap_dir:
+            writer = EligibilityBitmapWriter(os.path.join(bitmap_dir, 'donor_eligibility.bin'))
+            writer.load()
+            writer.write()
+
+            # A donor goes into cooldown, another moves areas, a third is removed
+            changed = list(Donor.objects.filter(is_available=True, available_from__isnull=True)[:3])
+            Donor.objects.filter(id=changed[0].id).update(available_from=self.today + timedelta(days=56))
+            changed[1].service_locations.set([self.lgas[3]])
+            changed[2].delete()
+            writer.patch([donor.id for donor in changed])
+            writer.write()
+
+            reader = EligibilityBitmapReader(writer.path)
+            self.assertEngineMatchesOrm(
+                lambda hospital, types, areas, antigens: reader.match(types, areas, self.today, antigens)
+            )
+            for donor in Donor.objects.prefetch_related('service_locations'):
+                self.assertEqual(
+                    sorted(reader.donor_service_area_ids(donor.id, self.today)),
+                    sorted(lga.id for lga in donor.service_locations.all())
+                )
+            self.assertIsNone(reader.donor_service_area_ids(max(writer.donor_ids) + 1, self.today))
+            reader._close()
+
+
+class AlertedRequestMixin:
+    """A hospital and two donors, with open requests alerting both"""
+
+    @classmethod
+    def setUpTestData(cls):
+        state = State.objects.create(name='Lagos', code='LA')
+        lga = LocalGovernment.objects.create(state=state, name='Ikeja')
+        hospital_user = User.objects.create_user(
+            email='hospital@example.com', username='hospital@example.com',
+            password=None, role='HOSPITAL', is_verified=True
+        )
+        cls.hospital = Hospital.objects.create(
+            user=hospital_user, name='Hospital', phone='0800', address='Ikeja', primary_location=lga
+        )
+        cls.donors = []
+        for number in range(2):
+            user = User.objects.create_user(
+                email=f'donor{number}@example.com', username=f'donor{number}@example.com',
+                password=None, role='DONOR', is_verified=True
+            )
+            cls.donors.append(Donor.objects.create(user=user, phone='0801', blood_type='O-'))
+
+    def open_request(self, messages=()):
+        blood_request = BloodRequest.objects.create(hospital=self.hospital, blood_type='A+', contact_phone='0800')
+        for donor, message in zip(self.donors, list(messages) or [None] * len(self.donors)):
+            DonorAlert.objects.create(request=blood_request, donor=donor, channel='EMAIL', message=message)
+        return blood_request
+
+
+class SignedAcceptTests(AlertedRequestMixin, TestCase):
+    """One-click accept links (accept_tokens.py): valid once, for one donor and one request"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.blood_request = self.open_request()
+        self.donor = self.donors[0]
+
+    def accept(self, token):
+        return self.client.post(reverse('signed_accept_request', args=[token]))
+
+    def token(self, blood_request=None, donor=None):
+        return accept_tokens.make_token((blood_request or self.blood_request).id, (donor or self.donor).id)
+
+    def test_valid_token_accepts(self):
+        response = self.accept(self.token())
+        self.assertEqual(response.status_code, 200)
+        self.blood_request.refresh_from_db()
+        self.assertEqual(self.blood_request.status, BloodRequest.RequestStatus.MATCHED)
+        self.assertTrue(DonorResponse.objects.filter(request=self.blood_request, donor=self.donor).exists())
+        self.assertIsNotNone(DonorAlert.objects.get(request=self.blood_request, donor=self.donor).token_used_at)
+
+    def test_reused_token_conflicts(self):
+        token = self.token()
+        self.assertEqual(self.accept(token).status_code, 200)
+        self.assertEqual(self.accept(token).status_code, 409)
+
+    def test_tampered_token_is_forbidden(self):
+        token = self.token()
+        value, signature = token.rsplit(':', 1)
+        other_donor = value.replace(f'.{self.donor.id}:', f'.{self.donors[1].id}:')
+        for tampered in (f'{other_donor}:{signature}', token[:-2] + 'xx', 'not-a-token'):
+            with self.subTest(token=tampered):
+                self.assertEqual(self.accept(tampered).status_code, 403)
+        self.assertEqual(self.blood_request.alerts.filter(token_used_at__isnull=False).count(), 0)
+
+    def test_expired_token_is_gone(self):
+        token = self.token()
+        later = time.time() + accept_tokens.max_age() + 60
+        with mock.patch('django.core.signing.time.time', return_value=later):
+            self.assertEqual(self.accept(token).status_code, 410)
+
+    def test_token_only_accepts_its_own_request_and_donor(self):
+        other_request = self.open_request()
+        self.assertEqual(self.accept(self.token(blood_request=other_request)).status_code, 200)
+        # The link for another request leaves this one open and this donor's link unused
+        self.blood_request.refresh_from_db()
+        self.assertEqual(self.blood_request.status, BloodRequest.RequestStatus.OPEN)
+        self.assertIsNone(DonorAlert.objects.get(request=self.blood_request, donor=self.donor).token_used_at)
+        self.assertFalse(DonorResponse.objects.filter(request=other_request, donor=self.donors[1]).exists())
+
+    def test_token_for_donor_not_alerted_is_forbidden(self):
+        DonorAlert.objects.filter(request=self.blood_request, donor=self.donors[1]).delete()
+        self.assertEqual(self.accept(self.token(donor=self.donors[1])).status_code, 403)
+
+    def test_closed_request_is_rejected_without_using_the_token(self):
+        for closed in (BloodRequest.RequestStatus.FULFILLED, BloodRequest.RequestStatus.CANCELLED):
+            with self.subTest(status=closed):
+                BloodRequest.objects.filter(id=self.blood_request.id).update(status=closed)
+                self.assertEqual(self.accept(self.token()).status_code, 409)
+                self.blood_request.refresh_from_db()
+                self.assertEqual(self.blood_request.status, closed)
+                self.assertIsNone(
+                    DonorAlert.objects.get(request=self.blood_request, donor=self.donor).token_used_at
+                )
+
+
+class RequestAlertMetricsTests(AlertedRequestMixin, TestCase):
+    """Live per-request metrics are recorded once, when the request's last alert is sent"""
+
+    def setUp(self):
+        cache.clear()
+        metrics.reset()
+
+    def test_recorded_once_after_last_alert(self):
+        messages = enqueue_messages([
+            ('EMAIL', donor.user.email, 'Blood needed', 'Please help') for donor in self.donors
+        ])
+        self.open_request(messages)
+
+        self.assertEqual(deliver_due(batch_size=1), (1, 0))
+        self.assertNotIn('donor_alert_fanout', metrics.snapshot()['histograms'])
 
-# Create your tests here.
+        self.assertEqual(deliver_due(batch_size=1), (1, 0))
+        enqueue_messages([('EMAIL', 'other@example.com', 'Subject', 'Body')])
+        deliver_due()
+        histograms = metrics.snapshot()['histograms']
+        self.assertEqual(histograms['donor_alert_fanout']['count'], 1)
+        self.assertEqual(histograms['donor_alert_fanout']['max'], 2)
+        self.assertEqual(histograms['request_alert_seconds']['count'], 1)
@@ -1,10 +1,12 @@
 from django.urls import path
 from .views import (
     BloodRequestCreateView,
+    BloodRequestBatchCreateView,
     BloodRequestListView,
     BloodRequestDetailView,
     DonorResponseListView,
     AcceptRequestView,
+    SignedAcceptRequestView,
     #accept_request,
     mark_fulfilled,
     confirm_donation,
@@ -12,9 +14,11 @@ from .views import (
 
 urlpatterns = [
     path('create/', BloodRequestCreateView.as_view(), name='request_create'),
+    path('batch/', BloodRequestBatchCreateView.as_view(), name='request_batch_create'),
     path('', BloodRequestListView.as_view(), name='request_list'),
     path('<int:pk>/', BloodRequestDetailView.as_view(), name='request_detail'),
     path('<int:request_id>/accept/', AcceptRequestView.as_view(), name='accept_request'),
+    path('accept/<str:token>/', SignedAcceptRequestView.as_view(), name='signed_accept_request'),
     path('<int:request_id>/fulfill/', mark_fulfilled, name='mark_fulfilled'),
     path('<int:request_id>/responses/', DonorResponseListView.as_view(), name='donor_responses'),
 
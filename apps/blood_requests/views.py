@@ -1,22 +1,31 @@
 from rest_framework import generics, status
 from rest_framework.decorators import api_view, permission_classes
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
-from django.core.mail import send_mail
 from django.conf import settings
-from .models import BloodRequest, DonorResponse
+from django.core import signing
+from django.db import transaction
+from django.utils import timezone
+from apps.donors.models import Donor
+from .models import BloodRequest, DonorAlert, DonorResponse
 from .serializers import (
     BloodRequestCreateSerializer,
     BloodRequestSerializer,
     DonorResponseSerializer
 )
 from .services import DonorMatchingService
+from . import accept_tokens, allocation
+from .eligibility_bitmap import get_bitmap_reader
+from .notifications import queue_donor_alerts
+from . import notifications, waves
+from apps.core.outbox import enqueue_email
 from rest_framework.views import APIView
 from rest_framework import exceptions
 
 import logging
 logger = logging.getLogger('apps.blood_requests')
 
+
 class BloodRequestCreateView(generics.CreateAPIView):
     permission_classes = [IsAuthenticated]
     serializer_class = BloodRequestCreateSerializer
@@ -29,17 +38,34 @@ class BloodRequestCreateView(generics.CreateAPIView):
             blood_request = serializer.save()
             logger.info(f"Blood request created successfully - ID: {blood_request.id}, Hospital: {blood_request.hospital.name}")
 
-            # Find and notify matching donors
-            matching_donors = DonorMatchingService.find_compatible_donors(blood_request)
-            logger.info(f"Found {len(matching_donors)} matching donors for request ID: {blood_request.id}")
+            if allocation.allocation_enabled():
+                allocation.alert(queue_donor_alerts, allocation.allocate_for(blood_request))
+                return blood_request
+
+            if waves.waves_enabled():
+                # First wave now; run_notification_waves sends the rest while the request stays open
+                waves.send_wave(blood_request)
+                return blood_request
+
+            # Stream ranked matching donors and notify them as rows arrive
+            matching_donors = DonorMatchingService.iter_compatible_donors(
+                blood_request,
+                limit=getattr(settings, 'DONOR_ALERT_LIMIT', None),
+                rank_by=getattr(settings, 'DONOR_ALERT_RANKING', None),
+                chunk_size=getattr(settings, 'DONOR_ALERT_CHUNK_SIZE', 500),
+            )
 
-            if not matching_donors:
-                logger.warning(f"No matching donors found for blood type {blood_request.blood_type}")
+            # Queue the alerts in bulk INSERTs of one chunk each
+            notified_count = queue_donor_alerts(
+                matching_donors,
+                blood_request,
+                chunk_size=getattr(settings, 'DONOR_ALERT_CHUNK_SIZE', 500)
+            )
 
+            logger.info(f"Queued alerts for {notified_count} matching donors for request ID: {blood_request.id}")
 
-            for donor in matching_donors:
-                self.send_donor_notification(donor, blood_request)
-                logger.info(f"Notification sent to donor: {donor.user.email} for request ID: {blood_request.id}")
+            if not notified_count:
+                logger.warning(f"No matching donors found for blood type {blood_request.blood_type}")
 
             return blood_request
         
@@ -47,49 +73,100 @@ class BloodRequestCreateView(generics.CreateAPIView):
             logger.exception(f"Unexpected error creating blood request: {str(e)}")
             raise
 
-    
-    def send_donor_notification(self, donor, request):
 
+class BloodRequestBatchCreateView(BloodRequestCreateView):
+    """
+    Create several blood requests in one call (e.g. after a major incident)
+    and match them together with DonorMatchingService.find_compatible_donors_bulk.
+    Body: a JSON list of {blood_type, contact_phone, notes}.
+    """
+    max_batch_size = 50
+
+    def get_serializer(self, *args, **kwargs):
+        kwargs['many'] = True
+        return super().get_serializer(*args, **kwargs)
+
+    def create(self, request, *args, **kwargs):
+        if not isinstance(request.data, list) or not request.data:
+            return Response(
+                {'error': 'Expected a non-empty list of blood requests'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if len(request.data) > self.max_batch_size:
+            return Response(
+                {'error': f'At most {self.max_batch_size} blood requests per batch'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        blood_requests = self.perform_create(serializer)
+
+        return Response(
+            BloodRequestSerializer(blood_requests, many=True).data,
+            status=status.HTTP_201_CREATED
+        )
+
+    def perform_create(self, serializer):
         user = self.request.user
-        logger.debug(f"Preparing donor notification - Donor: {donor.user.email}, Request ID: {request.id}")
+        logger.info(f"BloodRequestBatchCreateView triggered by user: {user.email}")
 
-        """Send email notification to donor"""
         try:
-            subject = f"Urgent: {request.blood_type} Blood Needed"
-            message = f"""
-            Hello {donor.user.first_name},
-            
-            A blood request has been posted that matches your profile:
-            
-            Blood Type: {request.blood_type}
-            Hospital: {request.hospital.name}
-            Address: {request.hospital.address}
-            Location: {request.hospital.primary_location.name}
-            Contact: {request.contact_phone}
-            
-            If you can donate, please accept this request:
-            Accept Link: {settings.FRONTEND_URL}/requests/{request.id}/accept/
-            
-            Thank you for being a lifesaver!
-            """
-            logger.info(f"Sending email to donor: {donor.user.email} - Subject: {subject}")
-
-            send_mail(
-                subject,
-                message,
-                settings.DEFAULT_FROM_EMAIL,
-                [donor.user.email],
-                fail_silently=True
+            with transaction.atomic():
+                blood_requests = serializer.save()
+            logger.info(
+                f"Batch of {len(blood_requests)} blood requests created - "
+                f"IDs: {[blood_request.id for blood_request in blood_requests]}"
             )
-            logger.info(f"Email successfully sent to donor: {donor.user.email}")
 
-        except Exception as e:
-            logger.error(f"Failed to send email to donor: {donor.user.email} - {str(e)}")
-            logger.exception(e)
+            if allocation.allocation_enabled():
+                allocation.alert(
+                    queue_donor_alerts,
+                    allocation.reallocate({blood_request.hospital_id for blood_request in blood_requests})
+                )
+                return blood_requests
 
+            if waves.waves_enabled():
+                # Bulk-match just the first wave of every request
+                matches = DonorMatchingService.find_compatible_donors_bulk(
+                    blood_requests, limit=waves.wave_size(), rank_by=waves.ranking()
+                )
+            else:
+                matches = DonorMatchingService.find_compatible_donors_bulk(
+                    blood_requests,
+                    limit=getattr(settings, 'DONOR_ALERT_LIMIT', None),
+                    rank_by=getattr(settings, 'DONOR_ALERT_RANKING', None),
+                )
 
+            # One lookup for every donor across the batch
+            donor_ids = {donor_id for ids in matches.values() for donor_id in ids}
+            recipients = {
+                row.id: row
+                for row in DonorMatchingService.recipient_rows(Donor.objects.filter(id__in=donor_ids))
+            }
+
+            alerted = set()
+            for blood_request in blood_requests:
+                matched = matches.get(blood_request.id, [])
+                # A donor matching several requests of the batch is alerted once; the rest go to the digest
+                queue_donor_alerts(
+                    [
+                        recipients[donor_id].deferred()
+                        if donor_id in alerted and notifications.dedupe_window() else recipients[donor_id]
+                        for donor_id in matched
+                    ],
+                    blood_request
+                )
+                alerted.update(matched)
+                if waves.waves_enabled():
+                    waves.record_wave(blood_request, len(matched))
+                logger.info(f"Queued alerts for {len(matched)} matching donors for request ID: {blood_request.id}")
 
+            return blood_requests
 
+        except Exception as e:
+            logger.exception(f"Unexpected error creating blood request batch: {str(e)}")
+            raise
 
 
 class BloodRequestListView(generics.ListAPIView):
@@ -124,20 +201,18 @@ class BloodRequestListView(generics.ListAPIView):
                     logger.error(f"Donor profile not found for user {user.email}")
                     return BloodRequest.objects.none()
                 
-                # Donors see open requests in their service areas
-                donor_service_areas = donor.service_locations.all()
-                logger.debug(f"Donor {user.email} service areas: {[loc.name for loc in donor_service_areas]}")
+                # Donors see open requests in their service areas, read from
+                # the shared eligibility bitmap when it is current
+                reader = get_bitmap_reader()
+                donor_service_area_ids = reader and reader.donor_service_area_ids(donor.id, timezone.now().date())
+                if donor_service_area_ids is None:
+                    donor_service_area_ids = list(donor.service_locations.values_list('id', flat=True))
+                logger.debug(f"Donor {user.email} service area ids: {donor_service_area_ids}")
 
                 
-                from apps.core.blood_compatibility import BloodCompatibility
-                compatible_types = BloodCompatibility.get_compatible_donor_types(donor.blood_type)
-                logger.debug(f"Donor {user.email} compatible blood types: {compatible_types}")
-                
-                queryset = BloodRequest.objects.filter(
-                    status='OPEN',
-                    hospital__service_locations__in=donor_service_areas,
-                    blood_type__in=compatible_types
-                ).distinct()
+                queryset = DonorMatchingService.open_requests_for_donor(
+                    donor.blood_type, donor_service_area_ids, donor.antigen_negative
+                )
 
                 logger.info(f"Donor {user.email} retrieving {queryset.count()} open compatible blood requests.")
                 return queryset
@@ -273,14 +348,29 @@ class AcceptRequestView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
+        return self.accept(donor, request_id)
+
+    def accept(self, donor, request_id):
+        """Record the donor's acceptance, mark the request MATCHED and notify the hospital"""
+        email = donor.user.email
+
         try:
             blood_request = BloodRequest.objects.get(id=request_id)
 
+            if blood_request.status != BloodRequest.RequestStatus.OPEN:
+                logger.warning(
+                    f"Donor {email} tried to accept request {request_id} in status {blood_request.status}"
+                )
+                return Response(
+                    {'error': 'This request is no longer open'},
+                    status=status.HTTP_409_CONFLICT
+                )
+
             # Eligibility check
             if not donor.is_eligible_to_donate:
 
                 logger.warning(
-                f"Donor {request.user.email} tried to accept request {request_id} "
+                f"Donor {email} tried to accept request {request_id} "
                 f"but is ineligible due to 56-day cooldown"
                 )
 
@@ -295,18 +385,21 @@ class AcceptRequestView(APIView):
             )
 
             if not created:
-                logger.warning(f"Donor {request.user.email} tried to accept request {request_id} again ")
+                logger.warning(f"Donor {email} tried to accept request {request_id} again ")
                 return Response({'message': 'You have already accepted this request'})
 
             # Update blood request status
             blood_request.status = 'MATCHED'
             blood_request.save()
 
+            if allocation.allocation_enabled():
+                allocation.alert(queue_donor_alerts, allocation.release(blood_request))
+
             # Optional donor cooldown logic
             # DonorMatchingService.set_donor_cooldown(donor)
 
             # Notify hospital
-            send_mail(
+            enqueue_email(
                 subject=f"Donor Accepted: {blood_request.blood_type} Request",
                 message=f"""
                 Good news! A donor has accepted your blood request.
@@ -317,28 +410,72 @@ class AcceptRequestView(APIView):
 
                 Please contact them immediately at {donor.phone}
                 """,
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                recipient_list=[blood_request.hospital.user.email],
-                fail_silently=True
+                to_email=blood_request.hospital.user.email,
             )
 
             logger.info(
-            f"Request {request_id} successfully accepted by donor {request.user.email}"
+            f"Request {request_id} successfully accepted by donor {email}"
             )
             
             return Response({'message': 'Request accepted successfully'})
 
         except BloodRequest.DoesNotExist:
-            logger.error(f"Request not found: ID={request_id} (by {request.user.email})")
+            logger.error(f"Request not found: ID={request_id} (by {email})")
             return Response({'error': 'Request not found'}, status=status.HTTP_404_NOT_FOUND)
         
         except Exception as e:
             logger.warning(
-                f"Unexpected error in accept_request (User: {request.user.email}, "
+                f"Unexpected error in accept_request (User: {email}, "
                 f"Request ID: {request_id}): {str(e)}"
             )
             return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
-        
+
+
+class SignedAcceptRequestView(AcceptRequestView):
+    """
+    One-click accept from the link in a donor alert: the signed token names
+    the donor and the request, so no login is needed (see accept_tokens.py)
+    """
+    authentication_classes = []
+    permission_classes = [AllowAny]
+
+    def post(self, request, token):
+        try:
+            request_id, donor_id = accept_tokens.read_token(token)
+        except signing.SignatureExpired:
+            return Response({'error': 'This accept link has expired'}, status=status.HTTP_410_GONE)
+        except signing.BadSignature:
+            logger.warning("Accept attempt with an invalid token")
+            return Response({'error': 'Invalid accept link'}, status=status.HTTP_403_FORBIDDEN)
+
+        donor = Donor.objects.select_related('user').filter(id=donor_id).first()
+        if donor is None:
+            return Response({'error': 'Invalid accept link'}, status=status.HTTP_403_FORBIDDEN)
+
+        # A matched, fulfilled or cancelled request leaves the link unused
+        request_status = BloodRequest.objects.filter(id=request_id).values_list('status', flat=True).first()
+        if request_status is None:
+            return Response({'error': 'Invalid accept link'}, status=status.HTTP_403_FORBIDDEN)
+        if request_status != BloodRequest.RequestStatus.OPEN:
+            return Response({'error': 'This request is no longer open'}, status=status.HTTP_409_CONFLICT)
+
+        with transaction.atomic():
+            # The conditional UPDATE lets exactly one use of the link through
+            used = DonorAlert.objects.filter(
+                request_id=request_id, donor_id=donor_id, token_used_at__isnull=True
+            ).update(token_used_at=timezone.now())
+            if not used:
+                if not DonorAlert.objects.filter(request_id=request_id, donor_id=donor_id).exists():
+                    return Response({'error': 'Invalid accept link'}, status=status.HTTP_403_FORBIDDEN)
+                logger.warning(f"Reused accept link - Donor ID: {donor_id}, Request ID: {request_id}")
+                return Response({'error': 'This accept link was already used'}, status=status.HTTP_409_CONFLICT)
+
+            logger.info(f"One-click accept - Donor ID: {donor_id}, Request ID: {request_id}")
+            response = self.accept(donor, request_id)
+            if response.status_code >= 400:
+                # Keep the link usable when the accept itself did not go through
+                transaction.set_rollback(True)
+        return response
 
 
 @api_view(['POST'])
@@ -373,6 +510,9 @@ def mark_fulfilled(request, request_id):
         blood_request.status = 'FULFILLED'
         blood_request.save()
 
+        if allocation.allocation_enabled():
+            allocation.alert(queue_donor_alerts, allocation.release(blood_request))
+
         logger.info(
             f"BloodRequest {request_id} marked as fulfilled by hospital {hospital.name} ({user_email})."
         )
@@ -449,6 +589,9 @@ def confirm_donation(request, request_id, response_id):
         blood_request.status = BloodRequest.RequestStatus.FULFILLED
         blood_request.save(update_fields=['status'])
 
+        if allocation.allocation_enabled():
+            allocation.alert(queue_donor_alerts, allocation.release(blood_request))
+
         return Response({'message': 'Donation confirmed and donor cooldown applied.'})
     
     except Exception as e:
@@ -0,0 +1,142 @@
+"""
+Staged donor alert waves.
+
+Alerting every matching donor the moment a request opens spams all of them
+once the first donor accepts. With DONOR_ALERT_WAVE_SIZE set, only the top
+ranked donors are alerted when the request opens (wave 1), and the request
+is scheduled for its next wave DONOR_ALERT_WAVE_INTERVAL seconds later.
+
+`manage.py run_notification_waves` is the scheduler: it picks requests
+whose next wave is due (BloodRequest.next_alert_wave_at), earliest
+needed_by first, and, only if the
+request is still OPEN, alerts the next DONOR_ALERT_WAVE_SIZE ranked donors
+that have not been alerted for it yet (a NOT EXISTS anti-join on the
+DonorAlert ledger). A request that was matched, fulfilled or cancelled in
+the meantime is dropped from the schedule instead. Scheduling stops once
+a wave comes up short (no donors left) or DONOR_ALERT_LIMIT donors were
+alerted.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Avg, Count, Exists, OuterRef
+from django.utils import timezone
+
+from .models import BloodRequest, DonorAlert
+from .notifications import queue_donor_alerts
+
+import logging
+logger = logging.getLogger('apps.blood_requests')
+
+
+def wave_size():
+    return getattr(settings, 'DONOR_ALERT_WAVE_SIZE', 0)
+
+
+def waves_enabled():
+    return wave_size() > 0
+
+
+def ranking():
+    """Waves go out best-first, so they always use a ranking"""
+    return getattr(settings, 'DONOR_ALERT_RANKING', None) or 'recently_active'
+
+
+def record_wave(blood_request, alerted, now=None):
+    """
+    Count a wave of `alerted` donors as sent and schedule the next one, or
+    stop scheduling when the wave came up short or the alert limit is reached
+    """
+    now = now or timezone.now()
+    wave = blood_request.alert_waves_sent + 1
+    limit = getattr(settings, 'DONOR_ALERT_LIMIT', None)
+    interval = getattr(settings, 'DONOR_ALERT_WAVE_INTERVAL', 600)
+
+    more = alerted >= wave_size() and (limit is None or wave * wave_size() < limit)
+    blood_request.alert_waves_sent = wave
+    blood_request.next_alert_wave_at = now + timedelta(seconds=interval) if more else None
+    BloodRequest.objects.filter(id=blood_request.id).update(
+        alert_waves_sent=blood_request.alert_waves_sent,
+        next_alert_wave_at=blood_request.next_alert_wave_at,
+    )
+
+
+def send_wave(blood_request, now=None):
+    """Alert the next wave of not-yet-alerted donors; returns how many were alerted"""
+    from .services import DonorMatchingService
+
+    size = wave_size()
+    limit = getattr(settings, 'DONOR_ALERT_LIMIT', None)
+    if limit is not None:
+        size = min(size, max(limit - blood_request.alert_waves_sent * wave_size(), 0))
+
+    already_alerted = DonorAlert.objects.filter(request_id=blood_request.id, donor_id=OuterRef('pk'))
+    donors = DonorMatchingService.find_compatible_donors(
+        blood_request, rank_by=ranking()
+    ).filter(~Exists(already_alerted))[:size]
+
+    wave = blood_request.alert_waves_sent + 1
+    alerted = queue_donor_alerts(
+        DonorMatchingService.recipient_rows(donors), blood_request, wave=wave
+    ) if size else 0
+    record_wave(blood_request, alerted, now)
+
+    logger.info(f"Alert wave {wave} for request ID {blood_request.id}: {alerted} donors")
+    return alerted
+
+
+def run_due_waves(now=None, limit=100):
+    """
+    Send every due wave (at most `limit` requests); returns
+    (waves sent, donors alerted, requests stopped because they closed)
+    """
+    now = now or timezone.now()
+    waves = alerts = stopped = 0
+
+    with transaction.atomic():
+        due = BloodRequest.objects.filter(
+            next_alert_wave_at__lte=now
+        ).select_related('hospital__primary_location').order_by('needed_by', 'next_alert_wave_at')
+        if connection.features.has_select_for_update_skip_locked:
+            # Several schedulers never send the same wave
+            due = due.select_for_update(skip_locked=True, of=('self',))
+
+        for blood_request in due[:limit]:
+            if blood_request.status != BloodRequest.RequestStatus.OPEN:
+                BloodRequest.objects.filter(id=blood_request.id).update(next_alert_wave_at=None)
+                stopped += 1
+                logger.info(
+                    f"Alert waves stopped for request ID {blood_request.id} ({blood_request.status}) "
+                    f"after {blood_request.alert_waves_sent} waves"
+                )
+                continue
+
+            try:
+                with transaction.atomic():
+                    alerts += send_wave(blood_request, now)
+                    waves += 1
+            except Exception as e:
+                logger.exception(f"Alert wave for request ID {blood_request.id} failed: {str(e)}")
+
+    return waves, alerts, stopped
+
+
+def stats():
+    """Alerts and waves per closed (matched or fulfilled) request, from the DonorAlert ledger"""
+    closed = BloodRequest.objects.filter(
+        status__in=[BloodRequest.RequestStatus.MATCHED, BloodRequest.RequestStatus.FULFILLED]
+    )
+    summary = closed.aggregate(requests=Count('id'), waves=Avg('alert_waves_sent'))
+    # Deferred alerts reach the donor in a digest, if at all
+    alerts = DonorAlert.objects.filter(
+        request__in=closed, delivery=DonorAlert.Delivery.SENT
+    ).count()
+    requests = summary['requests']
+    return {
+        'closed_requests': requests,
+        'alerts': alerts,
+        'alerts_per_closed_request': alerts / requests if requests else 0.0,
+        'waves_per_closed_request': summary['waves'] or 0.0,
+        'scheduled_requests': BloodRequest.objects.filter(next_alert_wave_at__isnull=False).count(),
+    }
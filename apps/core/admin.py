@@ -1,3 +1,33 @@
 from django.contrib import admin
 
-# Register your models here.
+from .admin_base import SuperuserAdmin
+from .models import OutboxMessage
+
+
+@admin.register(OutboxMessage)
+class OutboxMessageAdmin(SuperuserAdmin):
+    """Read-only view of the notification outbox; rows are written by the app and the worker"""
+
+    list_display = ["recipient", "channel", "subject", "status", "attempts", "next_attempt_at", "created_at", "sent_at"]
+    list_filter = ["status", "channel"]
+    search_fields = ["recipient", "subject"]
+    ordering = ["-created_at"]
+    readonly_fields = [
+        "channel", "recipient", "from_email", "subject", "body", "html_body", "status", "attempts", "next_attempt_at",
+        "lease_owner", "leased_until", "last_error", "created_at", "sent_at",
+    ]
+
+    def has_module_permission(self, request):
+        return request.user.is_superuser
+
+    def has_view_permission(self, request, obj=None):
+        return request.user.is_superuser
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return request.user.is_superuser
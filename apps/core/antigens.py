@@ -0,0 +1,82 @@
+from django import forms
+from rest_framework import serializers
+
+
+class Antigens:
+    """
+    Extended red-cell antigens beyond ABO/Rh, as integer bitsets.
+
+    A donor profile is the set of antigens the donor was typed NEGATIVE for
+    (untyped antigens are simply not set). A request's requirement is the set
+    its patient has antibodies against, so a donor qualifies when
+    `profile & required == required` - a single bitwise subset test that
+    runs in SQL (`F(...).bitand()`) as well as in NumPy and the bitmap engine.
+    """
+    # Fixed bit order - masks are stored in the database, never reorder
+    NAMES = (
+        'K', 'k',          # Kell
+        'Fya', 'Fyb',      # Duffy
+        'Jka', 'Jkb',      # Kidd
+        'C', 'c', 'E', 'e',  # Rh (non-D)
+        'M', 'N', 'S', 's',  # MNS
+    )
+    BITS = {name: 1 << bit for bit, name in enumerate(NAMES)}
+    ALL_MASK = (1 << len(NAMES)) - 1
+
+    @classmethod
+    def names_to_mask(cls, names):
+        """Fold antigen names into a mask (unknown names raise KeyError)"""
+        mask = 0
+        for name in names:
+            mask |= cls.BITS[name]
+        return mask
+
+    @classmethod
+    def mask_to_names(cls, mask):
+        """Expand a mask into antigen names, in NAMES order"""
+        return [name for name, bit in cls.BITS.items() if mask & bit]
+
+    @classmethod
+    def satisfies(cls, donor_negative_mask, required_mask):
+        """Is the donor negative for every required antigen?"""
+        return donor_negative_mask & required_mask == required_mask
+
+
+class AntigenMaskFormField(forms.TypedMultipleChoiceField):
+    """Admin checkbox list stored as an antigen mask"""
+
+    def __init__(self, **kwargs):
+        kwargs.setdefault('required', False)
+        kwargs.setdefault('widget', forms.CheckboxSelectMultiple)
+        super().__init__(choices=[(name, name) for name in Antigens.NAMES], **kwargs)
+
+    def prepare_value(self, value):
+        if isinstance(value, int):
+            return Antigens.mask_to_names(value)
+        return value
+
+    def clean(self, value):
+        return Antigens.names_to_mask(super().clean(value))
+
+    def has_changed(self, initial, data):
+        return super().has_changed(self.prepare_value(initial or 0), data)
+
+
+class AntigenMaskSerializerField(serializers.Field):
+    """API representation of an antigen mask: a list of antigen names"""
+
+    default_error_messages = {
+        'invalid': 'Expected a list of antigen names.',
+        'unknown': 'Unknown antigen "{name}". Expected one of: {choices}.',
+    }
+
+    def to_representation(self, value):
+        return Antigens.mask_to_names(value or 0)
+
+    def to_internal_value(self, data):
+        if not isinstance(data, (list, tuple)):
+            self.fail('invalid')
+        for name in data:
+            if name not in Antigens.BITS:
+                self.fail('unknown', name=name, choices=', '.join(Antigens.NAMES))
+        return Antigens.names_to_mask(data)
@@ -1,7 +1,68 @@
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - optional dependency
+    np = None
+
+_BLOOD_TYPES = ('O-', 'O+', 'A-', 'A+', 'B-', 'B+', 'AB-', 'AB+')
+_TYPE_CODES = {blood_type: code for code, blood_type in enumerate(_BLOOD_TYPES)}
+
+
+def _build_donor_masks(compatibility):
+    """recipient code -> mask of donor codes, from a type -> [donor types] dict"""
+    return tuple(
+        sum(1 << _TYPE_CODES[donor] for donor in compatibility[recipient])
+        for recipient in _BLOOD_TYPES
+    )
+
+
+def _invert_masks(donor_masks):
+    """Turn recipient -> donors masks into donor -> recipients masks"""
+    return tuple(
+        sum(
+            1 << recipient_code
+            for recipient_code, mask in enumerate(donor_masks)
+            if mask >> donor_code & 1
+        )
+        for donor_code in range(len(_BLOOD_TYPES))
+    )
+
+
+def _build_component_masks(component_compatibility):
+    """component -> (recipient code -> donor mask, donor code -> recipient mask)"""
+    tables = {}
+    for component, compatibility in component_compatibility.items():
+        donor_masks = _build_donor_masks(compatibility)
+        tables[component] = (donor_masks, _invert_masks(donor_masks))
+    return tables
+
+
+def _build_pair_table(donor_masks):
+    width = len(_BLOOD_TYPES)
+    return tuple(
+        bool(donor_masks[recipient_code] >> donor_code & 1)
+        for donor_code in range(width)
+        for recipient_code in range(width)
+    )
+
+
+def _build_mask_types():
+    width = len(_BLOOD_TYPES)
+    return tuple(
+        tuple(_BLOOD_TYPES[code] for code in range(width) if mask >> code & 1)
+        for mask in range(1 << width)
+    )
+
+
 class BloodCompatibility:
     """
     Blood type donation compatibility matrix
     Key: Blood type that CAN RECEIVE from value list
+
+    Every blood type also has a small integer code (its index in BLOOD_TYPES)
+    and a one-bit mask (1 << code). Each component's compatibility lists are
+    folded into 8-bit masks once at import time, so lookups in either
+    direction are a single table read and a bitwise AND instead of a list
+    scan or per-component branching.
     """
     COMPATIBILITY = {
         'O-': ['O-'],
@@ -13,16 +74,171 @@ class BloodCompatibility:
         'AB-': ['O-', 'A-', 'B-', 'AB-'],
         'AB+': ['O-', 'O+', 'A-', 'A+', 'B-', 'B+', 'AB-', 'AB+'],  # Universal receiver
     }
-    
+
+    # Blood components a request can ask for. COMPATIBILITY above is the
+    # red-cell table; the others follow their own rules.
+    RED_CELLS = 'RED_CELLS'
+    WHOLE_BLOOD = 'WHOLE_BLOOD'
+    PLASMA = 'PLASMA'
+    PLATELETS = 'PLATELETS'
+    COMPONENTS = (RED_CELLS, WHOLE_BLOOD, PLASMA, PLATELETS)
+
+    COMPONENT_COMPATIBILITY = {
+        RED_CELLS: COMPATIBILITY,
+        # Whole blood carries both cells and plasma: ABO-identical only,
+        # Rh-negative may still go to Rh-positive
+        WHOLE_BLOOD: {
+            'O-': ['O-'],
+            'O+': ['O-', 'O+'],
+            'A-': ['A-'],
+            'A+': ['A-', 'A+'],
+            'B-': ['B-'],
+            'B+': ['B-', 'B+'],
+            'AB-': ['AB-'],
+            'AB+': ['AB-', 'AB+'],
+        },
+        # Plasma runs the opposite way (AB is the universal plasma donor);
+        # Rh does not matter
+        PLASMA: {
+            'O-': ['O-', 'O+', 'A-', 'A+', 'B-', 'B+', 'AB-', 'AB+'],
+            'O+': ['O-', 'O+', 'A-', 'A+', 'B-', 'B+', 'AB-', 'AB+'],
+            'A-': ['A-', 'A+', 'AB-', 'AB+'],
+            'A+': ['A-', 'A+', 'AB-', 'AB+'],
+            'B-': ['B-', 'B+', 'AB-', 'AB+'],
+            'B+': ['B-', 'B+', 'AB-', 'AB+'],
+            'AB-': ['AB-', 'AB+'],
+            'AB+': ['AB-', 'AB+'],
+        },
+        # Platelets: plasma-compatible ABO, and Rh-negative recipients only
+        # from Rh-negative donors
+        PLATELETS: {
+            'O-': ['O-', 'A-', 'B-', 'AB-'],
+            'O+': ['O-', 'O+', 'A-', 'A+', 'B-', 'B+', 'AB-', 'AB+'],
+            'A-': ['A-', 'AB-'],
+            'A+': ['A-', 'A+', 'AB-', 'AB+'],
+            'B-': ['B-', 'AB-'],
+            'B+': ['B-', 'B+', 'AB-', 'AB+'],
+            'AB-': ['AB-'],
+            'AB+': ['AB-', 'AB+'],
+        },
+    }
+
+    # Fixed code order - codes are stored in arrays/bitmaps, never reorder
+    BLOOD_TYPES = _BLOOD_TYPES
+    TYPE_CODES = _TYPE_CODES
+    TYPE_MASKS = {blood_type: 1 << code for blood_type, code in _TYPE_CODES.items()}
+    ALL_TYPES_MASK = (1 << len(_BLOOD_TYPES)) - 1
+
+    # Per component: (recipient code -> mask of donor types it can receive
+    # from, donor code -> mask of recipient types it can give to)
+    COMPONENT_MASKS = _build_component_masks(COMPONENT_COMPATIBILITY)
+
+    # Red-cell forward and reverse masks
+    DONOR_MASKS, RECIPIENT_MASKS = COMPONENT_MASKS[RED_CELLS]
+
+    # Per component, a flattened 8x8 truth table indexed by
+    # donor_code * 8 + recipient_code, used by the batch helpers
+    PAIR_TABLES = {
+        component: _build_pair_table(donor_masks)
+        for component, (donor_masks, _) in COMPONENT_MASKS.items()
+    }
+    # The same tables as NumPy arrays, built once (None without numpy)
+    PAIR_ARRAYS = None if np is None else {
+        component: np.array(table, dtype=bool) for component, table in PAIR_TABLES.items()
+    }
+
+    # Cached list results so hot loops don't rebuild lists per call
+    _MASK_TYPES = _build_mask_types()
+
+    @classmethod
+    def type_to_code(cls, blood_type):
+        """Return the integer code for a blood type, or None if unknown"""
+        return cls.TYPE_CODES.get(blood_type)
+
+    @classmethod
+    def type_to_mask(cls, blood_type):
+        """Return the one-bit mask for a blood type (0 if unknown)"""
+        return cls.TYPE_MASKS.get(blood_type, 0)
+
+    @classmethod
+    def types_to_mask(cls, blood_types):
+        """Fold an iterable of blood types into a single mask"""
+        mask = 0
+        for blood_type in blood_types:
+            mask |= cls.TYPE_MASKS.get(blood_type, 0)
+        return mask
+
+    @classmethod
+    def mask_to_types(cls, mask):
+        """Expand a mask back into blood types, in BLOOD_TYPES order"""
+        return list(cls._MASK_TYPES[mask & cls.ALL_TYPES_MASK])
+
+    @classmethod
+    def get_compatible_donor_mask(cls, recipient_blood_type, component=RED_CELLS):
+        """Mask of donor types the recipient can receive `component` from"""
+        code = cls.TYPE_CODES.get(recipient_blood_type)
+        masks = cls.COMPONENT_MASKS.get(component)
+        return 0 if code is None or masks is None else masks[0][code]
+
+    @classmethod
+    def get_compatible_recipient_mask(cls, donor_blood_type, component=RED_CELLS):
+        """Mask of recipient types the donor can give `component` to"""
+        code = cls.TYPE_CODES.get(donor_blood_type)
+        masks = cls.COMPONENT_MASKS.get(component)
+        return 0 if code is None or masks is None else masks[1][code]
+
     @classmethod
-    def get_compatible_donor_types(cls, recipient_blood_type):
+    def get_compatible_donor_types(cls, recipient_blood_type, component=RED_CELLS):
         """
         Get list of blood types that can donate to recipient
-        e.g. A+ can receive from: O-, O+, A-, A+
+        e.g. A+ can receive red cells from: O-, O+, A-, A+
+        and plasma from: A-, A+, AB-, AB+
         """
-        return cls.COMPATIBILITY.get(recipient_blood_type, [])
-    
+        return cls.COMPONENT_COMPATIBILITY.get(component, {}).get(recipient_blood_type, [])
+
     @classmethod
-    def can_donate_to(cls, donor_blood_type, recipient_blood_type):
-        """Check if donor can give to recipient"""
-        return donor_blood_type in cls.get_compatible_donor_types(recipient_blood_type)
\ No newline at end of file
+    def get_compatible_recipient_types(cls, donor_blood_type, component=RED_CELLS):
+        """
+        Get list of blood types the donor can give to
+        e.g. O- can donate red cells to every type, AB+ only to AB+
+        """
+        return cls.mask_to_types(cls.get_compatible_recipient_mask(donor_blood_type, component))
+
+    @classmethod
+    def can_donate_to(cls, donor_blood_type, recipient_blood_type, component=RED_CELLS):
+        """Check if donor can give `component` to recipient"""
+        return bool(
+            cls.get_compatible_donor_mask(recipient_blood_type, component)
+            & cls.TYPE_MASKS.get(donor_blood_type, 0)
+        )
+
+    @classmethod
+    def can_donate_codes(cls, donor_codes, recipient_codes, component=RED_CELLS):
+        """
+        Batch check over parallel sequences of type codes: can each donor
+        give `component` to the matching recipient?
+
+        Accepts plain sequences (returns a list of bools) or NumPy integer
+        arrays (returns a boolean array, evaluated as one fancy-index).
+        """
+        if hasattr(donor_codes, '__array__') or hasattr(recipient_codes, '__array__'):
+            table = cls.PAIR_ARRAYS[component]
+            return table[np.asarray(donor_codes) * len(cls.BLOOD_TYPES) + np.asarray(recipient_codes)]
+
+        width = len(cls.BLOOD_TYPES)
+        table = cls.PAIR_TABLES[component]
+        return [table[d * width + r] for d, r in zip(donor_codes, recipient_codes)]
+
+    @classmethod
+    def donor_codes_matching(cls, donor_codes, recipient_blood_type, component=RED_CELLS):
+        """
+        Batch check many donors against one recipient type.
+
+        Returns a boolean list (or NumPy array for array input) marking which
+        donor codes can give `component` to the recipient.
+        """
+        donor_mask = cls.get_compatible_donor_mask(recipient_blood_type, component)
+        if hasattr(donor_codes, '__array__'):
+            return (np.right_shift(donor_mask, np.asarray(donor_codes)) & 1).astype(bool)
+
+        return [bool(donor_mask >> code & 1) for code in donor_codes]
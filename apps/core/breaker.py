@@ -0,0 +1,126 @@
+"""
+Circuit breakers for outbound notification channels.
+
+The outbox already keeps mail relays and gateways off the request path:
+messages are rows in OutboxMessage until a worker sends them, so the
+outbox table is the durable spool. What a breaker adds is that workers
+stop hammering a relay that is down or crawling. Without it every batch
+burns a full timeout per message and backs each row off on its own
+schedule.
+
+One breaker per channel (EMAIL, SMS, PUSH), with its state in Django's
+default cache so every worker sharing that cache sees the same state:
+
+- closed: sends go ahead. Outcomes are counted over a tumbling window of
+  NOTIFICATION_BREAKER_WINDOW seconds. A send slower than
+  NOTIFICATION_BREAKER_SLOW_SECONDS counts as bad even when it succeeded.
+  Once at least NOTIFICATION_BREAKER_MIN_CALLS sends were seen and the bad
+  share reaches NOTIFICATION_BREAKER_FAILURE_RATE, the breaker opens.
+- open: nothing is sent for NOTIFICATION_BREAKER_OPEN_SECONDS. Workers park
+  the channel's claimed rows back in the outbox as pending, due when the
+  breaker half-opens, without spending a delivery attempt.
+- half-open: one worker gets to send a single probe message. Success closes
+  the breaker and the parked rows are replayed by the normal claim loop in
+  deadline order; failure opens it again.
+
+With the default per-process LocMemCache each worker keeps its own
+breakers; configure a shared CACHES backend when running several workers.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+import logging
+logger = logging.getLogger('apps.core')
+
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half-open'
+
+
+def breakers_enabled():
+    return getattr(settings, 'NOTIFICATION_BREAKER_FAILURE_RATE', 0.5) > 0
+
+
+class CircuitBreaker:
+    """Breaker for one channel; cheap to create, all state lives in the cache"""
+
+    def __init__(self, name):
+        self.name = name
+        self.failure_rate = getattr(settings, 'NOTIFICATION_BREAKER_FAILURE_RATE', 0.5)
+        self.slow_seconds = getattr(settings, 'NOTIFICATION_BREAKER_SLOW_SECONDS', 5)
+        self.min_calls = getattr(settings, 'NOTIFICATION_BREAKER_MIN_CALLS', 20)
+        self.window = getattr(settings, 'NOTIFICATION_BREAKER_WINDOW', 60)
+        self.open_seconds = getattr(settings, 'NOTIFICATION_BREAKER_OPEN_SECONDS', 30)
+
+    def _key(self, part):
+        return f'breaker:{self.name}:{part}'
+
+    def opened_until(self):
+        """Epoch seconds the breaker stays open until, or None while closed"""
+        return cache.get(self._key('open_until'))
+
+    def state(self):
+        open_until = self.opened_until()
+        if open_until is None:
+            return CLOSED
+        return OPEN if time.time() < open_until else HALF_OPEN
+
+    def retry_at(self):
+        """When rows parked by an open breaker should be claimed again (epoch seconds)"""
+        open_until = self.opened_until() or 0
+        # Half-open with the probe held elsewhere: look again shortly
+        return max(open_until, time.time() + min(self.open_seconds, 5))
+
+    def acquire(self):
+        """
+        CLOSED: send everything. OPEN: send nothing. HALF_OPEN: this caller
+        won the probe and sends exactly one message (everyone else sees OPEN).
+        """
+        state = self.state()
+        if state == HALF_OPEN and not cache.add(self._key('probe'), 1, timeout=self.open_seconds):
+            return OPEN
+        return state
+
+    def record(self, calls, failures, slow=0, probe=False):
+        """Count a batch of sends on this channel and trip or reset the breaker"""
+        if not calls:
+            return
+        bad = failures + slow
+
+        if probe:
+            if bad:
+                self.trip(f"probe failed ({failures} failed, {slow} slow)")
+            else:
+                self.reset()
+            return
+        if self.opened_until() is not None:
+            # Sent before another worker tripped the breaker; only the probe decides now
+            return
+
+        calls_key, bad_key = self._key('calls'), self._key('bad')
+        # The first writer starts the window; both counters expire with it
+        cache.add(calls_key, 0, timeout=self.window)
+        cache.add(bad_key, 0, timeout=self.window)
+        try:
+            total = cache.incr(calls_key, calls)
+            total_bad = cache.incr(bad_key, bad) if bad else cache.get(bad_key, 0)
+        except ValueError:
+            # The window expired between add() and incr(); the next batch starts a new one
+            return
+
+        if total >= self.min_calls and total_bad >= self.failure_rate * total:
+            self.trip(f"{total_bad} of {total} sends failed or were slower than {self.slow_seconds}s")
+
+    def trip(self, reason):
+        open_until = time.time() + self.open_seconds
+        cache.set(self._key('open_until'), open_until, timeout=None)
+        cache.delete_many([self._key('calls'), self._key('bad'), self._key('probe')])
+        logger.warning(f"{self.name} circuit breaker opened for {self.open_seconds}s: {reason}")
+        return open_until
+
+    def reset(self):
+        cache.delete_many([self._key('open_until'), self._key('calls'), self._key('bad'), self._key('probe')])
+        logger.info(f"{self.name} circuit breaker closed")
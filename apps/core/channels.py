@@ -0,0 +1,178 @@
+"""
+Notification channels used by the outbox worker.
+
+Every OutboxMessage row names a channel (EMAIL, SMS, PUSH). Email goes
+through the configured Django mail backend over a reused connection
+(PooledMailer); SMS and push are posted as JSON to a gateway configured by
+URL in NOTIFICATION_SMS_GATEWAY / NOTIFICATION_PUSH_GATEWAY:
+
+- `file:///path/messages.jsonl` appends one JSON line per message - an
+  offline stub for development and tests, used only when configured
+- `http(s)://host/path` POSTs {channel, to, subject, body} over a kept-alive
+  connection; any non-2xx answer is a failed send (`manage.py
+  run_stub_gateway` serves a local stub for load tests)
+
+With no gateway configured for a channel (the default), donors who prefer
+it are alerted by email instead.
+
+Channel instances hold a connection and are not thread-safe; the dispatcher
+in apps/core/outbox.py gives each worker thread its own.
+"""
+import http.client
+import json
+import os
+import threading
+import time
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives
+
+from .models import NotificationChannel
+
+
+GATEWAY_SETTINGS = {
+    NotificationChannel.SMS: 'NOTIFICATION_SMS_GATEWAY',
+    NotificationChannel.PUSH: 'NOTIFICATION_PUSH_GATEWAY',
+}
+
+
+def gateway_url(channel):
+    """The gateway URL configured for SMS/push, or '' when there is none"""
+    return getattr(settings, GATEWAY_SETTINGS[channel], '') or ''
+
+
+def route(preferred_channel, email, phone='', push_token=''):
+    """
+    (channel, recipient address) for a donor's preferred channel, falling
+    back to email when the donor has no phone number / push token on file
+    or no gateway is configured for the channel
+    """
+    if preferred_channel == NotificationChannel.SMS and phone and gateway_url(NotificationChannel.SMS):
+        return NotificationChannel.SMS, phone
+    if preferred_channel == NotificationChannel.PUSH and push_token and gateway_url(NotificationChannel.PUSH):
+        return NotificationChannel.PUSH, push_token
+    return NotificationChannel.EMAIL, email
+
+
+class FileGateway:
+    """Appends messages as JSON lines to a local file"""
+
+    _locks = {}
+    _locks_guard = threading.Lock()
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with self._locks_guard:
+            self.lock = self._locks.setdefault(path, threading.Lock())
+
+    def post(self, payload):
+        line = json.dumps(dict(payload, sent_at=time.time())) + '\n'
+        with self.lock:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(line)
+
+    def close(self):
+        pass
+
+
+class HTTPGateway:
+    """POSTs messages as JSON to an HTTP endpoint over one kept-alive connection"""
+
+    def __init__(self, url, timeout=None):
+        parts = urlsplit(url)
+        self.scheme = parts.scheme
+        self.netloc = parts.netloc
+        self.path = parts.path or '/'
+        if parts.query:
+            self.path += '?' + parts.query
+        self.timeout = timeout or getattr(settings, 'NOTIFICATION_GATEWAY_TIMEOUT', 10)
+        self.connection = None
+
+    def _connect(self):
+        connection_class = (
+            http.client.HTTPSConnection if self.scheme == 'https' else http.client.HTTPConnection
+        )
+        self.connection = connection_class(self.netloc, timeout=self.timeout)
+
+    def post(self, payload):
+        body = json.dumps(payload).encode()
+        headers = {'Content-Type': 'application/json'}
+
+        # A kept-alive connection the server closed fails on first use; retry once fresh
+        for attempt in (1, 2):
+            if self.connection is None:
+                self._connect()
+            try:
+                self.connection.request('POST', self.path, body=body, headers=headers)
+                response = self.connection.getresponse()
+                response.read()
+                break
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                self.close()
+                if attempt == 2:
+                    raise
+
+        if not 200 <= response.status < 300:
+            raise RuntimeError(f"Gateway {self.netloc} answered {response.status} {response.reason}")
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+
+def get_gateway(url):
+    parts = urlsplit(url)
+    if parts.scheme == 'file':
+        return FileGateway(parts.path)
+    if parts.scheme in ('http', 'https'):
+        return HTTPGateway(url)
+    raise ValueError(f"Unsupported notification gateway URL: {url}")
+
+
+class EmailChannel:
+    name = NotificationChannel.EMAIL
+
+    def __init__(self):
+        from .outbox import PooledMailer
+        self.mailer = PooledMailer()
+
+    def send(self, message):
+        email = EmailMultiAlternatives(message.subject, message.body, message.from_email, [message.recipient])
+        if message.html_body:
+            email.attach_alternative(message.html_body, 'text/html')
+        self.mailer.send(email)
+
+    def close(self):
+        self.mailer.close()
+
+
+class GatewayChannel:
+    """SMS or push delivery through a gateway"""
+
+    def __init__(self, name, url):
+        self.name = name
+        self.gateway = get_gateway(url)
+
+    def send(self, message):
+        self.gateway.post({
+            'channel': self.name,
+            'to': message.recipient,
+            'subject': message.subject,
+            'body': message.body,
+        })
+
+    def close(self):
+        self.gateway.close()
+
+
+def get_channel(name):
+    """A new channel instance for `name` (one per thread)"""
+    if name == NotificationChannel.EMAIL:
+        return EmailChannel()
+    url = gateway_url(name)
+    if not url:
+        raise ValueError(f"No gateway configured for {name} ({GATEWAY_SETTINGS[name]})")
+    return GatewayChannel(name, url)
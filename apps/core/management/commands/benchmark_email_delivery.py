@@ -0,0 +1,70 @@
+"""
+Management command measuring email fan-out throughput and connection
+handshakes per message, one connection per message (what a bare send_mail
+does) versus the outbox's PooledMailer.
+
+Point EMAIL_HOST/EMAIL_PORT at a local SMTP sink first, e.g.
+    python -m aiosmtpd -n -l localhost:1025
+and run with EMAIL_USE_TLS off if the sink does not speak STARTTLS.
+"""
+import time
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.core.management.base import BaseCommand
+
+from apps.core.outbox import PooledMailer
+
+
+class Command(BaseCommand):
+    help = 'Compare per-message and pooled SMTP delivery against the configured mail server'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--count',
+            type=int,
+            default=200,
+            help='Messages sent per mode (default: 200)',
+        )
+        parser.add_argument(
+            '--messages-per-connection',
+            type=int,
+            default=getattr(settings, 'EMAIL_OUTBOX_MESSAGES_PER_CONNECTION', 100),
+            help='Pooled connection recycling threshold (default: EMAIL_OUTBOX_MESSAGES_PER_CONNECTION)',
+        )
+        parser.add_argument(
+            '--to',
+            default='benchmark@example.com',
+            help='Recipient address (default: benchmark@example.com)',
+        )
+
+    def handle(self, *args, **options):
+        messages = [
+            EmailMessage(
+                f"Urgent: O- Blood Needed ({i})",
+                "A blood request has been posted that matches your profile.",
+                settings.DEFAULT_FROM_EMAIL,
+                [options['to']],
+            )
+            for i in range(options['count'])
+        ]
+        self.stdout.write(f"Backend: {settings.EMAIL_BACKEND} ({getattr(settings, 'EMAIL_HOST', '')}:"
+                          f"{getattr(settings, 'EMAIL_PORT', '')})")
+
+        started = time.perf_counter()
+        for message in messages:
+            get_connection(fail_silently=False).send_messages([message])
+        self._report('per-message', len(messages), len(messages), time.perf_counter() - started)
+
+        started = time.perf_counter()
+        with PooledMailer(options['messages_per_connection']) as mailer:
+            for message in messages:
+                mailer.send(message)
+        self._report('pooled', len(messages), mailer.connections_opened, time.perf_counter() - started)
+
+    def _report(self, mode, count, connections, elapsed):
+        self.stdout.write(
+            f"{mode:>12}: {count} messages in {elapsed * 1000:.1f}ms "
+            f"({count / elapsed:.0f} msg/s), {connections} connections "
+            f"({connections / count:.3f} handshakes/message)"
+        )
@@ -0,0 +1,72 @@
+"""
+Management command measuring notification dispatch throughput and
+per-channel send latency through the outbox Dispatcher, against the
+configured mail backend and SMS/push gateways (use a local SMTP sink and
+`manage.py run_stub_gateway` to run it offline). Nothing is written to the
+outbox table.
+"""
+import statistics
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from apps.core.models import NotificationChannel, OutboxMessage
+from apps.core.outbox import Dispatcher
+
+
+class Command(BaseCommand):
+    help = 'Benchmark concurrent notification dispatch per channel'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=500, help='Messages per channel (default: 500)')
+        parser.add_argument(
+            '--channel',
+            action='append',
+            choices=NotificationChannel.values,
+            help='Channel to benchmark; repeat for several (default: SMS and PUSH)',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            action='append',
+            help='Dispatcher thread counts to compare; repeat for several (default: 1 and NOTIFICATION_DISPATCH_WORKERS)',
+        )
+
+    def handle(self, *args, **options):
+        channels = options['channel'] or [NotificationChannel.SMS, NotificationChannel.PUSH]
+        worker_counts = options['workers'] or sorted({1, getattr(settings, 'NOTIFICATION_DISPATCH_WORKERS', 8)})
+        recipients = {
+            NotificationChannel.EMAIL: 'benchmark@example.com',
+            NotificationChannel.SMS: '+2348000000000',
+            NotificationChannel.PUSH: 'benchmark-push-token',
+        }
+
+        for channel in channels:
+            rows = [
+                OutboxMessage(
+                    id=i,
+                    channel=channel,
+                    recipient=recipients[channel],
+                    from_email=settings.DEFAULT_FROM_EMAIL,
+                    subject='Urgent: O- Blood Needed',
+                    body='Lifeline: O- Red cells needed at General Hospital, Ikeja. Call 0800 or accept: ...',
+                )
+                for i in range(options['count'])
+            ]
+
+            for workers in worker_counts:
+                with Dispatcher(workers, keep_latencies=True) as dispatcher:
+                    started = time.perf_counter()
+                    results = dispatcher.send_all(rows)
+                    elapsed = time.perf_counter() - started
+
+                latencies = sorted(dispatcher.latencies[channel])
+                failed = sum(1 for _, error in results if error is not None)
+                p50 = statistics.median(latencies) * 1000
+                p95 = latencies[int(len(latencies) * 0.95) - 1] * 1000
+                self.stdout.write(
+                    f"{channel:>5} x{workers:<3}: {len(rows)} messages in {elapsed * 1000:.1f}ms "
+                    f"({len(rows) / elapsed:.0f} msg/s), {failed} failed, "
+                    f"latency p50 {p50:.1f}ms p95 {p95:.1f}ms"
+                )
@@ -0,0 +1,111 @@
+"""
+Management command to verify that the alternative matching engines return
+the same donors as the ORM matching query.
+"""
+import os
+import tempfile
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from apps.blood_requests.eligibility_bitmap import EligibilityBitmapReader, EligibilityBitmapWriter
+from apps.blood_requests.matching_engine import ColumnarDonorIndex, np
+from apps.blood_requests.models import BloodRequest
+from apps.blood_requests.services import DonorMatchingService
+from apps.core.antigens import Antigens
+from apps.core.blood_compatibility import BloodCompatibility
+from apps.hospitals.models import Hospital
+
+
+class Command(BaseCommand):
+    help = 'Compare the reachability, columnar and bitmap engines against the ORM matching query'
+
+    # No antigen requirement, a common one (Kell) and a rarer combination
+    ANTIGEN_MASKS = (
+        0,
+        Antigens.names_to_mask(['K']),
+        Antigens.names_to_mask(['K', 'Fya', 'Jkb']),
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--request-id',
+            type=int,
+            help='Only check this blood request (default: every hospital x blood type x component x sample antigen mask)',
+        )
+
+    def handle(self, *args, **options):
+        today = timezone.now().date()
+
+        engines = {
+            'reachability': lambda hospital, types, areas, antigens: DonorMatchingService.query_reachable_donors(
+                hospital.id, types, today, antigens
+            ).values_list('id', flat=True),
+        }
+        if np is not None:
+            index = ColumnarDonorIndex()
+            index.load()
+            engines['columnar'] = lambda hospital, types, areas, antigens: index.match(types, areas, today, antigens)
+        else:
+            self.stdout.write(self.style.WARNING('numpy is not installed - skipping the columnar and bitmap engines'))
+
+        if np is not None:
+            # Build a private bitmap file so the check never touches the live one
+            bitmap_dir = tempfile.TemporaryDirectory()
+            writer = EligibilityBitmapWriter(os.path.join(bitmap_dir.name, 'donor_eligibility.bin'))
+            writer.load()
+            writer.write()
+            reader = EligibilityBitmapReader(writer.path)
+            engines['bitmap'] = lambda hospital, types, areas, antigens: reader.match(types, areas, today, antigens)
+
+        if options['request_id']:
+            try:
+                blood_request = BloodRequest.objects.select_related('hospital').get(id=options['request_id'])
+            except BloodRequest.DoesNotExist:
+                raise CommandError(f"Blood request {options['request_id']} does not exist")
+            cases = [(
+                blood_request.hospital, blood_request.blood_type, blood_request.component,
+                blood_request.antigen_negative_required,
+            )]
+        else:
+            cases = [
+                (hospital, blood_type, component, antigens)
+                for hospital in Hospital.objects.all()
+                for blood_type in BloodCompatibility.BLOOD_TYPES
+                for component in BloodCompatibility.COMPONENTS
+                for antigens in self.ANTIGEN_MASKS
+            ]
+
+        if not cases:
+            raise CommandError('No hospitals to check; the engines are also covered by apps.blood_requests.tests')
+
+        mismatches = 0
+        for hospital, blood_type, component, antigens in cases:
+            compatible_types = BloodCompatibility.get_compatible_donor_types(blood_type, component)
+            service_area_ids = list(hospital.service_locations.values_list('id', flat=True))
+
+            expected = set(
+                DonorMatchingService.query_compatible_donors(
+                    compatible_types, service_area_ids, today, antigens
+                ).values_list('id', flat=True)
+            )
+
+            for name, engine in engines.items():
+                actual = set(engine(hospital, compatible_types, service_area_ids, antigens))
+                if expected != actual:
+                    mismatches += 1
+                    self.stdout.write(
+                        self.style.ERROR(
+                            f'[{name}] {hospital.name} / {blood_type} {component} '
+                            f'{Antigens.mask_to_names(antigens)}: '
+                            f'missing {sorted(expected - actual)}, extra {sorted(actual - expected)}'
+                        )
+                    )
+
+        checked = len(cases) * len(engines)
+        if mismatches:
+            raise CommandError(f'{mismatches} of {checked} checks differ from the ORM path')
+
+        self.stdout.write(
+            self.style.SUCCESS(f"All {checked} checks ({', '.join(engines)}) match the ORM path")
+        )
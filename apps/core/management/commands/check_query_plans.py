@@ -0,0 +1,100 @@
+"""
+Management command to check the query plans of the matching and listing hot
+paths. Fails when any of them falls back to a full table scan, so it can be
+run in CI against a migrated database.
+"""
+import re
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from apps.blood_requests.models import BloodRequest
+from apps.blood_requests.services import DonorMatchingService
+from apps.core.blood_compatibility import BloodCompatibility
+from apps.donors.availability import available_now
+from apps.hospitals.models import Hospital
+
+# SQLite: "SCAN donors_donor" is a full scan; "SCAN t USING INDEX i" and
+# "SEARCH t USING ..." walk an index. Postgres: "Seq Scan on t".
+SQLITE_FULL_SCAN = re.compile(r'\bSCAN (\w+)(?! USING (?:COVERING )?INDEX)(?:\s|$)')
+POSTGRES_FULL_SCAN = re.compile(r'Seq Scan on (\w+)')
+# Django aliases tables inside subqueries ("donors_donor_service_locations" U0),
+# and SQLite plans name the alias
+TABLE_ALIAS = re.compile(r'"(\w+)" (?:AS )?([A-Z]\d+)\b')
+
+
+class Command(BaseCommand):
+    help = 'Fail if the matching/listing hot-path queries use full table scans'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verbose-plans',
+            action='store_true',
+            help='Print every query plan, not only failing ones',
+        )
+
+    def hot_path_queries(self):
+        """(name, queryset) pairs for the queries that must stay indexed"""
+        hospital = Hospital.objects.first()
+        hospital_id = hospital.id if hospital else 0
+        area_ids = list(hospital.service_locations.values_list('id', flat=True)) if hospital else [0]
+        compatible_types = BloodCompatibility.get_compatible_donor_types('A+')
+        today = timezone.now().date()
+
+        return [
+            ('matching (orm)', DonorMatchingService.query_compatible_donors(
+                compatible_types, area_ids, today
+            )),
+            ('matching (available now)', available_now(DonorMatchingService.query_compatible_donors(
+                compatible_types, area_ids, today
+            ))),
+            ('matching (reachability)', DonorMatchingService.query_reachable_donors(
+                hospital_id, compatible_types, today
+            )),
+            ('donor open-request list', DonorMatchingService.open_requests_for_donor('O+', area_ids)),
+            ('hospital request list', BloodRequest.objects.filter(hospital_id=hospital_id)),
+        ]
+
+    def handle(self, *args, **options):
+        vendor = connection.vendor
+        if vendor == 'sqlite':
+            pattern = SQLITE_FULL_SCAN
+        elif vendor == 'postgresql':
+            pattern = POSTGRES_FULL_SCAN
+        else:
+            raise CommandError(f'Query plan checks are not implemented for {vendor}')
+
+        guarded_tables = {
+            model._meta.db_table
+            for model in (BloodRequest, Hospital.service_locations.through)
+        } | {
+            model._meta.db_table
+            for model in DonorMatchingService.matching_models()
+        }
+
+        failures = 0
+        for name, queryset in self.hot_path_queries():
+            with transaction.atomic():
+                if vendor == 'postgresql':
+                    # Small test tables make sequential scans look cheaper
+                    # than an index; only a missing index should show one
+                    with connection.cursor() as cursor:
+                        cursor.execute('SET LOCAL enable_seqscan = off')
+                plan = queryset.explain()
+
+            aliases = {alias: table for table, alias in TABLE_ALIAS.findall(str(queryset.query))}
+            scanned = sorted({
+                aliases.get(name, name) for name in pattern.findall(plan)
+            } & guarded_tables)
+            if scanned:
+                failures += 1
+                self.stdout.write(self.style.ERROR(f"{name}: full scan on {', '.join(scanned)}"))
+                self.stdout.write(plan)
+            else:
+                self.stdout.write(self.style.SUCCESS(f'{name}: ok'))
+                if options['verbose_plans']:
+                    self.stdout.write(plan)
+
+        if failures:
+            raise CommandError(f'{failures} hot-path queries fall back to full scans')
@@ -0,0 +1,86 @@
+"""
+Management command printing notification delivery percentiles from the
+database, across every web worker and outbox worker: per channel, messages
+queued/sent/failed and the time from queueing to sending; per blood
+request, matched (alerted) donors and the time from the request being
+posted to its last alert leaving the outbox.
+
+In-process counters and histograms (send latency per message included)
+are in apps.core.metrics; `run_outbox` prints its own on exit.
+"""
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db.models import Count, Max
+from django.utils import timezone
+
+from apps.blood_requests.models import BloodRequest, DonorAlert
+from apps.core.metrics import summarize
+from apps.core.models import OutboxMessage
+
+
+class Command(BaseCommand):
+    help = 'Print notification delivery counts and latency percentiles'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--hours',
+            type=float,
+            default=24,
+            help='Look at messages and requests created in the last N hours (default: 24)',
+        )
+
+    def handle(self, *args, **options):
+        since = timezone.now() - timedelta(hours=options['hours'])
+        self.stdout.write(f"Since {timezone.localtime(since):%Y-%m-%d %H:%M}")
+
+        counts = {}
+        for channel, status, count in (
+            OutboxMessage.objects.filter(created_at__gte=since)
+            .values_list('channel', 'status').annotate(count=Count('id')).order_by()
+        ):
+            counts.setdefault(channel, {})[status] = count
+
+        queue_seconds = {}
+        for channel, created_at, sent_at in (
+            OutboxMessage.objects.filter(created_at__gte=since, status=OutboxMessage.Status.SENT)
+            .values_list('channel', 'created_at', 'sent_at').iterator(chunk_size=5000)
+        ):
+            queue_seconds.setdefault(channel, []).append((sent_at - created_at).total_seconds())
+
+        self.stdout.write(self.style.MIGRATE_HEADING('Outbox'))
+        for channel in sorted(counts):
+            by_status = counts[channel]
+            self.stdout.write(
+                f"  {channel:<5} queued {sum(by_status.values())}, "
+                f"sent {by_status.get(OutboxMessage.Status.SENT, 0)}, "
+                f"failed {by_status.get(OutboxMessage.Status.FAILED, 0)}, "
+                f"pending {by_status.get(OutboxMessage.Status.PENDING, 0) + by_status.get(OutboxMessage.Status.SENDING, 0)}"
+            )
+            self._percentiles('queued -> sent', queue_seconds.get(channel, []))
+
+        per_request = list(
+            DonorAlert.objects.filter(request__created_at__gte=since)
+            .values('request_id', 'request__created_at')
+            .annotate(alerts=Count('id'), last_sent=Max('message__sent_at'))
+            .order_by()
+        )
+        posted = BloodRequest.objects.filter(created_at__gte=since).count()
+
+        self.stdout.write(self.style.MIGRATE_HEADING('Blood requests'))
+        self.stdout.write(f"  {posted} posted, {len(per_request)} with donors alerted")
+        self._percentiles('donors alerted', [row['alerts'] for row in per_request], unit='')
+        self._percentiles('posted -> last alert sent', [
+            (row['last_sent'] - row['request__created_at']).total_seconds()
+            for row in per_request if row['last_sent'] is not None
+        ])
+
+    def _percentiles(self, label, values, unit='s'):
+        if not values:
+            self.stdout.write(f"    {label}: no data")
+            return
+        summary = summarize(values)
+        self.stdout.write(
+            f"    {label}: n={summary['count']} "
+            + ' '.join(f"{key} {summary[key]:.2f}{unit}" for key in ('p50', 'p95', 'p99', 'max'))
+        )
@@ -0,0 +1,28 @@
+"""
+Management command to rebuild the materialized donor-to-hospital
+reachability table.
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.blood_requests.reachability import rebuild_all
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the DonorReachability table in chunks of donor ids'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=5000,
+            help='Number of donor ids rebuilt per transaction (default: 5000)',
+        )
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        if chunk_size < 1:
+            raise CommandError('--chunk-size must be at least 1')
+
+        self.stdout.write('Rebuilding donor reachability...')
+        total = rebuild_all(chunk_size=chunk_size)
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {total} reachability rows'))
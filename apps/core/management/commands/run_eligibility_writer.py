@@ -0,0 +1,84 @@
+"""
+Management command running the single per-node writer of the shared donor
+eligibility bitmap (see apps/blood_requests/eligibility_bitmap.py).
+"""
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from apps.blood_requests.eligibility_bitmap import (
+    EligibilityBitmapWriter,
+    acquire_writer_lock,
+    bitmap_path,
+    take_dirty,
+)
+
+
+class Command(BaseCommand):
+    help = 'Build the donor eligibility bitmap and keep it patched from the change journal'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Build the bitmap once and exit',
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=1.0,
+            help='Seconds between journal checks (default: 1)',
+        )
+
+    def handle(self, *args, **options):
+        path = bitmap_path()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+        lock = acquire_writer_lock(path)
+        if lock is None:
+            raise CommandError(f'Another eligibility bitmap writer holds {path}.lock')
+
+        rebuild_interval = getattr(settings, 'DONOR_ELIGIBILITY_BITMAP_REBUILD_INTERVAL', 300)
+        writer = EligibilityBitmapWriter(path)
+
+        try:
+            take_dirty(path)
+            self._rebuild(writer)
+            if options['once']:
+                return
+
+            rebuilt_at = time.monotonic()
+            while True:
+                time.sleep(options['poll_interval'])
+
+                if (
+                    writer.built_day != timezone.now().date()
+                    or time.monotonic() - rebuilt_at > rebuild_interval
+                ):
+                    # Anything journaled so far is covered by the rebuild
+                    take_dirty(path)
+                    self._rebuild(writer)
+                    rebuilt_at = time.monotonic()
+                    continue
+
+                donor_ids = take_dirty(path)
+                if donor_ids:
+                    writer.patch(donor_ids)
+                    writer.write()
+                    self.stdout.write(f'Patched {len(donor_ids)} donors (generation {writer.generation})')
+        except KeyboardInterrupt:
+            pass
+        finally:
+            lock.close()
+
+    def _rebuild(self, writer):
+        started = time.monotonic()
+        writer.load()
+        writer.write()
+        self.stdout.write(self.style.SUCCESS(
+            f'Built eligibility bitmap for {len(writer.donor_ids)} donors, {len(writer.lgas)} LGAs '
+            f'in {(time.monotonic() - started) * 1000:.1f}ms -> {writer.path}'
+        ))
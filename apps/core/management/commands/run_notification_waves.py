@@ -0,0 +1,63 @@
+"""
+Management command scheduling staged donor alert waves and alert digests
+(see apps/blood_requests/waves.py and notifications.py).
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.blood_requests import notifications, waves
+
+
+class Command(BaseCommand):
+    help = 'Send due donor alert waves and digests for requests that are still open'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Send the waves due now and exit',
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=5.0,
+            help='Seconds between checks for due waves (default: 5)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=100,
+            help='Requests handled per check (default: 100)',
+        )
+        parser.add_argument(
+            '--stats',
+            action='store_true',
+            help='Print alerts per closed request and exit',
+        )
+
+    def handle(self, *args, **options):
+        if options['stats']:
+            for key, value in waves.stats().items():
+                self.stdout.write(f'{key}: {value:.2f}' if isinstance(value, float) else f'{key}: {value}')
+            return
+
+        try:
+            while True:
+                sent, alerted, stopped = waves.run_due_waves(limit=options['batch_size'])
+                if sent or stopped:
+                    self.stdout.write(f'{sent} waves sent ({alerted} donors alerted), {stopped} requests stopped')
+
+                if notifications.dedupe_window():
+                    digests, digested, dropped = notifications.send_digests()
+                    if digests or dropped:
+                        self.stdout.write(f'{digests} digests sent ({digested} alerts), {dropped} dropped')
+
+                if options['once']:
+                    if sent + stopped < options['batch_size']:
+                        break
+                    continue
+                if sent + stopped < options['batch_size']:
+                    time.sleep(options['poll_interval'])
+        except KeyboardInterrupt:
+            pass
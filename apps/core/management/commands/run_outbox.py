@@ -0,0 +1,79 @@
+"""
+Management command delivering queued notifications from the transactional outbox
+(see apps/core/outbox.py). Several workers can run side by side.
+"""
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from apps.core import metrics
+from apps.core.outbox import Dispatcher, claim_batch, deliver, new_worker_id
+
+
+class Command(BaseCommand):
+    help = 'Deliver queued email, SMS and push notifications from the outbox'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Drain everything currently due and exit',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=getattr(settings, 'EMAIL_OUTBOX_BATCH_SIZE', 100),
+            help='Rows claimed per batch (default: EMAIL_OUTBOX_BATCH_SIZE)',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=getattr(settings, 'NOTIFICATION_DISPATCH_WORKERS', 8),
+            help='Concurrent send threads (default: NOTIFICATION_DISPATCH_WORKERS)',
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=1.0,
+            help='Seconds to sleep when nothing is due (default: 1)',
+        )
+
+    def handle(self, *args, **options):
+        owner = new_worker_id()
+        total_sent = total_failed = 0
+
+        # Channel connections carry consecutive batches; they are closed while idle
+        dispatcher = Dispatcher(options['workers'])
+        try:
+            while True:
+                rows = claim_batch(owner, batch_size=options['batch_size'])
+                if not rows:
+                    if options['once']:
+                        break
+                    dispatcher.close()
+                    time.sleep(options['poll_interval'])
+                    continue
+
+                sent, failed = deliver(rows, dispatcher)
+                total_sent += sent
+                total_failed += failed
+                self.stdout.write(f'Delivered {sent}, failed {failed}')
+        except KeyboardInterrupt:
+            pass
+        finally:
+            dispatcher.shutdown()
+
+        histograms = metrics.snapshot()['histograms']
+        for channel, (sent, failed, seconds) in sorted(dispatcher.stats.items()):
+            latency = histograms.get(f'notification_send_seconds{{channel={channel}}}')
+            self.stdout.write(
+                f'{channel}: {sent} sent, {failed} failed, send latency '
+                f'mean {seconds / (sent + failed) * 1000:.1f}ms '
+                f'p50 {latency["p50"] * 1000:.1f}ms p95 {latency["p95"] * 1000:.1f}ms '
+                f'p99 {latency["p99"] * 1000:.1f}ms'
+            )
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Outbox worker {owner[:8]} done: {total_sent} sent, {total_failed} failed'
+        ))
@@ -0,0 +1,79 @@
+"""
+Management command serving a local SMS/push gateway stub, for testing
+notification throughput and latency offline. Point NOTIFICATION_SMS_GATEWAY
+and/or NOTIFICATION_PUSH_GATEWAY at http://127.0.0.1:<port>/<channel>.
+"""
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = 'Serve a local HTTP stub of the SMS/push gateways'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--port', type=int, default=8025, help='Port to listen on (default: 8025)')
+        parser.add_argument(
+            '--latency-ms',
+            type=float,
+            default=0,
+            help='Simulated gateway latency per message (default: 0)',
+        )
+        parser.add_argument(
+            '--failure-rate',
+            type=float,
+            default=0,
+            help='Fraction of messages answered with 503 (default: 0)',
+        )
+        parser.add_argument('--output', help='Append received messages as JSON lines to this file')
+
+    def handle(self, *args, **options):
+        latency = options['latency_ms'] / 1000
+        failure_rate = options['failure_rate']
+        output = open(options['output'], 'a', encoding='utf-8') if options['output'] else None
+        lock = threading.Lock()
+        counts = {'received': 0, 'rejected': 0}
+        stdout = self.stdout
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_POST(self):
+                payload = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+                if latency:
+                    time.sleep(latency)
+
+                rejected = random.random() < failure_rate
+                with lock:
+                    counts['rejected' if rejected else 'received'] += 1
+                    if output and not rejected:
+                        output.write(json.dumps(payload) + '\n')
+                    total = counts['received'] + counts['rejected']
+                    if total % 1000 == 0:
+                        stdout.write(f"{counts['received']} received, {counts['rejected']} rejected")
+
+                status = 503 if rejected else 202
+                self.send_response(status)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer(('127.0.0.1', options['port']), Handler)
+        self.stdout.write(f"Stub gateway listening on http://127.0.0.1:{options['port']}/")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            if output:
+                output.close()
+            self.stdout.write(self.style.SUCCESS(
+                f"{counts['received']} received, {counts['rejected']} rejected"
+            ))
@@ -0,0 +1,122 @@
+"""
+In-process notification metrics: counters and histograms.
+
+    metrics.increment('notifications_sent', channel='SMS')
+    metrics.observe('notification_send_seconds', 0.042, channel='SMS')
+    metrics.snapshot()   # {'counters': {...}, 'histograms': {...}}
+
+Series are keyed by name plus labels. Histograms keep count, sum, min and
+max exactly. Percentiles come from a uniform reservoir sample of at most
+METRICS_RESERVOIR_SIZE values per series, so memory stays bounded however
+long a worker runs.
+
+Every process (web worker, outbox worker, scheduler) has its own registry.
+For numbers across processes, `manage.py notification_metrics` computes
+the same percentiles from the outbox and the DonorAlert ledger.
+"""
+import random
+import threading
+
+from django.conf import settings
+
+
+def percentile(sorted_values, q):
+    """Nearest-rank percentile (q in 0..100) of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(int(round(q / 100 * len(sorted_values))) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+def summarize(values):
+    """count/mean/p50/p95/p99/max of a list of numbers"""
+    values = sorted(values)
+    return {
+        'count': len(values),
+        'mean': sum(values) / len(values) if values else 0.0,
+        'p50': percentile(values, 50),
+        'p95': percentile(values, 95),
+        'p99': percentile(values, 99),
+        'max': values[-1] if values else 0.0,
+    }
+
+
+def _series(name, labels):
+    if not labels:
+        return name
+    return name + '{' + ','.join(f'{key}={value}' for key, value in sorted(labels.items())) + '}'
+
+
+class Histogram:
+
+    def __init__(self, size):
+        self.size = size
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+        self.sample = []
+
+    def observe(self, value):
+        self.count += 1
+        self.total += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+        if len(self.sample) < self.size:
+            self.sample.append(value)
+        else:
+            # Reservoir sampling: every value seen so far is kept with equal probability
+            slot = random.randrange(self.count)
+            if slot < self.size:
+                self.sample[slot] = value
+
+    def summary(self):
+        values = sorted(self.sample)
+        return {
+            'count': self.count,
+            'mean': self.total / self.count if self.count else 0.0,
+            'p50': percentile(values, 50),
+            'p95': percentile(values, 95),
+            'p99': percentile(values, 99),
+            'max': self.max or 0.0,
+        }
+
+
+class Registry:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+
+    def increment(self, name, amount=1, **labels):
+        key = _series(name, labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def observe(self, name, value, **labels):
+        key = _series(name, labels)
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram(getattr(settings, 'METRICS_RESERVOIR_SIZE', 10000))
+            histogram.observe(value)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'counters': dict(self.counters),
+                'histograms': {key: histogram.summary() for key, histogram in self.histograms.items()},
+            }
+
+    def reset(self):
+        with self._lock:
+            self.counters.clear()
+            self.histograms.clear()
+
+
+registry = Registry()
+increment = registry.increment
+observe = registry.observe
+snapshot = registry.snapshot
+reset = registry.reset
@@ -0,0 +1,30 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_outboxemail'),
+    ]
+
+    operations = [
+        migrations.RenameModel(
+            old_name='OutboxEmail',
+            new_name='OutboxMessage',
+        ),
+        migrations.RenameField(
+            model_name='outboxmessage',
+            old_name='to_email',
+            new_name='recipient',
+        ),
+        migrations.AlterField(
+            model_name='outboxmessage',
+            name='recipient',
+            field=models.CharField(max_length=255),
+        ),
+        migrations.AddField(
+            model_name='outboxmessage',
+            name='channel',
+            field=models.CharField(choices=[('EMAIL', 'Email'), ('SMS', 'SMS'), ('PUSH', 'Push notification')], default='EMAIL', max_length=5),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.6 on 2026-10-17 07:00
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_outboxmessage_channels'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='outboxmessage',
+            name='outbox_pending_due_idx',
+        ),
+        migrations.AddField(
+            model_name='outboxmessage',
+            name='deadline',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddIndex(
+            model_name='outboxmessage',
+            index=models.Index(condition=models.Q(('status', 'PENDING')), fields=['deadline', 'next_attempt_at'], name='outbox_pending_due_idx'),
+        ),
+    ]
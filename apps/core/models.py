@@ -1,3 +1,63 @@
 from django.db import models
+from django.utils import timezone
 
 # Create your models here.
+
+
+class NotificationChannel(models.TextChoices):
+    EMAIL = 'EMAIL', 'Email'
+    SMS = 'SMS', 'SMS'
+    PUSH = 'PUSH', 'Push notification'
+
+
+class OutboxMessage(models.Model):
+    """
+    Transactional notification outbox. Rows are written in the same
+    transaction as the change that triggers them and delivered by
+    `manage.py run_outbox` (see apps/core/outbox.py), so request latency
+    never depends on SMTP or the SMS/push gateways.
+    """
+    class Status(models.TextChoices):
+        PENDING = 'PENDING', 'Pending'
+        SENDING = 'SENDING', 'Sending'
+        SENT = 'SENT', 'Sent'
+        FAILED = 'FAILED', 'Failed'
+
+    channel = models.CharField(max_length=5, choices=NotificationChannel.choices, default=NotificationChannel.EMAIL)
+    # Email address, phone number or push token depending on the channel
+    recipient = models.CharField(max_length=255)
+    from_email = models.CharField(max_length=254)
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    # Optional HTML alternative to an email's text body
+    html_body = models.TextField(blank=True)
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    # Due rows are claimed earliest deadline first (e.g. a critical request's alerts before routine ones)
+    deadline = models.DateTimeField(default=timezone.now)
+    # Set while a worker holds the row; an expired lease makes it claimable again
+    lease_owner = models.CharField(max_length=64, blank=True)
+    leased_until = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Claim query: pending rows in deadline order, filtered on being due
+            models.Index(
+                fields=['deadline', 'next_attempt_at'],
+                condition=models.Q(status='PENDING'),
+                name='outbox_pending_due_idx',
+            ),
+            # Lease recovery: rows whose worker died mid-send
+            models.Index(
+                fields=['leased_until'],
+                condition=models.Q(status='SENDING'),
+                name='outbox_sending_lease_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.channel} {self.recipient}: {self.subject} ({self.status})"
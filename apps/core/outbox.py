@@ -0,0 +1,407 @@
+"""
+Transactional notification outbox.
+
+Call sites enqueue messages instead of sending them. The OutboxMessage row
+is written in the caller's transaction, so a message exists exactly when
+the change that caused it committed, and `manage.py run_outbox` delivers
+it through its channel (email, SMS or push - see apps/core/channels.py).
+
+Workers claim due rows in batches by stamping them with a lease
+(lease_owner + leased_until) through a conditional UPDATE, after a
+SELECT ... FOR UPDATE SKIP LOCKED on backends that support it, so several
+workers never send the same row. A worker that dies mid-batch leaves its
+rows SENDING with an expiring lease; they become claimable again once it
+lapses. Due rows are claimed earliest deadline first (OutboxMessage.deadline,
+the request's needed_by for donor alerts). Failed sends are retried with
+exponential backoff up to EMAIL_OUTBOX_MAX_ATTEMPTS, then marked FAILED.
+
+A claimed batch is sent concurrently by a Dispatcher: a bounded pool of
+NOTIFICATION_DISPATCH_WORKERS threads, each with its own channel
+connections. Email reuses one mail backend connection (one SMTP+TLS
+handshake) for up to EMAIL_OUTBOX_MESSAGES_PER_CONNECTION messages and
+reconnects transparently when the server drops it (see PooledMailer).
+
+Each channel has a circuit breaker (apps/core/breaker.py). While a relay or
+gateway is failing or slow, its rows are parked back in the outbox instead
+of being attempted, and replayed once a probe send succeeds.
+
+With EMAIL_OUTBOX_EAGER (handy in development without a worker running) the
+rows are still written, and are delivered in-process right after commit.
+"""
+import random
+import smtplib
+import threading
+import time
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.mail import get_connection
+from django.db import connection, transaction
+from django.db.models import F, Q
+from django.dispatch import Signal
+from django.utils import timezone
+
+from . import metrics
+from .breaker import CLOSED, HALF_OPEN, CircuitBreaker, breakers_enabled
+from .channels import get_channel
+from .models import NotificationChannel, OutboxMessage
+
+import logging
+logger = logging.getLogger('apps.core')
+
+# Sent after a delivered batch is marked SENT, with message_ids and sent_at
+messages_sent = Signal()
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def enqueue_email(subject, message, to_email, from_email=None):
+    """Queue one email; returns the OutboxMessage row"""
+    return enqueue_emails([(subject, message, to_email)], from_email=from_email)[0]
+
+
+def enqueue_emails(messages, from_email=None):
+    """Queue many (subject, message, to_email) tuples; returns the created rows"""
+    return enqueue_messages(
+        [(NotificationChannel.EMAIL, to_email, subject, message) for subject, message, to_email in messages],
+        from_email=from_email
+    )
+
+
+def enqueue_messages(messages, from_email=None, deadline=None):
+    """
+    Queue many (channel, recipient, subject, body) tuples with one bulk
+    INSERT. Workers claim rows earliest `deadline` first (default: now);
+    a tuple may carry its own deadline as a fifth item and an HTML body
+    (emails only) as a sixth. Returns the created rows.
+    """
+    from_email = from_email or settings.DEFAULT_FROM_EMAIL
+    deadline = deadline or timezone.now()
+
+    def row(channel, recipient, subject, body, own_deadline=None, html_body=''):
+        return OutboxMessage(
+            channel=channel, recipient=recipient, subject=subject, body=body, html_body=html_body,
+            from_email=from_email, deadline=own_deadline or deadline
+        )
+
+    rows = OutboxMessage.objects.bulk_create([row(*message) for message in messages], batch_size=500)
+    logger.debug(f"Queued {len(rows)} outbox messages")
+    for channel, count in Counter(message.channel for message in rows).items():
+        metrics.increment('notifications_queued', count, channel=channel)
+
+    if rows and _setting('EMAIL_OUTBOX_EAGER', False):
+        transaction.on_commit(lambda: deliver_due(batch_size=len(rows)))
+    return rows
+
+
+def _claimable(now):
+    return Q(status=OutboxMessage.Status.PENDING, next_attempt_at__lte=now) | Q(
+        status=OutboxMessage.Status.SENDING, leased_until__lt=now
+    )
+
+
+def claim_batch(owner, batch_size=None, lease_seconds=None):
+    """Lease up to `batch_size` due rows to `owner` and return them"""
+    batch_size = batch_size or _setting('EMAIL_OUTBOX_BATCH_SIZE', 100)
+    lease_seconds = lease_seconds or _setting('EMAIL_OUTBOX_LEASE_SECONDS', 300)
+    now = timezone.now()
+
+    with transaction.atomic():
+        # Earliest deadline first: a critical request's alerts jump a saturated queue
+        candidates = OutboxMessage.objects.filter(_claimable(now)).order_by('deadline', 'next_attempt_at', 'id')
+        if connection.features.has_select_for_update_skip_locked:
+            candidates = candidates.select_for_update(skip_locked=True)
+        ids = list(candidates.values_list('id', flat=True)[:batch_size])
+        if not ids:
+            return []
+
+        # Re-checking the claim condition makes the UPDATE itself the
+        # arbiter on backends without row locks
+        OutboxMessage.objects.filter(_claimable(now), id__in=ids).update(
+            status=OutboxMessage.Status.SENDING,
+            lease_owner=owner,
+            leased_until=now + timedelta(seconds=lease_seconds),
+            attempts=F('attempts') + 1,
+        )
+
+    return list(
+        OutboxMessage.objects.filter(id__in=ids, lease_owner=owner, status=OutboxMessage.Status.SENDING)
+    )
+
+
+def backoff_delay(attempts):
+    """Exponential backoff with jitter: base * 2^(attempts-1), capped at one hour"""
+    base = _setting('EMAIL_OUTBOX_BACKOFF_SECONDS', 30)
+    delay = min(base * 2 ** (attempts - 1), 3600)
+    return timedelta(seconds=delay * random.uniform(0.8, 1.2))
+
+
+class PooledMailer:
+    """
+    One mail backend connection reused across many messages.
+
+    The connection is opened lazily, recycled after `messages_per_connection`
+    messages (servers commonly cap messages per session) and reopened once
+    when the server has dropped it mid-session.
+    """
+
+    def __init__(self, messages_per_connection=None):
+        self.messages_per_connection = messages_per_connection or _setting(
+            'EMAIL_OUTBOX_MESSAGES_PER_CONNECTION', 100
+        )
+        self.connection = None
+        self.connections_opened = 0
+        self.messages_sent = 0
+        self._sent_on_connection = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _connect(self):
+        self.close()
+        self.connection = get_connection(fail_silently=False)
+        self.connection.open()
+        self.connections_opened += 1
+        self._sent_on_connection = 0
+
+    def close(self):
+        if self.connection is not None:
+            try:
+                self.connection.close()
+            except Exception:
+                pass
+            self.connection = None
+
+    def send(self, message):
+        """Send one EmailMessage; raises on failure"""
+        if self.connection is None or self._sent_on_connection >= self.messages_per_connection:
+            self._connect()
+
+        try:
+            self.connection.send_messages([message])
+        except smtplib.SMTPServerDisconnected:
+            logger.info("SMTP connection dropped, reconnecting")
+            self._connect()
+            self.connection.send_messages([message])
+
+        self._sent_on_connection += 1
+        self.messages_sent += 1
+
+
+class Dispatcher:
+    """
+    Sends outbox rows concurrently on a bounded thread pool. Each thread
+    lazily opens its own instance of every channel it needs and keeps it
+    across batches; `close()` drops the connections (they reopen on demand),
+    `shutdown()` also stops the pool.
+    """
+
+    def __init__(self, workers=None, keep_latencies=False):
+        self.workers = workers or _setting('NOTIFICATION_DISPATCH_WORKERS', 8)
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='outbox')
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._channels = []
+        # channel -> [sent, failed, total send seconds]
+        self.stats = {}
+        # channel -> [send seconds], when asked for (benchmarks)
+        self.latencies = {} if keep_latencies else None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+
+    def _channel(self, name):
+        channels = getattr(self._local, 'channels', None)
+        if channels is None:
+            channels = self._local.channels = {}
+        if name not in channels:
+            channels[name] = get_channel(name)
+            with self._lock:
+                self._channels.append(channels[name])
+        return channels[name]
+
+    def _send(self, row):
+        started = time.perf_counter()
+        error = None
+        try:
+            channel = self._channel(row.channel)
+            try:
+                channel.send(row)
+            except Exception:
+                # The session may be unusable after an error; start a fresh one
+                channel.close()
+                raise
+        except Exception as e:
+            error = e
+        elapsed = time.perf_counter() - started
+
+        with self._lock:
+            stats = self.stats.setdefault(row.channel, [0, 0, 0.0])
+            stats[1 if error else 0] += 1
+            stats[2] += elapsed
+            if self.latencies is not None:
+                self.latencies.setdefault(row.channel, []).append(elapsed)
+        return row, error, elapsed
+
+    def send_timed(self, rows):
+        """[(row, exception or None, send seconds)] in the order of `rows`"""
+        return list(self._executor.map(self._send, rows))
+
+    def send_all(self, rows):
+        """[(row, exception or None)] in the order of `rows`"""
+        return [(row, error) for row, error, _ in self.send_timed(rows)]
+
+    def close(self):
+        with self._lock:
+            for channel in self._channels:
+                channel.close()
+
+    def shutdown(self):
+        self._executor.shutdown()
+        self.close()
+
+
+def _apply_breakers(rows):
+    """
+    Split claimed rows by their channel's circuit breaker into (rows to
+    send now, {park-until datetime: rows}, channels sending a probe)
+    """
+    by_channel = {}
+    for row in rows:
+        by_channel.setdefault(row.channel, []).append(row)
+
+    to_send, parked, probes = [], {}, set()
+    for channel, channel_rows in by_channel.items():
+        breaker = CircuitBreaker(channel)
+        state = breaker.acquire()
+        if state == CLOSED:
+            to_send.extend(channel_rows)
+            continue
+        if state == HALF_OPEN:
+            # One probe; the rest are released and re-claimed once it settles
+            to_send.append(channel_rows[0])
+            probes.add(channel)
+            parked.setdefault(timezone.now(), []).extend(channel_rows[1:])
+            continue
+        until = datetime.fromtimestamp(breaker.retry_at(), tz=dt_timezone.utc)
+        parked.setdefault(until, []).extend(channel_rows)
+    return to_send, parked, probes
+
+
+def _park(parked):
+    """Hand rows back to the outbox unsent, without spending a delivery attempt"""
+    for until, rows in parked.items():
+        for owner in {row.lease_owner for row in rows}:
+            OutboxMessage.objects.filter(
+                id__in=[row.id for row in rows if row.lease_owner == owner],
+                lease_owner=owner,
+                status=OutboxMessage.Status.SENDING
+            ).update(
+                status=OutboxMessage.Status.PENDING,
+                next_attempt_at=until,
+                attempts=F('attempts') - 1,
+                lease_owner='',
+                leased_until=None,
+            )
+        for row in rows:
+            metrics.increment('notifications_parked', channel=row.channel)
+        if rows:
+            logger.info(f"Parked {len(rows)} {rows[0].channel} outbox messages until {until:%H:%M:%S} (breaker open)")
+
+
+def _record_breakers(results, probes):
+    slow_seconds = _setting('NOTIFICATION_BREAKER_SLOW_SECONDS', 5)
+    outcomes = {}
+    for row, error, elapsed in results:
+        counts = outcomes.setdefault(row.channel, [0, 0, 0])
+        counts[0] += 1
+        if error is not None:
+            counts[1] += 1
+        elif elapsed > slow_seconds:
+            counts[2] += 1
+    for channel, (calls, failures, slow) in outcomes.items():
+        CircuitBreaker(channel).record(calls, failures, slow, probe=channel in probes)
+
+
+def deliver(rows, dispatcher=None):
+    """Send leased rows and record the outcome; returns (sent, failed)"""
+    if dispatcher is None:
+        with Dispatcher() as dispatcher:
+            return deliver(rows, dispatcher)
+
+    max_attempts = _setting('EMAIL_OUTBOX_MAX_ATTEMPTS', 5)
+    sent_ids = []
+    failed = 0
+
+    probes = set()
+    if breakers_enabled():
+        rows, parked, probes = _apply_breakers(rows)
+        _park(parked)
+    results = dispatcher.send_timed(rows)
+
+    now = timezone.now()
+    for row, error, elapsed in results:
+        metrics.observe('notification_send_seconds', elapsed, channel=row.channel)
+        if error is None:
+            sent_ids.append(row.id)
+            metrics.increment('notifications_sent', channel=row.channel)
+            metrics.observe('notification_queue_seconds', (now - row.created_at).total_seconds(), channel=row.channel)
+            continue
+
+        failed += 1
+        metrics.increment('notifications_failed', channel=row.channel)
+        if row.attempts >= max_attempts:
+            status = OutboxMessage.Status.FAILED
+            logger.error(
+                f"Outbox {row.channel} message {row.id} to {row.recipient} failed permanently: {str(error)}"
+            )
+        else:
+            status = OutboxMessage.Status.PENDING
+            logger.warning(
+                f"Outbox {row.channel} message {row.id} to {row.recipient} failed "
+                f"(attempt {row.attempts}): {str(error)}"
+            )
+        OutboxMessage.objects.filter(id=row.id, lease_owner=row.lease_owner).update(
+            status=status,
+            next_attempt_at=now + backoff_delay(row.attempts),
+            lease_owner='',
+            leased_until=None,
+            last_error=str(error)[:2000],
+        )
+
+    if sent_ids:
+        OutboxMessage.objects.filter(id__in=sent_ids, status=OutboxMessage.Status.SENDING).update(
+            status=OutboxMessage.Status.SENT,
+            sent_at=now,
+            lease_owner='',
+            leased_until=None,
+            last_error='',
+        )
+        messages_sent.send(sender=OutboxMessage, message_ids=sent_ids, sent_at=now)
+
+    if breakers_enabled():
+        _record_breakers(results, probes)
+    return len(sent_ids), failed
+
+
+def deliver_due(batch_size=None, owner=None):
+    """Claim one batch and deliver it; returns (sent, failed)"""
+    rows = claim_batch(owner or new_worker_id(), batch_size=batch_size)
+    if not rows:
+        return 0, 0
+    return deliver(rows)
+
+
+def new_worker_id():
+    return uuid.uuid4().hex
@@ -1,3 +1,99 @@
-from django.test import TestCase
+from io import StringIO
 
-# Create your tests here.
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from apps.blood_requests.models import BloodRequest, DonorReachability
+from apps.donors.models import AvailabilityWindow, Donor, InboxMessage
+
+from .channels import route
+from .models import NotificationChannel
+
+
+class ChannelRoutingTests(SimpleTestCase):
+    """Donors are only routed to SMS/push when that channel has a gateway"""
+
+    @override_settings(NOTIFICATION_SMS_GATEWAY='', NOTIFICATION_PUSH_GATEWAY='')
+    def test_unconfigured_gateway_falls_back_to_email(self):
+        self.assertEqual(
+            route(NotificationChannel.SMS, 'donor@example.com', phone='0801'),
+            (NotificationChannel.EMAIL, 'donor@example.com')
+        )
+        self.assertEqual(
+            route(NotificationChannel.PUSH, 'donor@example.com', push_token='token'),
+            (NotificationChannel.EMAIL, 'donor@example.com')
+        )
+
+    @override_settings(NOTIFICATION_SMS_GATEWAY='http://127.0.0.1:8025/sms')
+    def test_configured_gateway_is_used(self):
+        self.assertEqual(
+            route(NotificationChannel.SMS, 'donor@example.com', phone='0801'),
+            (NotificationChannel.SMS, '0801')
+        )
+        self.assertEqual(
+            route(NotificationChannel.SMS, 'donor@example.com', phone=''),
+            (NotificationChannel.EMAIL, 'donor@example.com')
+        )
+
+
+class QueryPlanTests(TestCase):
+    """The matching and listing hot paths stay on their indexes (check_query_plans)"""
+
+    def index_names(self, model):
+        with connection.cursor() as cursor:
+            constraints = connection.introspection.get_constraints(cursor, model._meta.db_table)
+        return {name for name, info in constraints.items() if info['index']}
+
+    def check_query_plans(self):
+        out = StringIO()
+        call_command('check_query_plans', '--verbose-plans', stdout=out)
+        return out.getvalue()
+
+    def drop_indexes(self, model, unique=False):
+        """Drop the secondary indexes (with `unique`, unique ones too) on the model's table"""
+        with connection.cursor() as cursor:
+            constraints = connection.introspection.get_constraints(cursor, model._meta.db_table)
+            for name, info in constraints.items():
+                if info['index'] and not info['primary_key'] and (unique or not info['unique']):
+                    # Rolled back with the test's transaction
+                    cursor.execute(f'DROP INDEX {connection.ops.quote_name(name)}')
+            if connection.vendor == 'sqlite':
+                # Python's sqlite3 caches prepared statements by SQL text and SQLite
+                # does not re-plan a cached EXPLAIN after DDL; push earlier plans out
+                for number in range(256):
+                    cursor.execute(f'SELECT {number}')
+
+    def test_hot_path_indexes_exist(self):
+        self.assertIn('donor_available_type_idx', self.index_names(Donor))
+        self.assertIn('availability_window_idx', self.index_names(AvailabilityWindow))
+        self.assertIn('inbox_donor_keyset_idx', self.index_names(InboxMessage))
+        self.assertIn('reach_hosp_type_donor_idx', self.index_names(DonorReachability))
+        self.assertTrue(
+            {'request_status_type_idx', 'request_hospital_created_idx'} <= self.index_names(BloodRequest)
+        )
+
+    def test_hot_paths_use_indexes(self):
+        if connection.vendor not in ('sqlite', 'postgresql'):
+            self.skipTest(f'Query plan checks are not implemented for {connection.vendor}')
+        output = self.check_query_plans()
+        self.assertNotIn('full scan', output)
+        self.assertIn('matching (available now): ok', output)
+
+    def assertMissingIndexFails(self, model, unique=False):
+        if connection.vendor not in ('sqlite', 'postgresql'):
+            self.skipTest(f'Query plan checks are not implemented for {connection.vendor}')
+        self.drop_indexes(model, unique=unique)
+        with self.assertRaises(CommandError):
+            self.check_query_plans()
+
+    def test_missing_request_index_fails(self):
+        self.assertMissingIndexFails(BloodRequest)
+
+    def test_missing_service_location_index_fails(self):
+        # Scanned inside the EXISTS subquery, where the plan names the alias (U0)
+        self.assertMissingIndexFails(Donor.service_locations.through, unique=True)
+
+    def test_missing_availability_window_index_fails(self):
+        self.assertMissingIndexFails(AvailabilityWindow)
@@ -3,6 +3,7 @@ from django.utils.html import format_html
 from django.db.models import Count, Q
 from django.utils import timezone
 from apps.core.admin_base import SuperuserAdmin, HospitalRestrictedAdmin
+from apps.core.antigens import AntigenMaskFormField
 from .models import Donor
 
 
@@ -42,10 +43,10 @@ class DonorAdminMixin:
         if request.user.is_superuser:
             return [
                 ('Personal Information', {
-                    'fields': ('user', 'phone')
+                    'fields': ('user', 'phone', 'preferred_channel')
                 }),
                 ('Donation Details', {
-                    'fields': ('blood_type', 'is_available', 'last_donation_date', 'available_from')
+                    'fields': ('blood_type', 'antigen_negative', 'is_available', 'snoozed_until', 'last_donation_date', 'available_from')
                 }),
                 ('Service Areas', {
                     'fields': ('service_locations',)
@@ -63,10 +64,10 @@ class DonorAdminMixin:
         else:
             return [
                 ('Personal Information', {
-                    'fields': ('phone',)
+                    'fields': ('phone', 'preferred_channel')
                 }),
                 ('Donation Details', {
-                    'fields': ('blood_type', 'is_available', 'last_donation_date', 'available_from')
+                    'fields': ('blood_type', 'antigen_negative', 'is_available', 'snoozed_until', 'last_donation_date', 'available_from')
                 }),
                 ('Service Areas', {
                     'fields': ('service_locations',)
@@ -77,6 +78,12 @@ class DonorAdminMixin:
                 })
             ]
     
+    def formfield_for_dbfield(self, db_field, request, **kwargs):
+        """Antigen profile is edited as a checkbox list"""
+        if db_field.name == 'antigen_negative':
+            return AntigenMaskFormField(label='Typed negative for')
+        return super().formfield_for_dbfield(db_field, request, **kwargs)
+
     def get_readonly_fields(self, request, obj=None):
         """Readonly fields"""
         readonly = ['created_at', 'updated_at', 'responses_count']
@@ -87,6 +94,15 @@ class DonorAdminMixin:
         
         return readonly
     
+    def save_model(self, request, obj, form, change):
+        """Edits leave unread_notifications alone; inbox fan-outs move it with F() updates"""
+        if not change:
+            return super().save_model(request, obj, form, change)
+        obj.save(update_fields=[
+            field.name for field in obj._meta.concrete_fields
+            if not field.primary_key and field.name != 'unread_notifications'
+        ])
+
     def email(self, obj):
         """Display donor email"""
         return obj.user.email
@@ -0,0 +1,99 @@
+"""
+When a donor can be alerted, on top of Donor.is_available and the
+donation cooldown:
+
+- `snoozed_until`: a one-off snooze (exams, travel); the donor is skipped
+  until then and needs no reminder to switch back on
+- weekly availability windows (AvailabilityWindow): the donor is only
+  alerted inside one of them. A donor without windows can be alerted any time.
+
+Windows are stored as [start, end) minutes since Monday 00:00 in
+DONOR_AVAILABILITY_TIME_ZONE. "Available right now" is then a snooze
+comparison plus an indexed EXISTS probe for a window covering the current
+minute, evaluated by the database inside the matching query
+(`available_now()`).
+"""
+from zoneinfo import ZoneInfo
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone
+
+from .models import AvailabilityWindow, Donor
+
+import logging
+logger = logging.getLogger('apps.donors')
+
+MINUTES_PER_DAY = 24 * 60
+
+
+def availability_time_zone():
+    return ZoneInfo(getattr(settings, 'DONOR_AVAILABILITY_TIME_ZONE', settings.TIME_ZONE))
+
+
+def minute_of_week(moment=None):
+    """Minutes since Monday 00:00 in the availability time zone"""
+    local = timezone.localtime(moment or timezone.now(), availability_time_zone())
+    return local.weekday() * MINUTES_PER_DAY + local.hour * 60 + local.minute
+
+
+def available_now(donors, now=None):
+    """Keep donors who are not snoozed and, if they have windows, are inside one right now"""
+    now = now or timezone.now()
+    minute = minute_of_week(now)
+    in_window = AvailabilityWindow.objects.filter(
+        donor_id=OuterRef('pk'),
+        start_minute__lte=minute,
+        end_minute__gt=minute
+    )
+    return donors.filter(
+        Q(snoozed_until__isnull=True) | Q(snoozed_until__lte=now)
+    ).filter(
+        Q(has_availability_windows=False) | Exists(in_window)
+    )
+
+
+def slot_to_intervals(day, start, end):
+    """
+    [(start_minute, end_minute)] for a weekly slot on `day` (0 = Monday)
+    between `start` and `end` (datetime.time). An end at or before the
+    start runs past midnight into the next day, and a slot running past
+    Sunday midnight is split at the end of the week.
+    """
+    first = day * MINUTES_PER_DAY + start.hour * 60 + start.minute
+    last = day * MINUTES_PER_DAY + end.hour * 60 + end.minute
+    if last <= first:
+        last += MINUTES_PER_DAY
+    if last <= AvailabilityWindow.MINUTES_PER_WEEK:
+        return [(first, last)]
+    return [(first, AvailabilityWindow.MINUTES_PER_WEEK), (0, last - AvailabilityWindow.MINUTES_PER_WEEK)]
+
+
+def interval_to_slot(start_minute, end_minute):
+    """{'day', 'start', 'end'} ('HH:MM') for a stored window"""
+    def clock(minute):
+        minute %= MINUTES_PER_DAY
+        return f"{minute // 60:02d}:{minute % 60:02d}"
+    return {
+        'day': start_minute // MINUTES_PER_DAY,
+        'start': clock(start_minute),
+        'end': clock(end_minute),
+    }
+
+
+def set_windows(donor, slots):
+    """Replace the donor's windows with [{'day', 'start', 'end'}] slots (an empty list removes them)"""
+    intervals = [
+        interval
+        for slot in slots
+        for interval in slot_to_intervals(slot['day'], slot['start'], slot['end'])
+    ]
+    with transaction.atomic():
+        AvailabilityWindow.objects.filter(donor=donor).delete()
+        AvailabilityWindow.objects.bulk_create([
+            AvailabilityWindow(donor=donor, start_minute=start, end_minute=end) for start, end in intervals
+        ])
+        donor.has_availability_windows = bool(intervals)
+        Donor.objects.filter(id=donor.id).update(has_availability_windows=donor.has_availability_windows)
+    logger.info(f"Availability windows set for donor ID {donor.id}: {len(intervals)} intervals")
@@ -0,0 +1,69 @@
+"""
+Donor in-app inbox.
+
+Every donor alert is also posted to the donor's inbox, whatever channel
+the alert itself went out on. A fan-out writes one bulk INSERT per batch
+and bumps the donors' unread counters with a single
+`UPDATE ... SET unread_notifications = unread_notifications + 1`.
+Reading the count is then one column of the donor row, cheap enough for
+the mobile app to poll. Other writes to the donor row save only their own
+columns, so they never put back a stale count. The inbox is listed newest
+first with cursor (keyset) pagination on the id.
+"""
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .models import Donor, InboxMessage
+
+import logging
+logger = logging.getLogger('apps.donors')
+
+
+def post(donor_ids, subject, body, blood_request=None):
+    """Post one message to each donor's inbox; returns how many were posted"""
+    donor_ids = list(donor_ids)
+    if not donor_ids:
+        return 0
+
+    with transaction.atomic():
+        if blood_request is not None:
+            # Posts for the same request queue on its row, so the check below
+            # sees every committed message and only new rows are counted
+            list(type(blood_request).objects.select_for_update().filter(pk=blood_request.pk).values_list('pk'))
+            # Donors re-alerted for the same request keep their one message
+            already = set(
+                InboxMessage.objects.filter(blood_request=blood_request, donor_id__in=donor_ids)
+                .values_list('donor_id', flat=True)
+            )
+            donor_ids = [donor_id for donor_id in donor_ids if donor_id not in already]
+            if not donor_ids:
+                return 0
+
+        InboxMessage.objects.bulk_create(
+            [
+                InboxMessage(donor_id=donor_id, blood_request=blood_request, subject=subject, body=body)
+                for donor_id in donor_ids
+            ],
+            batch_size=500,
+            # Never hit while the request row is locked; kept so a stray
+            # duplicate cannot fail the whole fan-out
+            ignore_conflicts=True
+        )
+        Donor.objects.filter(id__in=donor_ids).update(unread_notifications=F('unread_notifications') + 1)
+    logger.debug(f"Posted '{subject}' to {len(donor_ids)} donor inboxes")
+    return len(donor_ids)
+
+
+def mark_read(donor, up_to=None):
+    """Mark the donor's unread messages (up to id `up_to`) read; returns how many"""
+    unread = InboxMessage.objects.filter(donor=donor, read_at__isnull=True)
+    if up_to is not None:
+        unread = unread.filter(id__lte=up_to)
+    marked = unread.update(read_at=timezone.now())
+    if marked:
+        Donor.objects.filter(id=donor.id).update(
+            unread_notifications=Greatest(F('unread_notifications') - marked, 0)
+        )
+    return marked
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.6 on 2026-10-17 06:32
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('donors', '0002_alter_donor_available_from'),
+        ('locations', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='donor',
+            index=models.Index(condition=models.Q(('is_available', True)), fields=['blood_type', 'available_from'], name='donor_available_type_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-17 06:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('donors', '0003_donor_donor_available_type_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='donor',
+            name='antigen_negative',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.6 on 2026-10-17 06:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('donors', '0004_donor_antigen_negative'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='donor',
+            name='preferred_channel',
+            field=models.CharField(choices=[('EMAIL', 'Email'), ('SMS', 'SMS'), ('PUSH', 'Push notification')], default='EMAIL', max_length=5),
+        ),
+        migrations.AddField(
+            model_name='donor',
+            name='push_token',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+    ]
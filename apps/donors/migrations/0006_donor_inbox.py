@@ -0,0 +1,36 @@
+# Generated by Django 5.2.6 on 2026-10-17 07:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blood_requests', '0011_donoralert_message'),
+        ('donors', '0005_donor_notification_channel'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='donor',
+            name='unread_notifications',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='InboxMessage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('subject', models.CharField(max_length=255)),
+                ('body', models.TextField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('read_at', models.DateTimeField(blank=True, null=True)),
+                ('blood_request', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='blood_requests.bloodrequest')),
+                ('donor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='inbox', to='donors.donor')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['donor', '-id'], name='inbox_donor_keyset_idx')],
+                'constraints': [models.UniqueConstraint(fields=('donor', 'blood_request'), name='inbox_donor_request_uniq')],
+            },
+        ),
+    ]
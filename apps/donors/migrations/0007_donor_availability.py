@@ -0,0 +1,38 @@
+# Generated by Django 5.2.6 on 2026-10-17 07:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('donors', '0006_donor_inbox'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='donor',
+            name='has_availability_windows',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='donor',
+            name='snoozed_until',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='AvailabilityWindow',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('start_minute', models.PositiveSmallIntegerField()),
+                ('end_minute', models.PositiveSmallIntegerField()),
+                ('donor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='availability_windows', to='donors.donor')),
+            ],
+            options={
+                'ordering': ['start_minute'],
+                'indexes': [models.Index(fields=['donor', 'start_minute', 'end_minute'], name='availability_window_idx')],
+                'constraints': [models.CheckConstraint(condition=models.Q(('end_minute__lte', 10080), ('start_minute__lt', models.F('end_minute'))), name='availability_window_valid')],
+            },
+        ),
+    ]
@@ -1,6 +1,7 @@
 from django.db import models
 from django.conf import settings
 from apps.locations.models import LocalGovernment
+from apps.core.models import NotificationChannel
 
 # Create your models here.
 
@@ -26,9 +27,34 @@ class Donor(models.Model):
         related_name='donors',
         help_text='Areas where donor can travel to donate..'
     )
+    # Antigens the donor was typed negative for, as an apps.core.antigens.Antigens mask
+    antigen_negative = models.PositiveIntegerField(default=0)
+    # How the donor wants to be alerted; falls back to email without a phone/push token
+    preferred_channel = models.CharField(
+        max_length=5,
+        choices=NotificationChannel.choices,
+        default=NotificationChannel.EMAIL
+    )
+    push_token = models.CharField(max_length=255, blank=True)
+    # Not alerted before this time (a one-off snooze)
+    snoozed_until = models.DateTimeField(null=True, blank=True)
+    # Set when the donor has weekly AvailabilityWindows; without any they can be alerted at any time
+    has_availability_windows = models.BooleanField(default=False)
+    # Unread InboxMessage rows, kept in step with F() updates (apps/donors/inbox.py)
+    unread_notifications = models.PositiveIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # Matching: available donors of the compatible types past cooldown
+            models.Index(
+                fields=['blood_type', 'available_from'],
+                condition=models.Q(is_available=True),
+                name='donor_available_type_idx',
+            ),
+        ]
+
     def __str__(self):
         return f"{self.user.email} ({self.blood_type})"
     
@@ -38,4 +64,58 @@ class Donor(models.Model):
         if not self.available_from:
             return True
         from django.utils import timezone
-        return timezone.now().date() >= self.available_from
\ No newline at end of file
+        return timezone.now().date() >= self.available_from
+
+
+class AvailabilityWindow(models.Model):
+    """
+    A weekly slot when the donor can be alerted, as minutes since Monday
+    00:00 in DONOR_AVAILABILITY_TIME_ZONE, end exclusive. Slots running past
+    the end of the week are stored as two rows (apps/donors/availability.py).
+    """
+    MINUTES_PER_WEEK = 7 * 24 * 60
+
+    donor = models.ForeignKey(Donor, on_delete=models.CASCADE, related_name='availability_windows')
+    start_minute = models.PositiveSmallIntegerField()
+    end_minute = models.PositiveSmallIntegerField()
+
+    class Meta:
+        ordering = ['start_minute']
+        constraints = [
+            models.CheckConstraint(
+                condition=models.Q(start_minute__lt=models.F('end_minute'), end_minute__lte=7 * 24 * 60),
+                name='availability_window_valid',
+            ),
+        ]
+        indexes = [
+            # Matching: does one of this donor's windows cover the current minute?
+            models.Index(fields=['donor', 'start_minute', 'end_minute'], name='availability_window_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.donor_id}: {self.start_minute}-{self.end_minute}"
+
+
+class InboxMessage(models.Model):
+    """In-app notification for a donor, written in bulk by the alert fan-out (apps/donors/inbox.py)"""
+    donor = models.ForeignKey(Donor, on_delete=models.CASCADE, related_name='inbox')
+    blood_request = models.ForeignKey(
+        'blood_requests.BloodRequest', on_delete=models.CASCADE, null=True, blank=True, related_name='+'
+    )
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    read_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            # A donor sees each request once, however often it is fanned out
+            models.UniqueConstraint(fields=['donor', 'blood_request'], name='inbox_donor_request_uniq'),
+        ]
+        indexes = [
+            # Keyset pagination: a donor's messages newest first
+            models.Index(fields=['donor', '-id'], name='inbox_donor_keyset_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.donor_id}: {self.subject}"
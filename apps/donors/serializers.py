@@ -1,11 +1,10 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
 from django.db import IntegrityError
-from django.core.mail import send_mail
-from django.conf import settings
+from apps.core.outbox import enqueue_email
 from django.utils import timezone
 from datetime import timedelta
-from .models import Donor
+from .models import Donor, InboxMessage
 from apps.locations.models import LocalGovernment
 from apps.locations.serializers import LocalGovernmentSerializer
 from apps.accounts.models import EmailVerification
@@ -107,8 +106,8 @@ class DonorRegistrationSerializer(serializers.ModelSerializer):
             subject = "Your Lifeline verification code"
             message = f"Your verification code is: {code}\nThis code expires in 24 hours."
             print(code)
-            send_mail(subject, message, settings.DEFAULT_FROM_EMAIL, [user.email], fail_silently=True)
-            logger.info("Verification email sent successfully to donor: %s", mask_email(email))
+            enqueue_email(subject, message, user.email)
+            logger.info("Verification email queued for donor: %s", mask_email(email))
         except Exception as e:
             # Don't fail registration if email sending/verification model has issue
             logger.error("[DONOR] Failed to send verification email to %s: %s", mask_email(email), str(e), exc_info=True)
@@ -125,6 +124,48 @@ class DonorSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'email', 'phone', 'blood_type', 'is_available',
             'service_locations', 'last_donation_date', 'available_from',
-            'is_eligible', 'created_at'
+            'is_eligible', 'preferred_channel', 'push_token', 'unread_notifications', 'created_at'
         ]
-        read_only_fields = ['id', 'last_donation_date', 'available_from', 'created_at']
\ No newline at end of file
+        read_only_fields = ['id', 'last_donation_date', 'available_from', 'unread_notifications', 'created_at']
+        extra_kwargs = {'push_token': {'write_only': True}}
+
+    def update(self, instance, validated_data):
+        """Save only the submitted fields, never a stale unread_notifications"""
+        for attr, value in validated_data.items():
+            setattr(instance, attr, value)
+        instance.save(update_fields=[*validated_data, 'updated_at'])
+        return instance
+
+
+class InboxMessageSerializer(serializers.ModelSerializer):
+    is_read = serializers.SerializerMethodField()
+
+    class Meta:
+        model = InboxMessage
+        fields = ['id', 'subject', 'body', 'blood_request', 'created_at', 'read_at', 'is_read']
+        read_only_fields = fields
+
+    def get_is_read(self, obj):
+        return obj.read_at is not None
+
+
+class AvailabilitySlotSerializer(serializers.Serializer):
+    """A weekly slot: day 0 (Monday) to 6, with an end at or before the start running past midnight"""
+    day = serializers.IntegerField(min_value=0, max_value=6)
+    start = serializers.TimeField(format='%H:%M')
+    end = serializers.TimeField(format='%H:%M')
+
+    def validate(self, attrs):
+        if attrs['start'] == attrs['end']:
+            raise serializers.ValidationError("A window needs different start and end times.")
+        return attrs
+
+
+class DonorAvailabilitySerializer(serializers.Serializer):
+    snoozed_until = serializers.DateTimeField(allow_null=True, required=False)
+    windows = AvailabilitySlotSerializer(many=True, required=False)
+
+    def validate_snoozed_until(self, value):
+        if value is not None and value <= timezone.now():
+            raise serializers.ValidationError("snoozed_until must be in the future (null clears the snooze).")
+        return value
@@ -1,8 +1,15 @@
 from django.urls import path
-from .views import DonorRegistrationView, DonorProfileView, toggle_availability
+from .views import (
+    DonorRegistrationView, DonorProfileView, DonorAvailabilityView, DonorInboxView, toggle_availability, inbox_unread_count,
+    mark_inbox_read
+)
 
 urlpatterns = [
     path('register/', DonorRegistrationView.as_view(), name='donor_register'),
     path('profile/', DonorProfileView.as_view(), name='donor_profile'),
     path('toggle-availability/', toggle_availability, name='toggle_availability'),
+    path('availability/', DonorAvailabilityView.as_view(), name='donor_availability'),
+    path('inbox/', DonorInboxView.as_view(), name='donor_inbox'),
+    path('inbox/unread-count/', inbox_unread_count, name='donor_inbox_unread_count'),
+    path('inbox/read/', mark_inbox_read, name='donor_inbox_read'),
 ]
\ No newline at end of file
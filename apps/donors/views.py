@@ -1,9 +1,14 @@
 from rest_framework import generics, status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.pagination import CursorPagination
 from rest_framework.response import Response
-from .models import Donor
-from .serializers import DonorRegistrationSerializer, DonorSerializer
+from rest_framework.views import APIView
+from . import availability, inbox
+from .models import Donor, InboxMessage
+from .serializers import (
+    DonorAvailabilitySerializer, DonorRegistrationSerializer, DonorSerializer, InboxMessageSerializer
+)
 
 from apps.core.utils import mask_email
 
@@ -28,7 +33,8 @@ def toggle_availability(request):
     """Toggle donor availability status"""
     donor = request.user.donor
     donor.is_available = not donor.is_available
-    donor.save()
+    # Only the toggled column: unread_notifications moves through F() updates
+    donor.save(update_fields=['is_available', 'updated_at'])
 
     status = 'available' if donor.is_available else 'unavailable'
     logger.info(
@@ -40,4 +46,93 @@ def toggle_availability(request):
     return Response({
         'is_available': donor.is_available,
         'message': f"Availability set to {'available' if donor.is_available else 'unavailable'}"
-    })
\ No newline at end of file
+    })
+
+
+class InboxPagination(CursorPagination):
+    """Keyset pagination on the id: each page is one index range scan, however deep"""
+    ordering = '-id'
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+
+class DonorInboxView(generics.ListAPIView):
+    """The donor's in-app notifications, newest first"""
+    permission_classes = [IsAuthenticated]
+    serializer_class = InboxMessageSerializer
+    pagination_class = InboxPagination
+
+    def get_queryset(self):
+        return InboxMessage.objects.filter(donor=self.request.user.donor)
+
+    def get_paginated_response(self, data):
+        response = super().get_paginated_response(data)
+        response.data['unread_count'] = self.request.user.donor.unread_notifications
+        return response
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def inbox_unread_count(request):
+    """Unread inbox messages: one column of the donor row, cheap to poll"""
+    unread = Donor.objects.filter(user=request.user).values_list('unread_notifications', flat=True).first()
+    return Response({'unread_count': unread or 0})
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def mark_inbox_read(request):
+    """Mark inbox messages read: all of them, or those up to the id in 'up_to'"""
+    up_to = request.data.get('up_to')
+    if up_to is not None:
+        try:
+            up_to = int(up_to)
+        except (TypeError, ValueError):
+            return Response({'error': "'up_to' must be a message id"}, status=status.HTTP_400_BAD_REQUEST)
+
+    donor = request.user.donor
+    marked = inbox.mark_read(donor, up_to=up_to)
+    donor.refresh_from_db(fields=['unread_notifications'])
+    return Response({'marked_read': marked, 'unread_count': donor.unread_notifications})
+
+
+class DonorAvailabilityView(APIView):
+    """
+    The donor's snooze and weekly availability windows. PUT/PATCH with
+    'snoozed_until' (null clears it) and/or 'windows' (replaces them all;
+    an empty list means available any time).
+    """
+    permission_classes = [IsAuthenticated]
+
+    def representation(self, donor):
+        return {
+            'snoozed_until': donor.snoozed_until,
+            'windows': [
+                availability.interval_to_slot(start, end)
+                for start, end in donor.availability_windows.values_list('start_minute', 'end_minute')
+            ],
+        }
+
+    def get(self, request):
+        return Response(self.representation(request.user.donor))
+
+    def put(self, request):
+        serializer = DonorAvailabilitySerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        donor = request.user.donor
+
+        if 'snoozed_until' in serializer.validated_data:
+            donor.snoozed_until = serializer.validated_data['snoozed_until']
+            Donor.objects.filter(id=donor.id).update(snoozed_until=donor.snoozed_until)
+        if 'windows' in serializer.validated_data:
+            availability.set_windows(donor, serializer.validated_data['windows'])
+
+        logger.info(
+            "Donor availability updated: %s snoozed until %s",
+            mask_email(request.user.email),
+            donor.snoozed_until
+        )
+        return Response(self.representation(donor))
+
+    patch = put
@@ -7,8 +7,7 @@ from apps.locations.serializers import LocalGovernmentSerializer
 
 # Email Verification
 from apps.accounts.models import EmailVerification
-from django.core.mail import send_mail
-from django.conf import settings
+from apps.core.outbox import enqueue_email
 from django.utils import timezone
 from datetime import timedelta
 import random
@@ -95,8 +94,8 @@ class HospitalRegistrationSerializer(serializers.ModelSerializer):
             subject = "Your Lifeline verification code"
             message = f"Your verification code is: {code}\nThis code expires in 24 hours."
             print(code)
-            send_mail(subject, message, settings.DEFAULT_FROM_EMAIL, [user.email], fail_silently=True)
-            logger.info("Verification email sent successfully to hospital: %s", mask_email(email))
+            enqueue_email(subject, message, user.email)
+            logger.info("Verification email queued for hospital: %s", mask_email(email))
         except Exception as e:
             logger.error("[HOSPITAL] Failed to send verification email to %s: %s", mask_email(email), str(e), exc_info=True)
 
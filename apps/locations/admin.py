@@ -129,7 +129,7 @@ class LocalGovernmentAdmin(DynamicLocalGovernmentAdmin):
     
     fieldsets = [
         ('Location Information', {
-            'fields': ('state', 'name')
+            'fields': ('state', 'name', 'latitude', 'longitude')
         }),
         ('Statistics', {
             'fields': ('hospitals_count', 'donors_count', 'service_hospitals_count'),
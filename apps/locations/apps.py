@@ -4,3 +4,12 @@ from django.apps import AppConfig
 class LocationsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.locations'
+
+
+    def ready(self):
+        from . import distances
+        from django.db.models.signals import post_delete, post_save
+
+        # Coordinates rarely change; rebuild the matrix lazily when they do
+        post_save.connect(distances.reset, sender=self.get_model('LocalGovernment'), dispatch_uid='locations_lga_saved')
+        post_delete.connect(distances.reset, sender=self.get_model('LocalGovernment'), dispatch_uid='locations_lga_deleted')
@@ -0,0 +1,92 @@
+"""
+LGA x LGA distance matrix.
+
+Great-circle distances (km) between LGA centroids, computed once per process
+from LocalGovernment.latitude/longitude and kept as a flat float32 array
+(4 bytes per pair: ~2.4 MB for all 774 LGAs in Nigeria). LGAs without
+coordinates have no distances. The matrix is rebuilt lazily after an LGA is
+saved or deleted (see LocationsConfig.ready).
+"""
+import math
+import threading
+from array import array
+
+import logging
+logger = logging.getLogger('apps.locations')
+
+
+EARTH_RADIUS_KM = 6371.0
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    lat1, lng1, lat2, lng2 = map(math.radians, (lat1, lng1, lat2, lng2))
+    a = (
+        math.sin((lat2 - lat1) / 2) ** 2
+        + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+class DistanceMatrix:
+    """Dense symmetric matrix over the LGAs that have coordinates"""
+
+    def __init__(self, coordinates):
+        """`coordinates`: iterable of (lga_id, latitude, longitude)"""
+        points = [(lga_id, float(lat), float(lng)) for lga_id, lat, lng in coordinates]
+        self.lga_ids = tuple(lga_id for lga_id, _, _ in points)
+        self.index = {lga_id: i for i, lga_id in enumerate(self.lga_ids)}
+
+        n = len(points)
+        self.km = array('f', bytes(4 * n * n))
+        for i, (_, lat1, lng1) in enumerate(points):
+            for j in range(i + 1, n):
+                _, lat2, lng2 = points[j]
+                self.km[i * n + j] = self.km[j * n + i] = haversine_km(lat1, lng1, lat2, lng2)
+
+    def __len__(self):
+        return len(self.lga_ids)
+
+    def distance(self, from_lga_id, to_lga_id):
+        """Distance in km, or None when either LGA has no coordinates"""
+        i = self.index.get(from_lga_id)
+        j = self.index.get(to_lga_id)
+        if i is None or j is None:
+            return None
+        return self.km[i * len(self.lga_ids) + j]
+
+    def distances_from(self, lga_id):
+        """{lga_id: km} for every LGA with coordinates (empty if `lga_id` has none)"""
+        i = self.index.get(lga_id)
+        if i is None:
+            return {}
+        n = len(self.lga_ids)
+        row = self.km[i * n:(i + 1) * n]
+        return dict(zip(self.lga_ids, row))
+
+
+_matrix = None
+_matrix_lock = threading.Lock()
+
+
+def get_distance_matrix():
+    """Process-wide DistanceMatrix, built on first use"""
+    global _matrix
+
+    with _matrix_lock:
+        if _matrix is None:
+            from .models import LocalGovernment
+
+            coordinates = LocalGovernment.objects.filter(
+                latitude__isnull=False, longitude__isnull=False
+            ).values_list('id', 'latitude', 'longitude')
+            _matrix = DistanceMatrix(coordinates)
+            logger.info(f"LGA distance matrix built for {len(_matrix)} LGAs")
+        return _matrix
+
+
+def reset(**kwargs):
+    """Drop the cached matrix (connected to LocalGovernment save/delete)"""
+    global _matrix
+
+    with _matrix_lock:
+        _matrix = None
@@ -15,6 +15,9 @@ class State(models.Model):
 class LocalGovernment(models.Model):
     state = models.ForeignKey(State, on_delete=models.CASCADE, related_name='local_governments')
     name = models.CharField(max_length=100)
+    # Approximate centroid, used by the LGA distance matrix (distances.py)
+    latitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
+    longitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
 
     class Meta:
         ordering = ['name']
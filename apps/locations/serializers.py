@@ -6,7 +6,7 @@ class LocalGovernmentSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = LocalGovernment
-        fields = ['id', 'name', 'state', 'state_name']
+        fields = ['id', 'name', 'state', 'state_name', 'latitude', 'longitude']
 
 class StateSerializer(serializers.ModelSerializer):
     local_governments = LocalGovernmentSerializer(many=True, read_only=True)
@@ -194,10 +194,112 @@ EMAIL_USE_TLS = True
 EMAIL_HOST_USER = env('EMAIL_HOST_USER')
 EMAIL_HOST_PASSWORD = env('EMAIL_HOST_PASSWORD')
 DEFAULT_FROM_EMAIL = env('DEFAULT_FROM_EMAIL')
+# Seconds before a blocked SMTP connection gives up
+EMAIL_TIMEOUT = env.int('EMAIL_TIMEOUT', default=10)
+
+# Transactional email outbox (apps/core/outbox.py): emails are queued in the
+# database and delivered by `manage.py run_outbox`, which must run in
+# production (README, Deployment). EAGER also delivers them in-process right
+# after commit, for development setups without a worker.
+EMAIL_OUTBOX_EAGER = env.bool('EMAIL_OUTBOX_EAGER', default=False)
+EMAIL_OUTBOX_BATCH_SIZE = env.int('EMAIL_OUTBOX_BATCH_SIZE', default=100)
+EMAIL_OUTBOX_LEASE_SECONDS = env.int('EMAIL_OUTBOX_LEASE_SECONDS', default=300)
+EMAIL_OUTBOX_MAX_ATTEMPTS = env.int('EMAIL_OUTBOX_MAX_ATTEMPTS', default=5)
+EMAIL_OUTBOX_BACKOFF_SECONDS = env.int('EMAIL_OUTBOX_BACKOFF_SECONDS', default=30)
+# Messages sent over one SMTP connection before it is recycled
+EMAIL_OUTBOX_MESSAGES_PER_CONNECTION = env.int('EMAIL_OUTBOX_MESSAGES_PER_CONNECTION', default=100)
+
+# SMS/push gateways for donors who prefer those channels (apps/core/channels.py):
+# http(s)://... POSTs JSON; file:///path.jsonl appends JSON lines (offline stub
+# for development/tests). Unset, those donors are alerted by email instead.
+NOTIFICATION_SMS_GATEWAY = env('NOTIFICATION_SMS_GATEWAY', default='')
+NOTIFICATION_PUSH_GATEWAY = env('NOTIFICATION_PUSH_GATEWAY', default='')
+NOTIFICATION_GATEWAY_TIMEOUT = env.int('NOTIFICATION_GATEWAY_TIMEOUT', default=10)
+# Threads sending a claimed outbox batch concurrently
+NOTIFICATION_DISPATCH_WORKERS = env.int('NOTIFICATION_DISPATCH_WORKERS', default=8)
+# Per-channel circuit breakers (apps/core/breaker.py): open for OPEN_SECONDS
+# once FAILURE_RATE of at least MIN_CALLS sends in WINDOW seconds failed or
+# took longer than SLOW_SECONDS (FAILURE_RATE 0 disables them). State lives
+# in the default cache; use a shared CACHES backend with several workers.
+NOTIFICATION_BREAKER_FAILURE_RATE = env.float('NOTIFICATION_BREAKER_FAILURE_RATE', default=0.5)
+NOTIFICATION_BREAKER_SLOW_SECONDS = env.float('NOTIFICATION_BREAKER_SLOW_SECONDS', default=5)
+NOTIFICATION_BREAKER_MIN_CALLS = env.int('NOTIFICATION_BREAKER_MIN_CALLS', default=20)
+NOTIFICATION_BREAKER_WINDOW = env.int('NOTIFICATION_BREAKER_WINDOW', default=60)
+NOTIFICATION_BREAKER_OPEN_SECONDS = env.int('NOTIFICATION_BREAKER_OPEN_SECONDS', default=30)
 
 # Frontend URL for links in emails
 FRONTEND_URL = env('FRONTEND_URL')
 
+# Donor matching engine
+# 'orm' runs the SQL join per request (default).
+# 'reachability' reads the materialized DonorReachability table
+# (rebuild with `manage.py rebuild_reachability`).
+# 'columnar' answers from an in-process NumPy snapshot of donors; it needs
+# numpy installed and falls back to 'orm' without it.
+# 'bitmap' answers from the node-wide shared eligibility bitmap (run
+# `manage.py run_eligibility_writer`) and falls back to 'orm' while the
+# file is missing or built for an earlier day; like 'columnar' it needs numpy.
+DONOR_MATCHING_ENGINE = env('DONOR_MATCHING_ENGINE', default='orm')
+
+# Seconds before the columnar snapshot is fully reloaded from the database
+DONOR_MATCHING_SNAPSHOT_TTL = env.int('DONOR_MATCHING_SNAPSHOT_TTL', default=300)
+
+# Donor alert fan-out: matches are streamed in DONOR_ALERT_RANKING order
+# ('recently_active', 'longest_rested', 'nearest' or 'fewest_notified' -
+# fewest alerts in the last DONOR_ALERT_FATIGUE_DAYS first), at most
+# DONOR_ALERT_LIMIT donors per request (unset = all), read
+# DONOR_ALERT_CHUNK_SIZE rows at a time
+DONOR_ALERT_RANKING = env('DONOR_ALERT_RANKING', default='recently_active')
+DONOR_ALERT_FATIGUE_DAYS = env.int('DONOR_ALERT_FATIGUE_DAYS', default=30)
+DONOR_ALERT_LIMIT = env.int('DONOR_ALERT_LIMIT', default=None)
+DONOR_ALERT_CHUNK_SIZE = env.int('DONOR_ALERT_CHUNK_SIZE', default=500)
+
+# Shared-memory eligibility bitmap (DONOR_MATCHING_ENGINE=bitmap), written by
+# `manage.py run_eligibility_writer` and mapped read-only by every worker on
+# the node; the writer fully rebuilds it every REBUILD_INTERVAL seconds
+DONOR_ELIGIBILITY_BITMAP_PATH = env('DONOR_ELIGIBILITY_BITMAP_PATH', default=str(BASE_DIR / 'var' / 'donor_eligibility.bin'))
+DONOR_ELIGIBILITY_BITMAP_REBUILD_INTERVAL = env.int('DONOR_ELIGIBILITY_BITMAP_REBUILD_INTERVAL', default=300)
+
+# Seconds a request's matched donor ids stay cached (0, the default, disables
+# the cache). Entries are invalidated from donor/hospital signals through
+# Django's default cache, so only enable it with a shared CACHES backend
+# when running several workers.
+DONOR_MATCH_CACHE_TIMEOUT = env.int('DONOR_MATCH_CACHE_TIMEOUT', default=0)
+
+# Scarce-type allocation: alert each donor for at most PER_DONOR open
+# requests and each request at most PER_REQUEST donors, solved across all
+# open requests in the region instead of alerting every compatible donor
+DONOR_ALLOCATION_ENABLED = env.bool('DONOR_ALLOCATION_ENABLED', default=False)
+DONOR_ALLOCATION_PER_REQUEST = env.int('DONOR_ALLOCATION_PER_REQUEST', default=10)
+DONOR_ALLOCATION_PER_DONOR = env.int('DONOR_ALLOCATION_PER_DONOR', default=1)
+
+# Threads used by find_compatible_donors_bulk to match request groups in
+# parallel (the work is database-bound, so threads rather than processes)
+DONOR_MATCHING_BULK_WORKERS = env.int('DONOR_MATCHING_BULK_WORKERS', default=1)
+
+# Default BloodRequest.needed_by: hours after creation per urgency
+BLOOD_REQUEST_DEADLINE_HOURS = {
+    'CRITICAL': env.int('BLOOD_REQUEST_CRITICAL_DEADLINE_HOURS', default=1),
+    'URGENT': env.int('BLOOD_REQUEST_URGENT_DEADLINE_HOURS', default=6),
+    'ROUTINE': env.int('BLOOD_REQUEST_ROUTINE_DEADLINE_HOURS', default=72),
+}
+
+# Staged alerts: alert the top WAVE_SIZE ranked donors when a request opens,
+# then the next WAVE_SIZE every WAVE_INTERVAL seconds while it stays OPEN
+# (sent by `manage.py run_notification_waves`). 0 alerts everyone at once.
+DONOR_ALERT_WAVE_SIZE = env.int('DONOR_ALERT_WAVE_SIZE', default=0)
+DONOR_ALERT_WAVE_INTERVAL = env.int('DONOR_ALERT_WAVE_INTERVAL', default=600)
+
+# Seconds a one-click accept link in a donor alert stays valid
+DONOR_ACCEPT_LINK_MAX_AGE = env.int('DONOR_ACCEPT_LINK_MAX_AGE', default=72 * 3600)
+
+# Time zone donors' weekly availability windows are entered in
+DONOR_AVAILABILITY_TIME_ZONE = env('DONOR_AVAILABILITY_TIME_ZONE', default='Africa/Lagos')
+
+# Seconds after messaging a donor during which further alerts are deferred
+# and collapsed into one digest of the still-open requests (0 disables)
+DONOR_ALERT_DEDUPE_WINDOW = env.int('DONOR_ALERT_DEDUPE_WINDOW', default=0)
+
 
 
 UNFOLD = {